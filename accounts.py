@@ -0,0 +1,268 @@
+"""
+accounts.py
+
+Registry of the Pocket Option accounts traded from one process. Each account
+holds its own client session, stake settings, Martingale sequence state and
+latency metrics, so a single signal can be fanned out to every account.
+
+Accounts are read from ACCOUNTS_FILE (default accounts.json), a JSON list like:
+
+    [
+        {"name": "main", "ssid": "42[\"auth\",...]", "account_type": "DEMO", "uid": "12345678",
+         "initial_amount": 1.0, "martingale_multiplier": 2.0, "max_martingale_levels": 2},
+        {"name": "second", "ssid": "...", "account_type": "REAL", "initial_amount": 5.0}
+    ]
+
+"uid" is optional; scraper.py only writes a refreshed SSID into entries whose
+uid matches the login it scraped.
+
+Without that file the single account from SSID / UID / ACCOUNT_TYPE in .env is used.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Optional, Any, Iterable, Iterator, Awaitable
+
+from dotenv import dotenv_values
+from pocketoptionapi_async import AsyncPocketOptionClient
+
+from circuit_breaker import CircuitBreaker
+from settings import TradingSettings
+
+logger = logging.getLogger(__name__)
+
+
+def new_trade_sequence_state(initial_amount: float) -> dict:
+    return {
+        "active": False,
+        "asset": None,
+        "direction": None,
+        "current_level": 0, # 0 for initial trade, 1 for first martingale, etc.
+        "current_amount": initial_amount,
+        "sequence_id": None, # Order ID of the sequence's initial trade
+        "last_trade_id": None,
+        "last_trade_status": None, # "win", "loss", "tie", "pending"
+        "last_trade_open_price": None,
+        "last_trade_open_time": None,
+        "profit": None,
+        "current_balance": None # Updated before each trade
+    }
+
+
+class LatencyStats:
+    """Rolling window of latency samples in milliseconds."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, value_ms: float) -> None:
+        self._samples.append(value_ms)
+        self.count += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict[str, Any]:
+        if not self._samples:
+            return {"count": self.count, "last_ms": None, "mean_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        return {
+            "count": self.count,
+            "last_ms": round(self._samples[-1], 3),
+            "mean_ms": round(sum(self._samples) / len(self._samples), 3),
+            "p50_ms": round(self.percentile(50), 3), # type: ignore
+            "p95_ms": round(self.percentile(95), 3), # type: ignore
+            "max_ms": round(max(self._samples), 3),
+        }
+
+
+class TradingAccount:
+    def __init__(self, name: str, ssid: str, is_demo: bool, initial_amount: float, martingale_multiplier: float,
+                 max_martingale_levels: int, primary: bool = False, overrides: Optional[dict[str, Any]] = None):
+        self.name = name
+        self.ssid = ssid
+        self.is_demo = is_demo
+        # Stake settings for the next sequence: the account's own values from accounts.json (overrides),
+        # otherwise the current trading settings
+        self.initial_amount = initial_amount
+        self.martingale_multiplier = martingale_multiplier
+        self.max_martingale_levels = max_martingale_levels
+        self.overrides = overrides or {}
+        # Settings snapshot of the running (or last) sequence; reloads do not change it
+        self.sequence_settings: Optional[TradingSettings] = None
+        self.primary = primary
+        self.client: Optional[AsyncPocketOptionClient] = None
+        # Validated client for a refreshed SSID, waiting for the running sequence to finish before it goes live
+        self.pending_client: Optional[AsyncPocketOptionClient] = None
+        self.pending_ssid: Optional[str] = None
+        # Second session on the same SSID, used for hedged order retries (ORDER_HEDGING)
+        self.standby_client: Optional[AsyncPocketOptionClient] = None
+        self.trade_sequence_state = new_trade_sequence_state(initial_amount)
+        # Ensures only one trade sequence (Martingale included) is active per account
+        self.is_processing_trade_sequence = False
+        self.placement_latency = LatencyStats() # place_order round trip
+        self.entry_slippage = LatencyStats() # Order acknowledged vs. target entry time
+        self.reentry_gap = LatencyStats() # Martingale order acknowledged vs. previous trade's expiry
+        # Fails connect / place_order / get_balance fast while the session is down
+        self.breaker = CircuitBreaker(f"pocket-option:{name}")
+
+    def apply_settings(self, settings: TradingSettings) -> None:
+        """Takes the stake settings of `settings` that accounts.json does not set for this account."""
+        self.initial_amount = float(self.overrides.get("initial_amount", settings.initial_trade_amount))
+        self.martingale_multiplier = float(self.overrides.get("martingale_multiplier", settings.martingale_multiplier))
+        self.max_martingale_levels = int(self.overrides.get("max_martingale_levels", settings.max_martingale_levels))
+        if self.sequence_settings is None:
+            self.sequence_settings = settings.for_account(self)
+
+    @property
+    def env_suffix(self) -> str:
+        """Suffix for per-account keys saved to .env. Empty for the primary account to keep the original keys."""
+        return "" if self.primary else f"_{self.name.upper()}"
+
+    @property
+    def is_connected(self) -> bool:
+        return bool(self.client and self.client.is_connected)
+
+    def create_client(self) -> AsyncPocketOptionClient:
+        self.client = AsyncPocketOptionClient(self.ssid, is_demo=self.is_demo, enable_logging=False)
+        return self.client
+
+    def create_standby_client(self) -> AsyncPocketOptionClient:
+        return AsyncPocketOptionClient(self.ssid, is_demo=self.is_demo, enable_logging=False)
+
+    def swap_client(self, client: AsyncPocketOptionClient, ssid: str) -> Optional[AsyncPocketOptionClient]:
+        """Makes `client` (logged in with `ssid`) the live client. Returns the previous client for the caller to disconnect."""
+        previous = self.client
+        self.client = client
+        self.ssid = ssid
+        self.pending_client = None
+        self.pending_ssid = None
+        self.breaker.reset() # Failures of the old session say nothing about the new one
+        return previous
+
+    def to_dict(self) -> dict[str, Any]:
+        state = self.trade_sequence_state
+        return {
+            "name": self.name,
+            "primary": self.primary,
+            "is_demo": self.is_demo,
+            "connected": self.is_connected,
+            "initial_amount": self.initial_amount,
+            "martingale_multiplier": self.martingale_multiplier,
+            "max_martingale_levels": self.max_martingale_levels,
+            "sequence_settings": self.sequence_settings.to_dict() if self.sequence_settings else None,
+            "is_processing_trade_sequence": self.is_processing_trade_sequence,
+            "pending_credential_swap": self.pending_client is not None,
+            "standby_connected": bool(self.standby_client and self.standby_client.is_connected),
+            "circuit_breaker": self.breaker.snapshot(),
+            "trade_sequence_state": {**state, "direction": state["direction"].value if state["direction"] else None,
+                                     "last_trade_open_time": str(state["last_trade_open_time"]) if state["last_trade_open_time"] else None},
+            "latency": {
+                "placement": self.placement_latency.snapshot(),
+                "entry_slippage": self.entry_slippage.snapshot(),
+                "reentry_gap": self.reentry_gap.snapshot(),
+            },
+        }
+
+
+class AccountRegistry:
+    def __init__(self, accounts: list[TradingAccount]):
+        self.accounts = accounts
+        self._by_name = {account.name: account for account in accounts}
+
+    def __iter__(self) -> Iterator[TradingAccount]:
+        return iter(self.accounts)
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def get(self, name: str) -> Optional[TradingAccount]:
+        return self._by_name.get(name)
+
+    @property
+    def primary(self) -> Optional[TradingAccount]:
+        return self.accounts[0] if self.accounts else None
+
+    @classmethod
+    def load(cls, initial_amount: float, martingale_multiplier: float, max_martingale_levels: int,
+             accounts_file: Optional[str] = None) -> "AccountRegistry":
+        """
+        Loads accounts from `accounts_file` (or ACCOUNTS_FILE / accounts.json), falling back to the
+        single account configured in .env. The stake arguments are the defaults for missing settings.
+        """
+        accounts_file = accounts_file or os.getenv('ACCOUNTS_FILE', 'accounts.json')
+        accounts: list[TradingAccount] = []
+        if os.path.exists(accounts_file):
+            with open(accounts_file, "r") as f:
+                entries = json.load(f)
+            for i, entry in enumerate(entries):
+                name = str(entry.get("name") or f"account{i + 1}")
+                if not entry.get("ssid"):
+                    logger.critical(f"Account '{name}' in {accounts_file} has no SSID. Skipping it.")
+                    continue
+                accounts.append(TradingAccount(
+                    name=name,
+                    ssid=entry["ssid"],
+                    is_demo=str(entry.get("account_type", "DEMO")).upper() == "DEMO",
+                    initial_amount=float(entry.get("initial_amount", initial_amount)),
+                    martingale_multiplier=float(entry.get("martingale_multiplier", martingale_multiplier)),
+                    max_martingale_levels=int(entry.get("max_martingale_levels", max_martingale_levels)),
+                    primary=not accounts,
+                    overrides={key: entry[key] for key in ("initial_amount", "martingale_multiplier", "max_martingale_levels") if key in entry},
+                ))
+            logger.info(f"Loaded {len(accounts)} trading account(s) from {accounts_file}: {[account.name for account in accounts]}")
+        else:
+            ssid = os.getenv('SSID')
+            uid = os.getenv('UID') # UID checked, but not directly used for connection.
+            if not ssid:
+                logger.critical("SSID not found in .env. Please ensure scraper.py has run or .env is correctly set.")
+            elif not uid:
+                logger.critical("UID not found in .env. Please ensure scraper.py has run or .env is correctly set.")
+            else:
+                accounts.append(TradingAccount(
+                    name="main",
+                    ssid=ssid,
+                    is_demo=os.getenv('ACCOUNT_TYPE', 'DEMO').upper() == 'DEMO',
+                    initial_amount=initial_amount,
+                    martingale_multiplier=martingale_multiplier,
+                    max_martingale_levels=max_martingale_levels,
+                    primary=True,
+                ))
+        return cls(accounts)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [account.to_dict() for account in self.accounts]
+
+
+def load_account_credentials(accounts_file: Optional[str] = None, env_path: str = ".env") -> dict[str, str]:
+    """
+    Reads the current SSID of every account straight from disk (not from os.environ, which
+    load_dotenv filled once at startup), using the same sources as AccountRegistry.load.
+    """
+    accounts_file = accounts_file or os.getenv('ACCOUNTS_FILE', 'accounts.json')
+    if os.path.exists(accounts_file):
+        with open(accounts_file, "r") as f:
+            entries = json.load(f)
+        return {str(entry.get("name") or f"account{i + 1}"): entry["ssid"] for i, entry in enumerate(entries) if entry.get("ssid")}
+    ssid = dotenv_values(env_path).get("SSID") if os.path.exists(env_path) else None
+    return {"main": ssid} if ssid else {}
+
+
+async def bounded_gather(coroutines: Iterable[Awaitable], limit: int) -> list[Any]:
+    """
+    Runs the coroutines concurrently with at most `limit` in flight. Exceptions are returned
+    in place of results, like asyncio.gather(..., return_exceptions=True).
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coroutine: Awaitable) -> Any:
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines), return_exceptions=True)
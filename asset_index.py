@@ -0,0 +1,201 @@
+"""
+asset_index.py
+
+In-memory index of tradable Pocket Option assets. Maps normalized symbols and
+aliases ("EUR/USD OTC", "eurusd-otc", "#EURUSD_otc", ...) to the canonical asset
+name used by AsyncPocketOptionClient, together with its open/closed state and
+current payout, so unusable signals can be rejected when they are received
+instead of failing in place_order at the entry instant.
+
+The known symbols come from the client library's ASSETS table. Open state and
+payout come from the asset list the server pushes over the websocket (on connect
+and periodically afterwards). The protocol has no request for that list, so the
+index cannot pull it: when the pushes stop it goes stale, stops enforcing open
+state and payout, and reports that in the app's readiness.
+"""
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional, Any, Callable
+
+from pocketoptionapi_async.constants import ASSETS
+
+logger = logging.getLogger(__name__)
+
+# Positions in the server's asset rows: [id, symbol, name, type, group, payout, ..., is_open (14), ...]
+ASSET_ROW_ID = 0
+ASSET_ROW_SYMBOL = 1
+ASSET_ROW_NAME = 2
+ASSET_ROW_TYPE = 3
+ASSET_ROW_PAYOUT = 5
+ASSET_ROW_IS_OPEN = 14
+
+
+@dataclass
+class AssetInfo:
+    symbol: str # Canonical name accepted by place_order, e.g. "EURUSD_otc"
+    asset_id: Optional[int] = None
+    name: Optional[str] = None
+    asset_type: Optional[str] = None
+    is_open: Optional[bool] = None # None until the server has reported it
+    payout: Optional[float] = None
+    updated_at: Optional[float] = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"symbol": self.symbol, "asset_id": self.asset_id, "name": self.name, "type": self.asset_type,
+                "is_open": self.is_open, "payout": self.payout, "updated_at": self.updated_at}
+
+
+def normalize_symbol(symbol: str) -> str:
+    """
+    Normalizes an asset symbol or alias to a lookup key, e.g.
+    "EUR/USD OTC", "#eurusd_otc" and "EURUSD-OTC" all become "EURUSD_OTC".
+    """
+    key = re.sub(r'[\s/#.\-]', '', symbol.upper())
+    if key.endswith("_OTC"):
+        key = key[:-4]
+    elif key.endswith("OTC") and len(key) > 3:
+        key = key[:-3]
+    else:
+        return key.rstrip("_")
+    return f"{key.rstrip('_')}_OTC"
+
+
+class AssetIndex:
+    """
+    Args:
+        min_payout: Assets paying out less than this percentage are treated as unavailable.
+        stale_after_seconds: Open state and payout are ignored when no server update arrived for this long.
+    """
+
+    def __init__(self, min_payout: Optional[float] = None, stale_after_seconds: float = 900.0):
+        self.min_payout = min_payout
+        self.stale_after_seconds = stale_after_seconds
+        self._assets: dict[str, AssetInfo] = {}
+        self.last_update_at: Optional[float] = None
+        self._attached_client: Any = None
+
+        for symbol, asset_id in ASSETS.items():
+            self._assets[normalize_symbol(symbol)] = AssetInfo(symbol=symbol, asset_id=asset_id)
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the server has reported the asset list."""
+        return self.last_update_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return not self.is_loaded or time.time() - self.last_update_at > self.stale_after_seconds # type: ignore
+
+    def lookup(self, symbol: Optional[str]) -> Optional[AssetInfo]:
+        if not symbol:
+            return None
+        return self._assets.get(normalize_symbol(symbol))
+
+    def check(self, symbol: Optional[str]) -> tuple[Optional[AssetInfo], Optional[str]]:
+        """
+        Checks whether a signal on `symbol` can be traded.
+
+        Returns:
+            (asset_info, reason). `reason` is None when the asset can be traded, otherwise a
+            human-readable explanation. Open state and payout are only enforced while the
+            server data is fresh, so a missing asset list never blocks trading.
+        """
+        info = self.lookup(symbol)
+        if info is None:
+            return None, f"Unknown asset '{symbol}'."
+        if info.symbol not in ASSETS:
+            return info, f"Asset '{info.symbol}' is not supported by the Pocket Option client."
+        if self.is_stale:
+            return info, None
+        if info.is_open is False:
+            return info, f"Asset '{info.symbol}' is currently closed."
+        if self.min_payout is not None and info.payout is not None and info.payout < self.min_payout:
+            return info, f"Asset '{info.symbol}' payout {info.payout}% is below the minimum of {self.min_payout}%."
+        return info, None
+
+    def update_from_rows(self, rows: list) -> int:
+        """
+        Applies an asset list pushed by the server. Returns the number of assets updated.
+        """
+        now = time.time()
+        updated = 0
+        for row in rows:
+            if not isinstance(row, list) or len(row) <= ASSET_ROW_PAYOUT:
+                continue
+            try:
+                symbol = str(row[ASSET_ROW_SYMBOL]).lstrip("#")
+                key = normalize_symbol(symbol)
+                info = self._assets.get(key)
+                if info is None:
+                    info = self._assets[key] = AssetInfo(symbol=symbol)
+                info.asset_id = int(row[ASSET_ROW_ID])
+                info.name = row[ASSET_ROW_NAME]
+                info.asset_type = row[ASSET_ROW_TYPE]
+                info.payout = float(row[ASSET_ROW_PAYOUT]) if row[ASSET_ROW_PAYOUT] is not None else None
+                if len(row) > ASSET_ROW_IS_OPEN and isinstance(row[ASSET_ROW_IS_OPEN], bool):
+                    info.is_open = row[ASSET_ROW_IS_OPEN]
+                info.updated_at = now
+                updated += 1
+            except (TypeError, ValueError) as e:
+                logger.debug(f"Skipping malformed asset row {row[:6]}: {e}")
+        if updated:
+            self.last_update_at = now
+            logger.info(f"Asset index updated from server: {updated} assets.")
+        return updated
+
+    async def _on_json_data(self, data: Any) -> None:
+        # The asset list is a list of rows whose first item is the numeric asset ID
+        if isinstance(data, list) and data and isinstance(data[0], list) and len(data[0]) > ASSET_ROW_PAYOUT \
+                and isinstance(data[0][ASSET_ROW_ID], int):
+            self.update_from_rows(data)
+
+    def attach(self, client: Any) -> None:
+        """
+        Subscribes to the asset list pushed on `client`'s websocket. The asset list arrives as a
+        binary JSON frame that the client only exposes as the websocket-level "json_data" event.
+        """
+        if client is None or client is self._attached_client:
+            return
+        websocket = getattr(client, "_websocket", None)
+        if websocket is None or not hasattr(websocket, "add_event_handler"):
+            logger.warning("Pocket Option client does not expose its websocket. Asset availability will not be tracked.")
+            return
+        self.detach()
+        websocket.add_event_handler("json_data", self._on_json_data)
+        self._attached_client = client
+        logger.info("Asset index attached to Pocket Option client.")
+
+    def detach(self) -> None:
+        websocket = getattr(self._attached_client, "_websocket", None)
+        if websocket is not None and hasattr(websocket, "remove_event_handler"):
+            websocket.remove_event_handler("json_data", self._on_json_data)
+        self._attached_client = None
+
+    async def run_refresh_loop(self, get_client: Callable[[], Any], interval_seconds: float = 30.0) -> None:
+        """
+        Background task: follows client replacements (reconnects, credential swaps), which also
+        re-subscribes to the list a new connection is sent, and warns when the server has stopped
+        sending asset updates. It does not request the list itself; see `is_stale`.
+        """
+        warned_stale = False
+        while True:
+            try:
+                self.attach(get_client())
+                if self.is_loaded and self.is_stale and not warned_stale:
+                    logger.warning(f"No asset list update received for over {self.stale_after_seconds:.0f}s. Open state and payout checks are suspended.")
+                warned_stale = self.is_loaded and self.is_stale
+            except Exception as e:
+                logger.warning(f"Asset index refresh failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "loaded": self.is_loaded,
+            "stale": self.is_stale,
+            "last_update_at": self.last_update_at,
+            "min_payout": self.min_payout,
+            "assets": [info.to_dict() for info in sorted(self._assets.values(), key=lambda info: info.symbol)],
+        }
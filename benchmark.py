@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+Offline benchmark suite for the trader. Runs main.app against FakePocketOptionClient
+(no network, no credentials) in a temporary working directory and measures:
+
+  parse             parse_macrodroid_trade_data, per call
+  entry_time        resolving a signal's "HH:MM" entry time to the local entry instant, per call
+  admission         POST /trade_signal/batch round trip (one signal per request) under concurrent senders
+  signal_to_order   signal received -> order sent to the (fake) server, for a signal that is already due
+  reentry_gap       previous trade's expiry -> Martingale re-entry order acknowledged
+
+Results are compared against a JSON baseline; the run fails (exit code 1) when a
+benchmark's p95 is more than --threshold percent above its baseline p95 (the noisier
+event-loop benchmarks have a wider floor, see MIN_THRESHOLD_PERCENT). Each benchmark runs
+--repeat times and reports the run with the lowest p95.
+Baselines are machine specific: record one with --update-baseline on the machine
+that runs the comparison.
+
+Usage:
+  python benchmark.py                               # run and compare against benchmarks/baseline.json
+  python benchmark.py --update-baseline             # run and store the results as the new baseline
+  python benchmark.py --only parse admission --threshold 30 --output results.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional, Any
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+BENCHMARKS = ("parse", "entry_time", "admission", "signal_to_order", "reentry_gap")
+# Least allowed regression per benchmark, in percent. The sub-millisecond tails of the event-loop paths
+# (interleaved with the jobs and monitors they start) move by up to half between otherwise identical runs.
+MIN_THRESHOLD_PERCENT = {"admission": 60.0, "signal_to_order": 60.0}
+
+SIGNAL_TEMPLATE = "🇪🇺 {pair} 🇺🇸 OTC\n🕘 Expiration 5M\n⏺ Entry at {entry}\n{direction}\n\n🔼 1st level at {level1}\n🔼 2nd level at {level2}"
+PAIRS = ("EUR/USD", "GBP/USD", "AUD/CAD", "EUR/JPY", "USD/CHF")
+# Pairs of the signal-to-order samples; disjoint from PAIRS, whose past minutes the admission benchmark uses up
+ORDER_PAIRS = ("USD/JPY", "EUR/GBP", "AUD/USD", "NZD/USD", "USD/CAD")
+DIRECTIONS = ("🟩 BUY", "🟥 SELL")
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: list[float], unit: str) -> dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "unit": unit,
+        "samples": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(percentile(ordered, 50), 3),
+        "p95": round(percentile(ordered, 95), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def best_of(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    """The repeat with the lowest p95: noise from other processes only ever makes a run slower."""
+    return {**min(runs, key=lambda run: run["p95"]), "repeats": len(runs)}
+
+
+def signal_text(pair: str, entry: str, direction: str) -> str:
+    return SIGNAL_TEMPLATE.format(pair=pair, entry=entry, direction=direction, level1=entry, level2=entry)
+
+
+def prepare_environment(workdir: str, network_delay_ms: float) -> Any:
+    """Points main at throwaway state in `workdir`, swaps in the fake client and imports main."""
+    os.chdir(workdir)
+    os.environ.update({
+        "SSID": '42["auth",{"session":"benchmark","isDemo":1,"uid":1,"platform":2}]',
+        "UID": "1",
+        "ACCOUNT_TYPE": "DEMO",
+        "ACCOUNTS_FILE": os.path.join(workdir, "accounts.json"),
+        "COORDINATION_DB": os.path.join(workdir, "coordination.db"),
+        "TRADE_LEDGER_PATH": os.path.join(workdir, "trades.ledger"),
+        "LATENCY_PROBE_HOST": "localhost",
+        "CREDENTIAL_WATCH_INTERVAL_SECONDS": "3600",
+        "SIGNAL_RATE_PER_SECOND": "1000000", # Admission control is exercised, but never rejects
+        "ORDER_HEDGING": "0",
+    })
+    sys.path.insert(0, REPO_DIR)
+    import accounts
+    from fake_po_client import FakePocketOptionClient
+    accounts.AsyncPocketOptionClient = partial(FakePocketOptionClient, network_delay_seconds=network_delay_ms / 1000) # type: ignore
+    import main
+    logging.disable(logging.WARNING) # The trader logs every step at INFO; keep log I/O out of the measurements
+    return main
+
+
+def time_per_call(function: Any, arguments: list[tuple], samples: int, batch: int = 100) -> list[float]:
+    """Microseconds per call of `function`, one value per batch of `batch` calls (after a warm-up, with GC paused like timeit)."""
+    for args in arguments:
+        function(*args)
+    results = []
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(samples):
+            started = time.perf_counter()
+            for j in range(batch):
+                function(*arguments[(i + j) % len(arguments)])
+            results.append((time.perf_counter() - started) / batch * 1e6)
+    finally:
+        gc.enable()
+    return results
+
+
+def bench_parse(main: Any, samples: int) -> dict[str, Any]:
+    texts = [(signal_text(pair, f"{hour:02d}:{minute:02d}", direction),)
+             for pair in PAIRS for direction in DIRECTIONS for hour, minute in ((9, 5), (14, 30), (23, 55))]
+    return summarize(time_per_call(main.parse_macrodroid_trade_data, texts, samples), "us")
+
+
+def bench_entry_time(main: Any, samples: int) -> dict[str, Any]:
+    now = main.server_now()
+    entries = [(f"{hour:02d}:{minute:02d}", now) for hour in range(24) for minute in range(0, 60, 7)]
+    return summarize(time_per_call(main.resolve_entry_time, entries, samples), "us")
+
+
+def past_signals(main: Any, count: int) -> list[str]:
+    """Distinct signals whose entry time has passed, so their jobs finish right away as "skipped"."""
+    now = main.server_now()
+    signals = []
+    for pair in PAIRS:
+        for direction in DIRECTIONS:
+            for minute_of_day in range(24 * 60):
+                entry = f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+                if main.resolve_entry_time(entry, now) < now - timedelta(seconds=30):
+                    signals.append(signal_text(pair, entry, direction))
+                    if len(signals) == count:
+                        return signals
+    return signals
+
+
+async def bench_admission(main: Any, signals: list[str], concurrency: int) -> dict[str, Any]:
+    import httpx
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark") as http:
+        async def send(text: str, record: bool = True) -> None:
+            started = time.perf_counter()
+            response = await http.post("/trade_signal/batch", content=json.dumps({"text": text}) + "\n")
+            if record:
+                results.append((time.perf_counter() - started) * 1000)
+            ack = json.loads(response.text.splitlines()[0])
+            if ack["status"] not in ("queued", "running", "done"):
+                raise RuntimeError(f"Benchmark signal was not admitted: {ack}")
+        # The first batch warms up the client and the endpoint and is not measured
+        await asyncio.gather(*[send(text, record=False) for text in signals[:concurrency]])
+        for start in range(concurrency, len(signals), concurrency):
+            await asyncio.gather(*[send(text) for text in signals[start:start + concurrency]])
+    await drain_jobs(main)
+    return {**summarize(results, "ms"), "concurrency": concurrency}
+
+
+async def drain_jobs(main: Any) -> None:
+    tasks = [job.task for job in main.signal_jobs.pending() if job.task and not job.task.done()]
+    if tasks:
+        await asyncio.wait(tasks, timeout=30)
+    reset_accounts(main)
+
+
+def reset_accounts(main: Any) -> None:
+    """Stops the outcome monitors started by a benchmark and frees every account for the next sample."""
+    for task in asyncio.all_tasks():
+        if task.get_name().startswith(("martingale-monitor-", "signal-job-")):
+            task.cancel()
+    for account in main.trading_accounts:
+        if account.is_processing_trade_sequence:
+            main.release_trade_sequence(account)
+
+
+async def bench_signal_to_order(main: Any, samples: int, first_minute: int = 0) -> dict[str, Any]:
+    from clock_sync import ClockSync
+    account = main.trading_accounts.primary
+    results = []
+    # Virtual days run from 08:00 to 23:00 local time: clear of the early-morning rule that moves
+    # "HH:MM" entries to the previous day, and of midnight
+    today = datetime.now(main.settings_store.current.local_tz).replace(hour=8, minute=0, second=0, microsecond=0)
+    day_start = today.timestamp()
+    minutes_per_day = 15 * 60
+    for i in range(samples):
+        n = first_minute + i
+        # Run each sample on a virtual server clock 0.2s past its own minute, so the signal for that minute is due now.
+        # A further day uses the next pair, keeping every signal distinct.
+        target = day_start + 60 * (n % minutes_per_day)
+        pair = ORDER_PAIRS[(n // minutes_per_day) % len(ORDER_PAIRS)]
+        shift = target + 0.2 - time.time()
+        main.clock_sync = ClockSync(clock=lambda shift=shift: time.time() + shift)
+        entry = main.server_now().astimezone(main.settings_store.current.signal_tz).strftime("%H:%M")
+        placed_before = len(account.client.placed_orders)
+        started = time.time()
+        job, _ = await main.submit_signal(signal_text(pair, entry, DIRECTIONS[n % 2]), source="benchmark")
+        if job.task:
+            await job.task
+        if len(account.client.placed_orders) == placed_before:
+            raise RuntimeError(f"Benchmark signal did not place an order: {job.status} {job.error or job.result}")
+        placed_server_ts = account.client.placed_orders[placed_before][0]
+        results.append((placed_server_ts - account.client.clock_skew_seconds - started) * 1000)
+        reset_accounts(main)
+        await asyncio.sleep(0)
+    main.clock_sync = ClockSync()
+    return summarize(results, "ms")
+
+
+async def bench_reentry_gap(main: Any, samples: int) -> dict[str, Any]:
+    from pocketoptionapi_async import OrderDirection
+    account = main.trading_accounts.primary
+    duration = main.settings_store.current.trade_duration_seconds
+    results = []
+    for i in range(samples):
+        state = account.trade_sequence_state
+        state.update({"active": True, "asset": "EURUSD_otc", "direction": OrderDirection.CALL, "current_level": 0,
+                      "current_amount": account.initial_amount, "last_trade_id": f"benchmark-{i}", "last_trade_status": "pending",
+                      "last_trade_open_price": None, "last_trade_open_time": None})
+        account.is_processing_trade_sequence = True
+        main.coordinator.acquire_sequence(account.name, main.sequence_lease_seconds(account.sequence_settings))
+        # The previous trade expires now and the balance did not grow: a loss, so the monitor re-enters at level 1
+        balance = (await account.client.get_balance()).balance
+        entry_time = main.server_now() - timedelta(seconds=duration)
+        count_before = account.reentry_gap.count
+        await main.handle_trade_outcome_and_martingale(account, f"benchmark-{i}", duration, "EURUSD_otc", OrderDirection.CALL,
+                                                       account.initial_amount, balance, entry_time)
+        if account.reentry_gap.count == count_before:
+            raise RuntimeError("Benchmark trade did not re-enter.")
+        results.append(account.reentry_gap.snapshot()["last_ms"])
+        reset_accounts(main)
+        await asyncio.sleep(0)
+    return summarize(results, "ms")
+
+
+async def run_app_benchmarks(main: Any, selected: list[str], samples: int, concurrency: int, repeat: int) -> dict[str, dict[str, Any]]:
+    results: dict[str, dict[str, Any]] = {}
+    async with main.lifespan(main.app):
+        if not await main.wait_until_ready(30):
+            raise RuntimeError(f"Trader did not become ready: {main.readiness()}")
+        if "admission" in selected:
+            # Every repeat needs signals of its own, a repeated one would be answered as a duplicate
+            per_run = samples + concurrency
+            signals = past_signals(main, per_run * repeat)
+            results["admission"] = best_of([await bench_admission(main, signals[r * per_run:(r + 1) * per_run], concurrency)
+                                            for r in range(repeat)])
+        if "signal_to_order" in selected:
+            results["signal_to_order"] = best_of([await bench_signal_to_order(main, samples, first_minute=r * samples)
+                                                  for r in range(repeat)])
+        if "reentry_gap" in selected:
+            # Each sample includes the monitor's 50ms settle delay, so this one takes fewer samples
+            results["reentry_gap"] = best_of([await bench_reentry_gap(main, max(1, samples // 4)) for _ in range(repeat)])
+        reset_accounts(main)
+    return results
+
+
+def compare(results: dict[str, dict[str, Any]], baseline: Optional[dict[str, Any]], threshold_percent: float) -> list[str]:
+    """Prints the results next to the baseline. Returns the names of the benchmarks whose p95 regressed."""
+    regressions = []
+    print(f"{'benchmark':<16}{'unit':>6}{'p50':>12}{'p95':>12}{'baseline p95':>14}{'change':>10}  status")
+    for name, result in results.items():
+        reference = (baseline or {}).get("benchmarks", {}).get(name)
+        status, change = "new", ""
+        if reference:
+            delta = (result["p95"] - reference["p95"]) / reference["p95"] * 100 if reference["p95"] else 0.0
+            change = f"{delta:+.1f}%"
+            status = "ok"
+            allowed = max(threshold_percent, MIN_THRESHOLD_PERCENT.get(name, 0.0))
+            if delta > allowed:
+                status = f"REGRESSED (> {allowed:g}%)"
+                regressions.append(name)
+        print(f"{name:<16}{result['unit']:>6}{result['p50']:>12.3f}{result['p95']:>12.3f}"
+              f"{(reference['p95'] if reference else float('nan')):>14.3f}{change:>10}  {status}")
+    return regressions
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Pocket Option trader.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Benchmarks to run (default: all).")
+    parser.add_argument("--samples", type=int, default=200, help="Samples per benchmark (the Martingale re-entry takes a quarter of this).")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark; the run with the lowest p95 is reported.")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent senders in the admission benchmark.")
+    parser.add_argument("--network-delay-ms", type=float, default=0.0, help="One-way delay of the fake Pocket Option server.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file.")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCHMARK_REGRESSION_PERCENT", 25)),
+                        help="Allowed p95 regression against the baseline, in percent.")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline instead of comparing.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    selected = args.only or list(BENCHMARKS)
+    config = {"samples": args.samples, "repeat": args.repeat, "concurrency": args.concurrency, "network_delay_ms": args.network_delay_ms}
+    with tempfile.TemporaryDirectory(prefix="po-benchmark-") as workdir:
+        main = prepare_environment(workdir, args.network_delay_ms)
+        results: dict[str, dict[str, Any]] = {}
+        if "parse" in selected:
+            results["parse"] = best_of([bench_parse(main, args.samples) for _ in range(args.repeat)])
+        if "entry_time" in selected:
+            results["entry_time"] = best_of([bench_entry_time(main, args.samples) for _ in range(args.repeat)])
+        results.update(asyncio.run(run_app_benchmarks(main, selected, args.samples, args.concurrency, args.repeat)))
+        main.coordinator.close()
+        os.chdir(REPO_DIR)
+
+    report = {
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "benchmarks": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        compare(results, None, args.threshold)
+        print(f"\nBaseline written to {args.baseline}.")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}, this run uses {config}.")
+    else:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\np95 regressed beyond the allowed threshold: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
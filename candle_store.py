@@ -0,0 +1,278 @@
+"""
+candle_store.py
+
+On-disk store of historical candles: one file per asset and timeframe, made of
+fixed-width 48-byte records sorted by candle open time. Like the trade ledger
+the files have no header (record N starts at byte N * RECORD_SIZE), so a range
+query is a binary search on the timestamps followed by a slice of a
+numpy.memmap: a zero-copy view that only pages in the records it touches.
+numpy is optional; without it the same ranges are read with struct.
+
+Series are filled from the client's candle history (get_candles) incrementally:
+a sync only asks for the candles after the newest stored one (and, for a
+configured history horizon, before the oldest one). Only closed candles are
+stored. Gaps inside the stored range (e.g. market closures) are not refetched.
+"""
+import asyncio
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Any, Callable, Iterable, Iterator
+
+try:
+    import numpy as np
+except ImportError: # Optional: only needed for zero-copy views
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# ts (candle open, epoch seconds), open, high, low, close, volume
+RECORD_FORMAT = "<qddddd"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_DTYPE = np.dtype([
+    ("ts", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("volume", "<f8"),
+]) if np is not None else None
+FILE_SUFFIX = ".candles"
+
+Row = tuple[int, float, float, float, float, float]
+
+
+def candle_row(candle: Any) -> Row:
+    """Record tuple of a pocketoptionapi_async Candle."""
+    return (int(candle.timestamp.timestamp()), float(candle.open), float(candle.high), float(candle.low),
+            float(candle.close), float(candle.volume or 0.0))
+
+
+class CandleSeries:
+    """
+    Candles of one asset and timeframe.
+
+    Args:
+        path: Series file. Created on first write.
+        asset: Asset symbol, e.g. "EURUSD_otc".
+        timeframe: Candle length in seconds.
+    """
+
+    def __init__(self, path: str, asset: str, timeframe: int):
+        self.path = path
+        self.asset = asset
+        self.timeframe = timeframe
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self.path) // RECORD_SIZE
+        except OSError:
+            return 0
+
+    def _read(self, f: Any, index: int) -> Row:
+        f.seek(index * RECORD_SIZE)
+        return struct.unpack(RECORD_FORMAT, f.read(RECORD_SIZE))
+
+    @property
+    def first_ts(self) -> Optional[int]:
+        if not len(self):
+            return None
+        with open(self.path, "rb") as f:
+            return self._read(f, 0)[0]
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        count = len(self)
+        if not count:
+            return None
+        with open(self.path, "rb") as f:
+            return self._read(f, count - 1)[0]
+
+    def _bisect(self, f: Any, count: int, ts: int) -> int:
+        """Index of the first record with a timestamp >= `ts` (O(log n) record reads)."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self._read(f, middle)[0] < ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def append(self, rows: Iterable[Row]) -> int:
+        """
+        Appends the rows newer than the last stored candle, in timestamp order.
+
+        Returns:
+            The number of records written.
+        """
+        with self._lock:
+            last = self.last_ts
+            new = sorted({row[0]: row for row in rows if last is None or row[0] > last}.values())
+            if new:
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(struct.pack(RECORD_FORMAT, *row) for row in new))
+            return len(new)
+
+    def prepend(self, rows: Iterable[Row]) -> int:
+        """
+        Adds the rows older than the first stored candle. The file is rewritten (older records first)
+        and swapped in with os.replace, so readers never see a partial file.
+
+        Returns:
+            The number of records written.
+        """
+        with self._lock:
+            first = self.first_ts
+            new = sorted({row[0]: row for row in rows if first is None or row[0] < first}.values())
+            if not new:
+                return 0
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "wb") as out:
+                out.write(b"".join(struct.pack(RECORD_FORMAT, *row) for row in new))
+                if os.path.exists(self.path):
+                    with open(self.path, "rb") as existing:
+                        while chunk := existing.read(1 << 20):
+                            out.write(chunk)
+            os.replace(temporary, self.path)
+            return len(new)
+
+    def view(self, start: Optional[float] = None, end: Optional[float] = None) -> Any:
+        """
+        Candles with start <= ts < end as a structured numpy array (RECORD_DTYPE) that is a view of the
+        memory-mapped file: nothing outside the range is read and nothing is copied.
+        """
+        if np is None:
+            raise RuntimeError("numpy is required for candle views. Use records() instead.")
+        count = len(self)
+        if count == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        rows = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+        timestamps = rows["ts"]
+        low = int(np.searchsorted(timestamps, start, side="left")) if start is not None else 0
+        high = int(np.searchsorted(timestamps, end, side="left")) if end is not None else count
+        return rows[low:high]
+
+    def records(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Row]:
+        """Candles with start <= ts < end as record tuples, read without numpy."""
+        count = len(self)
+        if count == 0:
+            return
+        with open(self.path, "rb") as f:
+            low = self._bisect(f, count, start) if start is not None else 0 # type: ignore
+            high = self._bisect(f, count, end) if end is not None else count # type: ignore
+            f.seek(low * RECORD_SIZE)
+            yield from struct.iter_unpack(RECORD_FORMAT, f.read((high - low) * RECORD_SIZE))
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"asset": self.asset, "timeframe": self.timeframe, "candles": len(self),
+                "first_ts": self.first_ts, "last_ts": self.last_ts, "path": self.path}
+
+
+class CandleStore:
+    """
+    Args:
+        directory: Holds one "<asset>@<timeframe>.candles" file per series. Created on demand.
+        page_size: Candles requested per get_candles call.
+        max_pages: Upper bound on get_candles calls per direction and sync.
+    """
+
+    def __init__(self, directory: str = "candles", page_size: int = 1000, max_pages: int = 50):
+        self.directory = directory
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._series: dict[tuple[str, int], CandleSeries] = {}
+        self.syncs = 0
+        self.last_sync_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def path(self, asset: str, timeframe: int) -> str:
+        return os.path.join(self.directory, f"{re.sub(r'[^A-Za-z0-9_.-]', '-', asset)}@{timeframe}{FILE_SUFFIX}")
+
+    def series(self, asset: str, timeframe: int) -> CandleSeries:
+        key = (asset, timeframe)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = CandleSeries(self.path(asset, timeframe), asset, timeframe)
+        return series
+
+    async def sync(self, client: Any, asset: str, timeframe: int, since: Optional[float] = None,
+                   now: Callable[[], float] = time.time) -> dict[str, int]:
+        """
+        Fetches the closed candles missing after the newest stored one and, when `since` is given,
+        those missing between `since` and the oldest stored one.
+
+        Returns:
+            The number of candles appended and backfilled.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        series = self.series(asset, timeframe)
+        closed_until = now() - timeframe # Open time of the newest closed candle at most
+        last = series.last_ts
+
+        # Forward: page backwards from now until the page reaches the newest stored candle
+        fetched: dict[int, Row] = {}
+        end_time: Optional[datetime] = None
+        for _ in range(self.max_pages):
+            page = [row for row in map(candle_row, await client.get_candles(asset, timeframe, self.page_size, end_time))
+                    if row[0] <= closed_until and (last is None or row[0] > last) and row[0] not in fetched]
+            if not page:
+                break # Caught up, or the server ignores end_time and keeps sending the same candles
+            fetched.update((row[0], row) for row in page)
+            oldest = min(row[0] for row in page)
+            if last is None or oldest <= last + timeframe:
+                break # Without stored candles one page seeds the series; older ones are backfilled below
+            end_time = datetime.fromtimestamp(oldest)
+        appended = await asyncio.to_thread(series.append, fetched.values())
+
+        # Backward: page back from the oldest stored candle to `since`
+        backfill: dict[int, Row] = {}
+        first = series.first_ts
+        for _ in range(self.max_pages if since is not None else 0):
+            if first is None or first <= since:
+                break
+            page = [row for row in map(candle_row, await client.get_candles(asset, timeframe, self.page_size, datetime.fromtimestamp(first)))
+                    if since <= row[0] < first] # type: ignore
+            if not page:
+                break
+            backfill.update((row[0], row) for row in page)
+            first = min(row[0] for row in page)
+        backfilled = await asyncio.to_thread(series.prepend, backfill.values())
+
+        self.syncs += 1
+        self.last_sync_at = time.time()
+        if appended or backfilled:
+            logger.info(f"Candle store: {asset} {timeframe}s +{appended} new, +{backfilled} backfilled ({len(series)} stored).")
+        return {"appended": appended, "backfilled": backfilled}
+
+    async def run_sync_loop(self, get_client: Callable[[], Any], targets: list[tuple[str, int]], interval_seconds: float = 300.0,
+                            history_seconds: float = 0.0, should_sync: Callable[[], bool] = lambda: True) -> None:
+        """
+        Background task: syncs every (asset, timeframe) in `targets` each `interval_seconds`, backfilling
+        up to `history_seconds` into the past. Skips a round while `should_sync()` is False (e.g. on
+        workers that do not hold the sync lease) or the client is not connected. `should_sync` may block;
+        it runs in a thread.
+        """
+        while True:
+            client = get_client()
+            if client is not None and client.is_connected and await asyncio.to_thread(should_sync):
+                for asset, timeframe in targets:
+                    try:
+                        await self.sync(client, asset, timeframe, since=time.time() - history_seconds if history_seconds > 0 else None)
+                        self.last_error = None
+                    except Exception as e:
+                        self.last_error = f"{asset} {timeframe}s: {e}"
+                        logger.warning(f"Candle sync for {asset} {timeframe}s failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        series = {}
+        if os.path.isdir(self.directory):
+            for filename in sorted(os.listdir(self.directory)):
+                asset, _, timeframe = filename[:-len(FILE_SUFFIX)].rpartition("@")
+                if filename.endswith(FILE_SUFFIX) and timeframe.isdigit():
+                    # Series synced by another worker are only known from their file name
+                    known = next((s for s in self._series.values() if os.path.basename(s.path) == filename), None)
+                    series[filename[:-len(FILE_SUFFIX)]] = (known or CandleSeries(os.path.join(self.directory, filename), asset, int(timeframe))).snapshot()
+        return {"directory": self.directory, "syncs": self.syncs, "last_sync_at": self.last_sync_at,
+                "last_error": self.last_error, "series": series}
@@ -0,0 +1,175 @@
+"""
+circuit_breaker.py
+
+Circuit breaker around an account's Pocket Option calls (connect, place_order,
+get_balance). After `failure_threshold` consecutive failures the breaker opens:
+calls are refused immediately with CircuitOpenError instead of each signal
+waiting on its own reconnect and timeouts. While open, a background task probes
+the account every `recovery_seconds` and closes the breaker once a probe
+succeeds. Without a probe, the first call after `recovery_seconds` is let
+through as the trial (half-open).
+"""
+import asyncio
+import logging
+import time
+from typing import Optional, Any, Callable, Awaitable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling through while the breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open. Retry in {retry_after:.1f}s.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Args:
+        name: Shown in logs and metrics.
+        failure_threshold: Consecutive failures that open the breaker.
+        recovery_seconds: Time between recovery probes (or until the half-open trial call).
+        probe: Awaited in the background while open; returning True (without raising) closes the breaker.
+        clock: Monotonic time source, injectable for testing.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 10.0,
+                 probe: Optional[Callable[[], Awaitable[bool]]] = None, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.probe = probe
+        self._clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self.probes = 0
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != CLOSED and not self._trial_due()
+
+    def _trial_due(self) -> bool:
+        """Without a probe, an open breaker lets one call through after `recovery_seconds`."""
+        return (self.probe is None and self.state == OPEN and self.opened_at is not None
+                and self._clock() - self.opened_at >= self.recovery_seconds)
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.recovery_seconds - (self._clock() - self.opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may go through now. A refused call is counted; nothing is awaited."""
+        if self.state == CLOSED:
+            return True
+        if self._trial_due():
+            self.state = HALF_OPEN
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self) -> None:
+        """Raises CircuitOpenError when a call may not go through now."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"Circuit '{self.name}' closed after {self._clock() - (self.opened_at or self._clock()):.1f}s.")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self, error: Any = None) -> None:
+        self.consecutive_failures += 1
+        self.last_error = str(error) if error is not None else None
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self._open()
+
+    def _open(self) -> None:
+        if self.state == CLOSED:
+            self.times_opened += 1
+            logger.error(f"Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failure(s): {self.last_error}")
+        self.state = OPEN
+        self.opened_at = self._clock()
+        if self.probe is not None and (self._probe_task is None or self._probe_task.done()):
+            try:
+                self._probe_task = asyncio.get_running_loop().create_task(self._probe_until_closed(), name=f"circuit-probe-{self.name}")
+            except RuntimeError:
+                pass # No event loop (e.g. a synchronous caller); the next call from the loop starts the probe
+
+    async def call(self, operation: Callable[[], Awaitable[T]], ignore: tuple[type[BaseException], ...] = ()) -> T:
+        """
+        Awaits `operation()` through the breaker. Raises CircuitOpenError without calling it while open.
+        Exceptions of the `ignore` types are re-raised without counting as a success or a failure.
+        """
+        self.check()
+        try:
+            result = await operation()
+        except asyncio.CancelledError:
+            raise
+        except ignore:
+            if self.state == HALF_OPEN and self.probe is None:
+                self.state = OPEN # The trial told nothing about the connection; the next call is the trial again
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    async def _probe_until_closed(self) -> None:
+        while self.state != CLOSED:
+            await asyncio.sleep(self.recovery_seconds)
+            if self.state == CLOSED:
+                return
+            self.probes += 1
+            self.state = HALF_OPEN
+            try:
+                recovered = await self.probe() # type: ignore
+                if not recovered:
+                    self.last_error = "Recovery probe was not successful."
+            except Exception as e:
+                recovered = False
+                self.last_error = str(e)
+            if recovered:
+                self.record_success()
+            else:
+                logger.warning(f"Recovery probe for circuit '{self.name}' failed: {self.last_error}")
+                self._open()
+
+    def reset(self) -> None:
+        """Closes the breaker, e.g. after the account's session was replaced."""
+        self.stop()
+        self.record_success()
+
+    def stop(self) -> None:
+        if self._probe_task and not self._probe_task.done():
+            self._probe_task.cancel()
+        self._probe_task = None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_after_seconds": round(self.retry_after(), 3) if self.state != CLOSED else 0.0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "probes": self.probes,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,182 @@
+"""
+clock_sync.py
+
+Estimates the offset (and drift) between the host clock and the Pocket Option
+server clock from server timestamps carried in websocket messages, so entry
+and expiry times can be scheduled against "server now" instead of the host clock.
+
+Filtering follows NTP: samples are grouped into short buckets and only the
+sample with the smallest network delay in each bucket is kept. For request /
+response samples that is the minimum round trip; for one-way samples (price
+ticks carry only the server send time) it is the largest `server - local`
+difference, since network delay can only make that difference smaller. A line
+fitted through the kept samples gives the current offset and the drift rate.
+"""
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, tzinfo
+from typing import Optional, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClockSample:
+    server_ts: float
+    local_recv_ts: float
+    local_send_ts: Optional[float] = None # Set for request/response samples
+
+    @property
+    def is_two_way(self) -> bool:
+        return self.local_send_ts is not None
+
+    @property
+    def local_ts(self) -> float:
+        """Local time the server timestamp corresponds to (midpoint for request/response samples)."""
+        if self.local_send_ts is None:
+            return self.local_recv_ts
+        return (self.local_send_ts + self.local_recv_ts) / 2
+
+    @property
+    def offset(self) -> float:
+        return self.server_ts - self.local_ts
+
+    @property
+    def round_trip(self) -> Optional[float]:
+        return None if self.local_send_ts is None else self.local_recv_ts - self.local_send_ts
+
+
+class ClockSync:
+    """
+    Args:
+        bucket_seconds: Length of the filtering buckets; one (best) sample is kept per bucket.
+        max_buckets: Number of buckets used for the offset / drift fit.
+        max_drift_ppm: Drift estimates beyond this are treated as noise and clamped.
+        min_drift_span_seconds: Drift is only estimated once the kept samples span at least this long.
+        clock: Host clock, injectable for testing.
+    """
+
+    def __init__(self, bucket_seconds: float = 10.0, max_buckets: int = 30, max_drift_ppm: float = 500.0,
+                 min_drift_span_seconds: float = 60.0, clock: Callable[[], float] = time.time):
+        self.bucket_seconds = bucket_seconds
+        self.max_drift_ppm = max_drift_ppm
+        self.min_drift_span_seconds = min_drift_span_seconds
+        self._clock = clock
+        self._buckets: deque[tuple[int, ClockSample]] = deque(maxlen=max_buckets)
+        self._fit: Optional[tuple[float, float, float]] = None # (reference local ts, offset at reference, drift)
+        self.samples_seen = 0
+        self._attached_client: Any = None
+
+    @property
+    def is_synced(self) -> bool:
+        return bool(self._buckets)
+
+    def add_sample(self, server_ts: float, local_recv_ts: Optional[float] = None, local_send_ts: Optional[float] = None) -> None:
+        """
+        Records one server timestamp.
+
+        Args:
+            server_ts: Server time (epoch seconds) carried by the message.
+            local_recv_ts: Host time the message was received. Defaults to now.
+            local_send_ts: Host time the request was sent, for request/response pairs.
+        """
+        sample = ClockSample(server_ts, local_recv_ts if local_recv_ts is not None else self._clock(), local_send_ts)
+        self.samples_seen += 1
+        bucket = int(sample.local_ts // self.bucket_seconds)
+        if self._buckets and self._buckets[-1][0] == bucket:
+            if self._is_better(sample, self._buckets[-1][1]):
+                self._buckets[-1] = (bucket, sample)
+                self._fit = None
+        elif not self._buckets or bucket > self._buckets[-1][0]:
+            self._buckets.append((bucket, sample))
+            self._fit = None
+
+    @staticmethod
+    def _is_better(sample: ClockSample, current: ClockSample) -> bool:
+        if sample.is_two_way != current.is_two_way:
+            return sample.is_two_way # Request/response samples carry a real delay bound
+        if sample.is_two_way:
+            return sample.round_trip < current.round_trip # type: ignore
+        return sample.offset > current.offset
+
+    def _fit_line(self) -> tuple[float, float, float]:
+        if self._fit is None:
+            points = [(sample.local_ts, sample.offset) for _, sample in self._buckets]
+            mean_t = sum(t for t, _ in points) / len(points)
+            mean_o = sum(o for _, o in points) / len(points)
+            drift = 0.0
+            variance = sum((t - mean_t) ** 2 for t, _ in points)
+            span = points[-1][0] - points[0][0]
+            if len(points) >= 3 and span >= self.min_drift_span_seconds and variance > 0:
+                drift = sum((t - mean_t) * (o - mean_o) for t, o in points) / variance
+                limit = self.max_drift_ppm / 1e6
+                drift = max(-limit, min(limit, drift))
+            self._fit = (mean_t, mean_o, drift)
+        return self._fit
+
+    def offset(self, local_ts: Optional[float] = None) -> float:
+        """Estimated `server - local` offset in seconds at `local_ts` (default: now). 0.0 until synced."""
+        if not self._buckets:
+            return 0.0
+        reference_t, reference_offset, drift = self._fit_line()
+        if local_ts is None:
+            local_ts = self._clock()
+        return reference_offset + drift * (local_ts - reference_t)
+
+    @property
+    def drift_ppm(self) -> float:
+        return self._fit_line()[2] * 1e6 if self._buckets else 0.0
+
+    def server_time(self) -> float:
+        """Current server time as epoch seconds."""
+        local_ts = self._clock()
+        return local_ts + self.offset(local_ts)
+
+    def server_now(self, tz: Optional[tzinfo] = None) -> datetime:
+        """Current server time as an aware datetime in `tz` (a drop-in for datetime.now(tz))."""
+        return datetime.fromtimestamp(self.server_time(), tz)
+
+    def to_server_time(self, local_ts: float) -> float:
+        return local_ts + self.offset(local_ts)
+
+    async def _on_json_data(self, data: Any) -> None:
+        # Price ticks: [["EURUSD_otc", <server epoch seconds>, <price>], ...]
+        if not isinstance(data, list):
+            return
+        received_at = self._clock()
+        newest = None
+        for tick in data:
+            if isinstance(tick, list) and len(tick) >= 3 and isinstance(tick[0], str) and isinstance(tick[1], (int, float)):
+                newest = tick[1] if newest is None else max(newest, tick[1])
+        if newest is not None:
+            self.add_sample(float(newest), received_at)
+
+    def attach(self, client: Any) -> None:
+        """Subscribes to the price ticks on `client`'s websocket (the "json_data" event)."""
+        if client is None or client is self._attached_client:
+            return
+        websocket = getattr(client, "_websocket", None)
+        if websocket is None or not hasattr(websocket, "add_event_handler"):
+            logger.warning("Pocket Option client does not expose its websocket. Using the host clock for entry timing.")
+            return
+        self.detach()
+        websocket.add_event_handler("json_data", self._on_json_data)
+        self._attached_client = client
+        logger.info("Clock sync attached to Pocket Option client.")
+
+    def detach(self) -> None:
+        websocket = getattr(self._attached_client, "_websocket", None)
+        if websocket is not None and hasattr(websocket, "remove_event_handler"):
+            websocket.remove_event_handler("json_data", self._on_json_data)
+        self._attached_client = None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "synced": self.is_synced,
+            "offset_ms": round(self.offset() * 1000, 3),
+            "drift_ppm": round(self.drift_ppm, 3),
+            "samples_seen": self.samples_seen,
+            "buckets": len(self._buckets),
+        }
@@ -0,0 +1,344 @@
+"""
+coordination.py
+
+Cross-process coordination for running main.app with several uvicorn workers.
+Each worker keeps its own clients and in-memory caches; this module makes the
+decisions that must be unique across workers through a local SQLite database
+(no external service):
+
+- Sequence ownership: a worker must hold an account's sequence lease before it
+  places orders on that account. Leases expire, so a crashed worker's sequence
+  is taken over after its TTL instead of blocking the account forever.
+- Signal keys: the first worker to claim an idempotency / content key processes
+  the signal, every other worker answers it as a duplicate.
+- Trade journal: an append-only log of sequence and order events from all workers.
+- Named leases: background work only one worker should do (e.g. candle sync),
+  kept apart from the account sequence leases.
+
+Every decision is a single short write transaction (BEGIN IMMEDIATE), which
+SQLite serializes across processes. The database runs in WAL mode so readers
+never block the writers. A decision can still wait up to the busy timeout for
+another worker's transaction, so async callers go through Coordinator.run: it
+tries the decision right away without waiting, and only when the database is
+busy hands it to a thread. Journal entries and lease releases nobody waits for
+are applied by a background writer thread with its own connection.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Any, Callable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Set by Coordinator.run while it tries a decision on the event loop: nothing may wait on the database then
+_no_wait = contextvars.ContextVar("coordination_no_wait", default=False)
+
+
+class _DatabaseBusy(Exception):
+    """The decision would have had to wait for the database (only raised while _no_wait is set)."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sequence_leases (
+    account TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    acquired_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS named_leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    acquired_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signal_keys (
+    key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trade_journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    owner TEXT NOT NULL,
+    account TEXT,
+    event TEXT NOT NULL,
+    trade_id TEXT,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS trade_journal_account ON trade_journal (account, id);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Coordinator:
+    """
+    Args:
+        path: SQLite database file shared by all workers on this host.
+        worker_id: Identity of this worker in leases and the journal. Defaults to "<hostname>:<pid>".
+        clock: Wall clock (shared across processes), injectable for testing.
+        busy_timeout_seconds: Longest wait for another worker's write transaction.
+
+    Nothing touches the database until open() is called.
+    """
+
+    def __init__(self, path: str = "coordination.db", worker_id: Optional[str] = None,
+                 clock: Callable[[], float] = time.time, busy_timeout_seconds: float = 5.0):
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self._clock = clock
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._lock = threading.Lock() # One connection per worker for the decisions, shared by helper threads
+        self._conn: Optional[sqlite3.Connection] = None
+        self._deferred: queue.Queue[Optional[Callable[[sqlite3.Connection, float], Any]]] = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._held: dict[str, float] = {} # acquired_at of this worker's sequence leases, so a late release cannot drop a newer lease
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def open(self) -> None:
+        """Opens (and creates) the database and starts the background writer."""
+        if self._conn is not None:
+            return
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._run_writer, name="coordination-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"Coordination database {self.path} opened by worker {self.worker_id}.")
+
+    async def run(self, decision: Callable[..., T], *args: Any) -> T:
+        """
+        Runs `decision(*args)` (e.g. claim_signal_key) for the event loop without blocking it: right away when
+        the database is free, otherwise in a thread that waits up to the busy timeout.
+        """
+        token = _no_wait.set(True)
+        try:
+            return decision(*args)
+        except _DatabaseBusy:
+            pass
+        finally:
+            _no_wait.reset(token)
+        return await asyncio.to_thread(decision, *args)
+
+    @contextmanager
+    def _locked(self) -> Iterator[sqlite3.Connection]:
+        if not self._lock.acquire(blocking=not _no_wait.get()):
+            raise _DatabaseBusy()
+        try:
+            yield self._connection()
+        finally:
+            self._lock.release()
+
+    def _write(self, operation: Callable[[sqlite3.Connection, float], Any]) -> Any:
+        """Runs `operation(conn, now)` in one write transaction that other workers cannot interleave with."""
+        with self._locked() as conn:
+            if not _no_wait.get():
+                return self._transaction(conn, operation)
+            conn.execute("PRAGMA busy_timeout = 0")
+            try:
+                return self._transaction(conn, operation)
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e) or "busy" in str(e):
+                    raise _DatabaseBusy() from e # Nothing was written: the write lock is taken by BEGIN IMMEDIATE
+                raise
+            finally:
+                conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_seconds * 1000)}")
+
+    def _transaction(self, conn: sqlite3.Connection, operation: Callable[[sqlite3.Connection, float], Any]) -> Any:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation(conn, self._clock())
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise RuntimeError(f"Coordination database {self.path} is not open.")
+        return self._conn
+
+    def _defer(self, operation: Callable[[sqlite3.Connection, float], Any]) -> None:
+        """Queues a write for the background writer. Writes are applied in order; open() starts the writer."""
+        self._deferred.put(operation)
+
+    def _run_writer(self) -> None:
+        """Background writer: applies the queued writes, batching whatever has accumulated into one transaction."""
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self._deferred.get()]
+                while True:
+                    try:
+                        batch.append(self._deferred.get_nowait())
+                    except queue.Empty:
+                        break
+                operations = [operation for operation in batch if operation is not None]
+                if operations:
+                    try:
+                        self._transaction(conn, lambda conn, now: [operation(conn, now) for operation in operations])
+                    except sqlite3.Error as e:
+                        logger.warning(f"Failed to apply {len(operations)} deferred coordination write(s): {e}")
+                if len(operations) != len(batch):
+                    return # close() was called; everything queued before it is written
+        finally:
+            conn.close()
+
+    # --- Sequence ownership ---
+
+    def acquire_sequence(self, account: str, ttl_seconds: float) -> bool:
+        """
+        Takes the sequence lease for `account`. Succeeds when the account is free, its lease has
+        expired, or this worker already holds it (the lease is then extended).
+        """
+        def operation(conn: sqlite3.Connection, now: float) -> bool:
+            row = conn.execute("SELECT owner, expires_at FROM sequence_leases WHERE account = ?", (account,)).fetchone()
+            if row and row[0] != self.worker_id and row[1] > now:
+                return False
+            if row and row[0] != self.worker_id:
+                logger.warning(f"Taking over expired sequence lease for account '{account}' from worker {row[0]}.")
+            conn.execute("INSERT OR REPLACE INTO sequence_leases (account, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?)",
+                         (account, self.worker_id, now, now + ttl_seconds))
+            self._held[account] = now
+            return True
+        return self._write(operation)
+
+    def renew_sequence(self, account: str, ttl_seconds: float) -> bool:
+        """Extends this worker's lease on `account`. Returns False if the lease was lost."""
+        def operation(conn: sqlite3.Connection, now: float) -> bool:
+            cursor = conn.execute("UPDATE sequence_leases SET expires_at = ? WHERE account = ? AND owner = ?",
+                                  (now + ttl_seconds, account, self.worker_id))
+            return cursor.rowcount == 1
+        return self._write(operation)
+
+    def release_sequence(self, account: str) -> None:
+        """Releases this worker's lease on `account` in the background. A lease taken again meanwhile is kept."""
+        acquired_at = self._held.pop(account, None)
+        if acquired_at is None:
+            self._defer(lambda conn, now: conn.execute("DELETE FROM sequence_leases WHERE account = ? AND owner = ?",
+                                                        (account, self.worker_id)))
+        else:
+            self._defer(lambda conn, now: conn.execute("DELETE FROM sequence_leases WHERE account = ? AND owner = ? AND acquired_at = ?",
+                                                        (account, self.worker_id, acquired_at)))
+
+    def sequence_owner(self, account: str) -> Optional[str]:
+        """Worker currently holding the (unexpired) lease on `account`, if any."""
+        with self._locked() as conn:
+            row = conn.execute("SELECT owner FROM sequence_leases WHERE account = ? AND expires_at > ?",
+                                     (account, self._clock())).fetchone()
+        return row[0] if row else None
+
+    # --- Named leases ---
+
+    def acquire_lease(self, name: str, ttl_seconds: float) -> bool:
+        """
+        Takes or extends the lease `name` for background work only one worker should do (e.g. candle sync).
+        Succeeds when the lease is free, expired or already held by this worker.
+        """
+        def operation(conn: sqlite3.Connection, now: float) -> bool:
+            row = conn.execute("SELECT owner, expires_at, acquired_at FROM named_leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != self.worker_id and row[1] > now:
+                return False
+            acquired_at = row[2] if row and row[0] == self.worker_id else now
+            conn.execute("INSERT OR REPLACE INTO named_leases (name, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?)",
+                         (name, self.worker_id, acquired_at, now + ttl_seconds))
+            return True
+        return self._write(operation)
+
+    # --- Signal keys ---
+
+    def claim_signal_key(self, key: Optional[str], job_id: str, ttl_seconds: float) -> Optional[tuple[str, str]]:
+        """
+        Claims `key` for `job_id`.
+
+        Returns:
+            None when the claim succeeded (or `key` is None), otherwise (job_id, worker_id) of the
+            existing unexpired claim.
+        """
+        if key is None:
+            return None
+
+        def operation(conn: sqlite3.Connection, now: float) -> Optional[tuple[str, str]]:
+            row = conn.execute("SELECT job_id, owner FROM signal_keys WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            if row and row[0] != job_id:
+                return row[0], row[1]
+            conn.execute("INSERT OR REPLACE INTO signal_keys (key, job_id, owner, expires_at) VALUES (?, ?, ?, ?)",
+                         (key, job_id, self.worker_id, now + ttl_seconds))
+            return None
+        return self._write(operation)
+
+    def release_signal_keys(self, job_id: str) -> None:
+        """Drops every key claimed for `job_id`, so a failed signal can be retried on any worker."""
+        self._write(lambda conn, now: conn.execute("DELETE FROM signal_keys WHERE job_id = ? OR expires_at <= ?", (job_id, now)))
+
+    # --- Trade journal ---
+
+    def journal(self, event: str, account: Optional[str] = None, trade_id: Optional[str] = None, **details: Any) -> None:
+        """
+        Appends one event to the shared trade journal. The entry is written by the background writer (stamped
+        with the time it was journaled), so this never waits on the database. Journal failures are logged, never raised.
+        """
+        ts = self._clock()
+        trade_id = str(trade_id) if trade_id is not None else None
+        encoded = json.dumps(details, default=str) if details else None
+        self._defer(lambda conn, now: conn.execute(
+            "INSERT INTO trade_journal (ts, owner, account, event, trade_id, details) VALUES (?, ?, ?, ?, ?, ?)",
+            (ts, self.worker_id, account, event, trade_id, encoded)))
+
+    def recent_journal(self, limit: int = 100, account: Optional[str] = None) -> list[dict[str, Any]]:
+        query = "SELECT id, ts, owner, account, event, trade_id, details FROM trade_journal"
+        params: tuple = ()
+        if account:
+            query += " WHERE account = ?"
+            params = (account,)
+        query += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._connection().execute(query, params + (limit,)).fetchall()
+        return [{"id": row[0], "ts": row[1], "worker": row[2], "account": row[3], "event": row[4], "trade_id": row[5],
+                 "details": json.loads(row[6]) if row[6] else {}} for row in rows]
+
+    def snapshot(self) -> dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            conn = self._connection()
+            leases = conn.execute("SELECT account, owner, acquired_at, expires_at FROM sequence_leases").fetchall()
+            named_leases = conn.execute("SELECT name, owner, acquired_at, expires_at FROM named_leases").fetchall()
+            signal_keys = conn.execute("SELECT COUNT(*) FROM signal_keys WHERE expires_at > ?", (now,)).fetchone()[0]
+        return {
+            "worker_id": self.worker_id,
+            "database": self.path,
+            "leases": [{"account": row[0], "worker": row[1], "acquired_at": row[2], "expires_at": row[3], "expired": row[3] <= now}
+                       for row in leases],
+            "named_leases": [{"name": row[0], "worker": row[1], "acquired_at": row[2], "expires_at": row[3], "expired": row[3] <= now}
+                             for row in named_leases],
+            "signal_keys": signal_keys,
+            "deferred_writes": self._deferred.qsize(),
+        }
+
+    def close(self) -> None:
+        """Writes the queued journal entries and releases, then closes the database."""
+        if self._writer is not None:
+            self._deferred.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
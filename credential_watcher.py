@@ -0,0 +1,109 @@
+"""
+credential_watcher.py
+
+Watches the credential files (.env written by scraper.py, accounts.json) for a
+refreshed SSID and hands each changed session to a callback, so the trader can
+rotate sessions without a restart. Change detection is a cheap mtime poll; the
+files are only parsed after their modification time moved.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Any, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialWatcher:
+    """
+    Args:
+        paths: Files to watch. Missing files are fine (they may be created later).
+        load_credentials: Returns the current {account name: SSID} mapping from disk.
+        on_change: Awaited with (account name, new SSID) for every changed SSID. Returns
+            True when the new session was applied (or staged), False when it was rejected.
+        interval_seconds: Poll interval.
+        settle_seconds: Delay between noticing a change and reading the files, so a file that
+            is still being written is not read half-way.
+    """
+
+    def __init__(self, paths: list[str], load_credentials: Callable[[], dict[str, str]],
+                 on_change: Callable[[str, str], Awaitable[bool]], interval_seconds: float = 5.0,
+                 settle_seconds: float = 0.5):
+        self.paths = paths
+        self.load_credentials = load_credentials
+        self.on_change = on_change
+        self.interval_seconds = interval_seconds
+        self.settle_seconds = settle_seconds
+        self._mtimes = self._read_mtimes()
+        self._known: dict[str, str] = {}
+        try:
+            self._known = load_credentials()
+        except Exception as e:
+            logger.warning(f"Could not read the initial credentials: {e}")
+        self.last_check_at: Optional[float] = None
+        self.last_results: dict[str, dict[str, Any]] = {}
+
+    def _read_mtimes(self) -> dict[str, Optional[float]]:
+        mtimes: dict[str, Optional[float]] = {}
+        for path in self.paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    async def check(self, force: bool = False) -> dict[str, bool]:
+        """
+        Applies changed SSIDs. Without `force` the files are only read when one of them was modified;
+        with `force` every SSID on disk is offered again, including previously rejected ones.
+
+        Returns:
+            {account name: applied} for every account whose SSID was offered.
+        """
+        self.last_check_at = time.time()
+        mtimes = self._read_mtimes()
+        if not force and mtimes == self._mtimes:
+            return {}
+        if not force:
+            await asyncio.sleep(self.settle_seconds)
+            mtimes = self._read_mtimes()
+        self._mtimes = mtimes
+        try:
+            credentials = self.load_credentials()
+        except Exception as e:
+            logger.warning(f"Could not read refreshed credentials: {e}")
+            return {}
+
+        results: dict[str, bool] = {}
+        for name, ssid in credentials.items():
+            if self._known.get(name) == ssid and not force:
+                continue
+            logger.info(f"Refreshed SSID detected for account '{name}'.")
+            try:
+                applied = await self.on_change(name, ssid)
+            except Exception as e:
+                logger.error(f"Failed to apply the refreshed SSID for account '{name}': {e}", exc_info=True)
+                applied = False
+            # A rejected SSID is only retried by a forced reload
+            self._known[name] = ssid
+            results[name] = applied
+            self.last_results[name] = {"applied": applied, "at": time.time()}
+        return results
+
+    async def run(self) -> None:
+        """Background task: polls the files every `interval_seconds`."""
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.warning(f"Credential check failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "paths": self.paths,
+            "interval_seconds": self.interval_seconds,
+            "last_check_at": self.last_check_at,
+            "last_results": self.last_results,
+        }
@@ -0,0 +1,289 @@
+"""
+fake_po_client.py
+
+In-process stand-in for AsyncPocketOptionClient, for running the trader offline
+(benchmarks, clock-sync checks, dry runs). It implements the client methods
+main.py uses and pushes the same websocket "json_data" payloads as the real
+server (asset list, price ticks), with an injectable server clock skew and
+network delay.
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Any, Callable, Union
+
+from pocketoptionapi_async import OrderDirection
+from pocketoptionapi_async.constants import ASSETS
+from pocketoptionapi_async.models import Balance, Candle, Order, OrderResult, OrderStatus
+
+
+class FakeWebSocket:
+    """Mimics the event handler registry of the client's internal websocket."""
+
+    def __init__(self):
+        self._event_handlers: dict[str, list[Callable]] = {}
+
+    def add_event_handler(self, event: str, handler: Callable) -> None:
+        self._event_handlers.setdefault(event, []).append(handler)
+
+    def remove_event_handler(self, event: str, handler: Callable) -> None:
+        try:
+            self._event_handlers.get(event, []).remove(handler)
+        except ValueError:
+            pass
+
+    async def emit(self, event: str, data: Any) -> None:
+        for handler in list(self._event_handlers.get(event, [])):
+            if asyncio.iscoroutinefunction(handler):
+                await handler(data)
+            else:
+                handler(data)
+
+
+class FakePocketOptionClient:
+    """
+    Args:
+        ssid: Ignored, accepted for signature compatibility.
+        is_demo: Reported in the balance.
+        clock_skew_seconds: Server clock minus host clock.
+        network_delay_seconds: One-way delay applied to pushed messages and to each API call.
+        balance: Starting balance.
+        payout: Fraction of the stake paid on a win (0.92 = 92%).
+        outcome: Callable(order) -> "win" | "loss" deciding each trade. Defaults to always win.
+        connect_failures: Number of connect() calls that fail before connecting succeeds.
+    """
+
+    def __init__(self, ssid: str = "fake", is_demo: bool = True, clock_skew_seconds: float = 0.0,
+                 network_delay_seconds: float = 0.0, balance: float = 1000.0, payout: float = 0.92,
+                 outcome: Optional[Callable[[OrderResult], str]] = None, connect_failures: int = 0, **kwargs):
+        self.raw_ssid = ssid
+        self.is_demo = is_demo
+        self.clock_skew_seconds = clock_skew_seconds
+        self.network_delay_seconds = network_delay_seconds
+        self.payout = payout
+        self.outcome = outcome or (lambda order: "win")
+        self.connect_failures = connect_failures
+        self._websocket = FakeWebSocket()
+        self._balance = balance
+        self._connected = False
+        self._event_callbacks: dict[str, list[Callable]] = {}
+        self._active_orders: dict[str, OrderResult] = {}
+        self._order_results: dict[str, OrderResult] = {}
+        self._order_acks: dict[str, asyncio.Event] = {}
+        self.placed_orders: list[tuple[float, OrderResult]] = [] # (server time at placement, order)
+        self.sent_messages: list[str] = []
+        self._connection_stats = {"total_connections": 0, "successful_connections": 0, "messages_sent": 0}
+
+    def server_time(self) -> float:
+        return time.time() + self.clock_skew_seconds
+
+    async def _network(self) -> None:
+        if self.network_delay_seconds:
+            await asyncio.sleep(self.network_delay_seconds)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def connect(self, regions: Optional[list[str]] = None, persistent: Optional[bool] = None) -> bool:
+        self._connection_stats["total_connections"] += 1
+        await self._network()
+        if self.connect_failures > 0:
+            self.connect_failures -= 1
+            return False
+        self._connected = True
+        self._connection_stats["successful_connections"] += 1
+        await self.emit_asset_list()
+        return True
+
+    async def disconnect(self) -> None:
+        self._connected = False
+
+    async def send_message(self, message: str) -> bool:
+        if not self._connected:
+            return False
+        self.sent_messages.append(message)
+        self._connection_stats["messages_sent"] += 1
+        return True
+
+    def get_connection_stats(self) -> dict[str, Any]:
+        return {**self._connection_stats, "websocket_connected": self._connected, "fake": True}
+
+    def add_event_callback(self, event: str, callback: Callable) -> None:
+        self._event_callbacks.setdefault(event, []).append(callback)
+
+    def remove_event_callback(self, event: str, callback: Callable) -> None:
+        try:
+            self._event_callbacks.get(event, []).remove(callback)
+        except ValueError:
+            pass
+
+    async def get_balance(self) -> Balance:
+        if not self._connected:
+            raise ConnectionError("Not connected to PocketOption")
+        await self._network()
+        return Balance(balance=round(self._balance, 2), currency="USD", is_demo=self.is_demo)
+
+    async def place_order(self, asset: str, amount: float, direction: OrderDirection, duration: int) -> OrderResult:
+        order = Order(asset=asset, amount=amount, direction=direction, duration=duration)
+        await self._send_order(order)
+        return await self._wait_for_order_result(order.request_id, order)
+
+    async def _send_order(self, order: Order) -> None:
+        """Like the real client: the "openOrder" message is sent and acknowledged later by the server."""
+        if not self._connected:
+            raise ConnectionError("Not connected to PocketOption")
+        if order.asset not in ASSETS:
+            raise ValueError(f"Invalid asset: {order.asset}")
+        self._order_acks.setdefault(order.request_id, asyncio.Event()) # type: ignore
+        self._connection_stats["messages_sent"] += 1
+        asyncio.get_running_loop().create_task(self._open_order(order))
+
+    async def _open_order(self, order: Order) -> None:
+        await self._network() # Request on its way to the server
+        placed_server_ts = self.server_time()
+        now = datetime.now()
+        result = OrderResult(order_id=order.request_id, asset=order.asset, amount=order.amount, direction=order.direction, # type: ignore
+                             duration=order.duration, status=OrderStatus.ACTIVE, placed_at=now,
+                             expires_at=now + timedelta(seconds=order.duration), payout=self.payout)
+        # Every send opens a position, also a repeated requestId (the worst case for hedged retries)
+        self._balance -= order.amount
+        self.placed_orders.append((placed_server_ts, result))
+        await self._network() # Acknowledgement on its way back
+        self._active_orders[result.order_id] = result
+        self._order_acks[result.order_id].set()
+        asyncio.get_running_loop().call_later(order.duration, self._settle, result.order_id)
+
+    async def _wait_for_order_result(self, request_id: str, order: Order, timeout: float = 30.0) -> OrderResult:
+        try:
+            await asyncio.wait_for(self._order_acks.setdefault(request_id, asyncio.Event()).wait(), timeout)
+        except asyncio.TimeoutError:
+            now = datetime.now()
+            return OrderResult(order_id=request_id, asset=order.asset, amount=order.amount, direction=order.direction,
+                               duration=order.duration, status=OrderStatus.ACTIVE, placed_at=now,
+                               expires_at=now + timedelta(seconds=order.duration), error_message="Timeout waiting for server confirmation")
+        return self._active_orders.get(request_id) or self._order_results[request_id]
+
+    def _settle(self, order_id: str) -> None:
+        order = self._active_orders.pop(order_id, None)
+        if order is None:
+            return
+        won = self.outcome(order) == "win"
+        profit = order.amount * self.payout if won else -order.amount
+        if won:
+            self._balance += order.amount + profit
+        self._order_results[order_id] = order.model_copy(update={
+            "status": OrderStatus.WIN if won else OrderStatus.LOSE, "profit": profit})
+
+    async def check_order_result(self, order_id: str) -> Optional[OrderResult]:
+        return self._order_results.get(order_id) or self._active_orders.get(order_id)
+
+    async def get_active_orders(self) -> list[OrderResult]:
+        return list(self._active_orders.values())
+
+    async def get_candles(self, asset: str, timeframe: Union[str, int], count: int = 100,
+                          end_time: Optional[datetime] = None) -> list[Candle]:
+        """Deterministic synthetic candles ending at `end_time` (default: now)."""
+        if not self._connected:
+            raise ConnectionError("Not connected to PocketOption")
+        await self._network()
+        timeframe_seconds = timeframe if isinstance(timeframe, int) else {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}.get(timeframe, 60)
+        end_ts = int((end_time or datetime.now()).timestamp()) // timeframe_seconds * timeframe_seconds
+        candles = []
+        for i in range(count, 0, -1):
+            ts = end_ts - i * timeframe_seconds
+            base = 1.0 + (ts % 86400) / 1e6
+            candles.append(Candle(timestamp=datetime.fromtimestamp(ts), open=base, high=base + 0.0005,
+                                  low=base - 0.0005, close=base + 0.0001, volume=1.0, asset=asset,
+                                  timeframe=timeframe_seconds))
+        return candles
+
+    async def emit_stream_tick(self, asset: str = "EURUSD_otc", price: float = 1.0) -> None:
+        """Pushes one price tick stamped with the (skewed) server time, delivered after the network delay."""
+        server_ts = self.server_time()
+        await self._network()
+        await self._websocket.emit("json_data", [[asset, server_ts, price]])
+
+    async def emit_asset_list(self, closed: tuple[str, ...] = (), payout_percent: Optional[int] = None) -> None:
+        """Pushes the asset list in the server's row format."""
+        payout = payout_percent if payout_percent is not None else int(self.payout * 100)
+        rows = [[asset_id, symbol, symbol, "currency", 1, payout, 60, 30, 3, 0, 170, 0, [], 0, symbol not in closed]
+                for symbol, asset_id in ASSETS.items()]
+        await self._websocket.emit("json_data", rows)
+
+
+class StubPocketOptionServer:
+    """
+    Local stand-in for the website and the websocket auth handshake, for exercising
+    session_refresh.HttpSessionRefresher offline. The cabinet page is served only with the
+    `valid_cookie` cookie (otherwise it redirects to the login page) and embeds `session` and
+    `uid`; the websocket accepts an auth message only for `session`.
+    """
+
+    def __init__(self, session: str = "stub-session", uid: int = 12345, valid_cookie: tuple[str, str] = ("ci_session", "valid"),
+                 host: str = "127.0.0.1", port: int = 0):
+        self.session = session
+        self.uid = uid
+        self.valid_cookie = valid_cookie
+        self.host = host
+        self.port = port
+        self.auth_attempts: list[str] = []
+        self._runner: Any = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/socket.io/?EIO=4&transport=websocket"
+
+    async def _cabinet(self, request: Any) -> Any:
+        from aiohttp import web
+        name, value = self.valid_cookie
+        if request.cookies.get(name) != value:
+            raise web.HTTPFound("/en/login/")
+        return web.Response(text=f'<script>var socketConfig = {{"session":"{self.session}","uid":{self.uid}}};</script>',
+                            content_type="text/html")
+
+    async def _login(self, request: Any) -> Any:
+        from aiohttp import web
+        return web.Response(text="<form><input name='email'></form>", content_type="text/html")
+
+    async def _socket(self, request: Any) -> Any:
+        from aiohttp import web
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str('0{"sid":"stub","upgrades":[],"pingInterval":25000,"pingTimeout":20000}')
+        async for message in ws:
+            if message.type != web.WSMsgType.TEXT:
+                continue
+            if message.data == "40":
+                await ws.send_str('40{"sid":"stub"}')
+            elif message.data.startswith('42["auth"'):
+                self.auth_attempts.append(message.data)
+                if f'"session":"{self.session}"' in message.data and f'"uid":{self.uid}' in message.data:
+                    await ws.send_str('451-["successauth",{"_placeholder":true,"num":0}]')
+                    await ws.send_bytes(b'{"id":"stub"}')
+                else:
+                    await ws.send_str('42["NotAuthorized"]')
+        return ws
+
+    async def start(self) -> "StubPocketOptionServer":
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/en/cabinet/", self._cabinet)
+        app.router.add_get("/en/cabinet/demo-quick-high-low/", self._cabinet)
+        app.router.add_get("/en/login/", self._login)
+        app.router.add_get("/socket.io/", self._socket)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1] # type: ignore
+        return self
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
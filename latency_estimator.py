@@ -0,0 +1,89 @@
+"""
+latency_estimator.py
+
+Background estimate of the DNS latency to the Pocket Option API host, used as
+the send lead when waiting for a signal's entry time. Measuring in the
+background keeps the blocking lookups off the signal path: a signal reads the
+current mean instead of taking ten one-second-spaced samples itself.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional, Any
+
+from measure_latency import measure_one
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyEstimator:
+    """
+    Args:
+        host: Host whose DNS lookup time is measured.
+        window: Number of recent samples averaged.
+        min_samples: Samples required before the estimate counts as ready.
+        warmup_interval_seconds: Spacing of the samples taken until the estimator is ready.
+        interval_seconds: Spacing of the samples taken afterwards.
+    """
+
+    def __init__(self, host: str = "demo-api-eu.po.market", window: int = 10, min_samples: int = 3,
+                 warmup_interval_seconds: float = 0.2, interval_seconds: float = 30.0):
+        self.host = host
+        self.min_samples = min_samples
+        self.warmup_interval_seconds = warmup_interval_seconds
+        self.interval_seconds = interval_seconds
+        self._samples: deque[float] = deque(maxlen=window)
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_sample_at: Optional[float] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return len(self._samples) >= self.min_samples
+
+    @property
+    def mean_ms(self) -> float:
+        """Mean of the recent samples in milliseconds, 0.0 until the first sample."""
+        return sum(self._samples) / len(self._samples) if self._samples else 0.0
+
+    async def sample(self) -> Optional[float]:
+        """Takes one measurement (in a worker thread, getaddrinfo blocks). Returns it in ms, or None on failure."""
+        result = await asyncio.to_thread(measure_one, self.host)
+        dns_ms = result.get("dns_ms")
+        if not isinstance(dns_ms, float):
+            self.failures += 1
+            self.last_error = str(dns_ms)
+            logger.warning(f"DNS latency measurement for {self.host} failed: {dns_ms}")
+            return None
+        self._samples.append(dns_ms)
+        self.last_sample_at = time.time()
+        return dns_ms
+
+    async def run(self) -> None:
+        """Background task: samples quickly until ready, then every `interval_seconds`."""
+        while True:
+            measured = None
+            try:
+                measured = await self.sample()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.warning(f"DNS latency measurement for {self.host} failed: {e}")
+            if self.is_ready:
+                await asyncio.sleep(self.interval_seconds)
+            else:
+                # Back off while the host cannot be resolved instead of retrying at the warm-up pace
+                await asyncio.sleep(self.warmup_interval_seconds if measured is not None else min(5.0, self.interval_seconds))
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "host": self.host,
+            "ready": self.is_ready,
+            "samples": len(self._samples),
+            "mean_ms": round(self.mean_ms, 3),
+            "last_ms": round(self._samples[-1], 3) if self._samples else None,
+            "last_sample_at": self.last_sample_at,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -4,139 +4,707 @@ import json
 import time
 import asyncio
 import logging
-import pytz
-from fastapi import FastAPI, Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse, Response
 from datetime import date, datetime, timedelta
-from typing import Optional, AsyncIterator, Any
+from typing import Optional, AsyncIterator, Any, Coroutine
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from pocketoptionapi_async import AsyncPocketOptionClient, OrderDirection
 from pocketoptionapi_async.models import OrderResult, Candle # Import Candle model
 
+try:
+    import numpy as np
+except ImportError: # Optional: only needed for zero-copy candle views
+    np = None
+
 # Assuming parse_data.py is correctly implemented and available
 from parse_data import parse_macrodroid_trade_data
-from measure_latency import measure_one
+from latency_estimator import LatencyEstimator
+from profiling import ProfileCapture, dump_task_stacks, PROFILE_MODES
+from telegram_source import TelegramSignalSource, parse_chat_ids
+from signal_jobs import SignalJob, SignalJobRegistry
+from signal_dedup import SignalDedupCache
+from asset_index import AssetIndex
+from clock_sync import ClockSync
+from accounts import AccountRegistry, TradingAccount, bounded_gather, load_account_credentials
+from credential_watcher import CredentialWatcher
+from coordination import Coordinator
+from trade_ledger import TradeLedger, DIMENSIONS
+from admission import SignalRateLimiter
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from order_executor import OrderExecutor, OrderDeadlineExceeded
+from task_supervisor import TaskSupervisor, SupervisedTask
+from candle_store import CandleStore
+from settings import SettingsStore, TradingSettings, SettingsError
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-pocket_option_client: Optional[AsyncPocketOptionClient] = None
 is_demo_session: Optional[bool] = os.getenv('ACCOUNT_TYPE', 'DEMO').upper() == 'DEMO'  # Default to DEMO if not set
-# A flag to ensure only one trade sequence (Martingale included) is active globally
-is_processing_trade_sequence: bool = False
-
-FIXED_TRADE_DURATION_SECONDS = 300 # 5 minutes
-INITIAL_TRADE_AMOUNT = 1.0
-MARTINGALE_MULTIPLIER = 2.0
-MAX_MARTINGALE_LEVELS = 2 # Max Martingale levels after the initial trade (0-indexed). So 0=initial, 1=1st Martingale, 2=2nd Martingale (total 3 trades max).
-
-SIGNAL_TIMEZONE = pytz.timezone('America/New_York')
-LOCAL_TIMEZONE = pytz.timezone('Africa/Windhoek')
-
-trade_sequence_state = {
-    "active": False,
-    "asset": None,
-    "direction": None,
-    "current_level": 0, # 0 for initial trade, 1 for first martingale, etc.
-    "current_amount": INITIAL_TRADE_AMOUNT,
-    "last_trade_id": None,
-    "last_trade_status": None, # "win", "loss", "tie", "pending"
-    "profit": None, 
-    "current_balance": None # Updated before each trade
-}
+# Current (or most recent) on-demand profile capture started through the admin endpoints
+profile_capture: Optional[ProfileCapture] = None
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+# Native Telegram ingestion (replaces the MacroDroid + ngrok hop when a bot token is configured)
+telegram_signal_source: Optional[TelegramSignalSource] = None
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+TELEGRAM_SIGNAL_CHAT_IDS = parse_chat_ids(os.getenv('TELEGRAM_SIGNAL_CHAT_IDS'))
+# Every accepted notification (any source) becomes a job that can be looked up by ID
+signal_jobs = SignalJobRegistry()
+# Repeated notifications for the same signal are answered with the first job instead of being processed again
+signal_dedup = SignalDedupCache(max_entries=int(os.getenv('SIGNAL_DEDUP_MAX_ENTRIES', 1024)),
+                                ttl_seconds=float(os.getenv('SIGNAL_DEDUP_TTL_SECONDS', 600)))
+# Tradable assets with open state and payout, used to reject unusable signals on admission
+asset_index = AssetIndex(min_payout=float(os.environ['MIN_ASSET_PAYOUT']) if os.getenv('MIN_ASSET_PAYOUT') else None)
+asset_index_task: Optional[asyncio.Task] = None
+# Host -> Pocket Option server clock offset, estimated from server timestamps on price ticks
+clock_sync = ClockSync()
+CLOCK_SYNC_ASSET = os.getenv('CLOCK_SYNC_ASSET', 'EURUSD_otc')
+
+# Trade duration, stake, Martingale and timezones: validated once per load from the environment and SETTINGS_FILE,
+# and reloaded without a restart (file watch or POST /admin/settings/reload). Each sequence keeps the snapshot it
+# started with (account.sequence_settings), so a change applies from the next signal on.
+settings_store = SettingsStore(os.getenv('SETTINGS_FILE', 'settings.json'),
+                               interval_seconds=float(os.getenv('SETTINGS_WATCH_INTERVAL_SECONDS', 5)),
+                               on_reload=lambda settings: apply_settings(settings))
+
+# Every account holds its own client session, Martingale sequence state and latency metrics.
+# The first (primary) account also feeds the asset index and clock sync.
+trading_accounts = AccountRegistry.load(settings_store.current.initial_trade_amount, settings_store.current.martingale_multiplier,
+                                        settings_store.current.max_martingale_levels)
+for account in trading_accounts:
+    account.apply_settings(settings_store.current)
+# Upper bound on concurrent per-account calls when a signal is fanned out
+FAN_OUT_CONCURRENCY = int(os.getenv('FAN_OUT_CONCURRENCY', 16))
+# Consecutive connect / place_order / get_balance failures that open an account's circuit breaker,
+# and the interval of the background probes that close it again
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RECOVERY_SECONDS = float(os.getenv('BREAKER_RECOVERY_SECONDS', 10))
+# Token bucket per signal source (see signal_source_key); SIGNAL_RATE_PER_SECOND=0 disables admission control
+signal_rate_limiter = SignalRateLimiter(float(os.getenv('SIGNAL_RATE_PER_SECOND', 5)), float(os.getenv('SIGNAL_BURST', 20)))
+# Addresses of reverse proxies / tunnels in front of the server (the ngrok agent connects from 127.0.0.1). Requests
+# from them are keyed on X-Forwarded-For instead of the proxy's own address. Senders can also name themselves
+# with an X-Signal-Source header.
+SIGNAL_TRUSTED_PROXIES = {address.strip() for address in os.getenv('SIGNAL_TRUSTED_PROXIES', '').split(',') if address.strip()}
+# Orders must be acknowledged within ORDER_MAX_ENTRY_DELAY_SECONDS of their entry time. With ORDER_HEDGING=1 every
+# account keeps a standby connection, and an order that is slow to be acknowledged is sent once more on it.
+ORDER_HEDGING = os.getenv('ORDER_HEDGING', '0') != '0'
+order_executor = OrderExecutor(lambda: server_now(), max_entry_delay_seconds=float(os.getenv('ORDER_MAX_ENTRY_DELAY_SECONDS', 5)),
+                               attempt_timeout_seconds=float(os.getenv('ORDER_ATTEMPT_TIMEOUT_SECONDS', 3)), hedging=ORDER_HEDGING,
+                               hedge_latency_factor=float(os.getenv('ORDER_HEDGE_LATENCY_FACTOR', 3)))
+# Trade outcome monitors (one per open trade) run under a supervisor that bounds and tracks them. On shutdown
+# they get OUTCOME_MONITOR_DRAIN_SECONDS to finish; the rest are cancelled and journaled as monitor_interrupted.
+outcome_monitors = TaskSupervisor(max_concurrent=int(os.getenv('OUTCOME_MONITOR_CONCURRENCY', 64)),
+                                  on_error=lambda monitor, error: on_outcome_monitor_failed(monitor, error))
+OUTCOME_MONITOR_DRAIN_SECONDS = float(os.getenv('OUTCOME_MONITOR_DRAIN_SECONDS', 5))
+# Session housekeeping started by a session swap (listener setup, old client disconnects, standby reconnects)
+session_tasks = TaskSupervisor(max_concurrent=16)
+
+# Historical candles per asset and timeframe in memory-mapped files. CANDLE_SYNC_ASSETS (comma-separated) are synced
+# for every CANDLE_SYNC_TIMEFRAMES (seconds) each CANDLE_SYNC_INTERVAL_SECONDS by the worker holding the sync lease.
+candle_store = CandleStore(os.getenv('CANDLE_STORE_DIR', 'candles'))
+CANDLE_SYNC_TARGETS = [(asset.strip(), int(timeframe)) for asset in os.getenv('CANDLE_SYNC_ASSETS', '').split(',') if asset.strip()
+                       for timeframe in os.getenv('CANDLE_SYNC_TIMEFRAMES', '60').split(',')]
+CANDLE_SYNC_INTERVAL_SECONDS = float(os.getenv('CANDLE_SYNC_INTERVAL_SECONDS', 300))
+CANDLE_SYNC_HISTORY_DAYS = float(os.getenv('CANDLE_SYNC_HISTORY_DAYS', 0)) # Backfill horizon; 0 keeps whatever the first sync returned
+
+# DNS latency to the API host, sampled in the background and used as the send lead at entry time
+latency_estimator = LatencyEstimator(os.getenv('LATENCY_PROBE_HOST', 'demo-api-eu.po.market'))
+# Signals received before the app is first ready wait up to this long in the queue before being processed anyway
+READINESS_WAIT_SECONDS = float(os.getenv('READINESS_WAIT_SECONDS', 120))
+# When readiness() first passed. Only signals received before then are held; later disconnects are
+# handled per account by the connect / skip path of each trade.
+ready_since: Optional[float] = None
+# Background startup tasks (connection, latency estimate, asset index), cancelled on shutdown
+startup_tasks: list[asyncio.Task] = []
+started_at = time.time()
+
+# Applies SSIDs refreshed by scraper.py (.env) or edited in accounts.json without a restart
+credential_watcher = CredentialWatcher(
+    [os.path.join(os.getcwd(), ".env"), os.getenv('ACCOUNTS_FILE', 'accounts.json')],
+    load_account_credentials,
+    lambda name, ssid: apply_refreshed_credentials(name, ssid),
+    interval_seconds=float(os.getenv('CREDENTIAL_WATCH_INTERVAL_SECONDS', 5)),
+)
+
+# Shared by all uvicorn workers on this host: sequence ownership, signal keys and the trade journal. Opened in lifespan.
+coordinator = Coordinator(os.getenv('COORDINATION_DB', 'coordination.db'))
+# Settled trades in fixed-width records, with per-asset / hour / level aggregates kept up to date for /stats
+trade_ledger = TradeLedger(os.getenv('TRADE_LEDGER_PATH', 'trades.ledger'))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    global pocket_option_client, is_demo_session
+    global telegram_signal_source, asset_index_task, started_at, ready_since
 
     logger.info("FastAPI lifespan startup event: Initializing Pocket Option client.")
+    started_at = time.time()
+    ready_since = None
+    coordinator.open()
+    # Without a bot token the source stays offline and only accepts injected updates
+    telegram_signal_source = TelegramSignalSource(TELEGRAM_BOT_TOKEN, handle_telegram_signal, TELEGRAM_SIGNAL_CHAT_IDS)
 
-    while True:
-        # user_choice = input("Enter account type to use for trading (DEMO/REAL): ").strip().upper()
-        # if user_choice == "DEMO":
-        if is_demo_session:
-            # is_demo_session = True
-            logger.info("Selected DEMO account for trading session.")
-            break
-        # elif user_choice == "REAL":
-        elif not is_demo_session:
-            # is_demo_session = False
-            logger.info("Selected REAL account for trading session.")
-            break
-        else:
-            print("Invalid input. Please enter 'DEMO' or 'REAL'.")
+    logger.info(f"Selected {'DEMO' if is_demo_session else 'REAL'} account for trading session.")
+    if ORDER_HEDGING:
+        logger.warning("Order hedging is on. Pocket Option deduplicating requestId is not verified; if it does not, "
+                       "a hedged order can open two positions. Keep ORDER_HEDGING=0 unless that has been confirmed.")
+    for account in trading_accounts:
+        account.breaker = CircuitBreaker(f"pocket-option:{account.name}", BREAKER_FAILURE_THRESHOLD, BREAKER_RECOVERY_SECONDS,
+                                         probe=lambda account=account: probe_account(account))
 
-    ssid = os.getenv('SSID')
-    uid = os.getenv('UID') # UID checked, but not directly used for connection in this file.
-    
-    if not ssid:
-        logger.critical("SSID not found in .env. Please ensure scraper.py has run or .env is correctly set.")
-        yield
-        return
-    if not uid:
-        logger.critical("UID not found in .env. Please ensure scraper.py has run or .env is correctly set.")
-        yield
-        return
-    
-    pocket_option_client = AsyncPocketOptionClient(ssid, is_demo=is_demo_session,enable_logging=False) # type: ignore
-    for i in range(10):
+    # Nothing here waits on the network: the HTTP port is bound right away and the
+    # connection is made in the background. /readyz reports when trading is possible.
+    startup_tasks.append(asyncio.create_task(latency_estimator.run(), name="latency-estimator"))
+    startup_tasks.append(asyncio.create_task(credential_watcher.run(), name="credential-watcher"))
+    startup_tasks.append(asyncio.create_task(settings_store.run(), name="settings-watch"))
+    if trading_accounts.primary:
+        startup_tasks.append(asyncio.create_task(connect_accounts_in_background(), name="pocket-option-connect"))
+        asset_index_task = asyncio.create_task(asset_index.run_refresh_loop(lambda: trading_accounts.primary.client), name="asset-index-refresh")
+        if CANDLE_SYNC_TARGETS:
+            startup_tasks.append(asyncio.create_task(candle_store.run_sync_loop(
+                lambda: trading_accounts.primary.client, CANDLE_SYNC_TARGETS, CANDLE_SYNC_INTERVAL_SECONDS,
+                history_seconds=CANDLE_SYNC_HISTORY_DAYS * 86400,
+                should_sync=lambda: coordinator.acquire_lease("candle-sync", 2 * CANDLE_SYNC_INTERVAL_SECONDS)), name="candle-sync"))
+    else:
+        logger.critical("No trading accounts configured. Please ensure scraper.py has run or .env / accounts.json is correctly set.")
+
+    if TELEGRAM_BOT_TOKEN:
         try:
-            await pocket_option_client.connect()
-            balance = await pocket_option_client.get_balance()
-            logger.info(f'Pocket Option client connected successfully on startup. Balance: {balance.balance} {balance.currency} (Is Demo: {balance.is_demo})')
-            break
+            await telegram_signal_source.start()
         except Exception as e:
-            logger.error("Failed to connect Pocket Option client.")
-            if i == 10:
-                logger.critical(f"Initial Pocket Option client connection failed on startup: {e}", exc_info=True)
-                yield 
-                return
-            logger.info(f"Retrying Pocket Option connection in 5 seconds..              retry attempt: {str(i + 1) } /10.")
-            await asyncio.sleep(5)
-    
+            logger.error(f"Failed to start Telegram signal source: {e}. Only HTTP signal ingestion is available.", exc_info=True)
+
     yield
 
-    logger.info("FastAPI lifespan shutdown event: Disconnecting Pocket Option client.")
-    if pocket_option_client:
-        await pocket_option_client.disconnect()
-        logger.info("Pocket Option client disconnected during shutdown.")
+    await telegram_signal_source.stop()
+    if asset_index_task:
+        asset_index_task.cancel()
+    for task in startup_tasks:
+        task.cancel()
+    for monitor in await outcome_monitors.shutdown(OUTCOME_MONITOR_DRAIN_SECONDS):
+        # The trade may still be open on Pocket Option; its outcome and any Martingale level are not handled
+        coordinator.journal("monitor_interrupted", monitor.tags["account"], monitor.tags["order_id"],
+                            sequence_id=monitor.tags["sequence_id"], level=monitor.tags["level"], state=monitor.state)
+    logger.info("FastAPI lifespan shutdown event: Disconnecting Pocket Option clients.")
+    for account in trading_accounts:
+        account.breaker.stop()
+        if account.is_processing_trade_sequence:
+            release_trade_sequence(account)
+        if account.pending_client:
+            await account.pending_client.disconnect()
+        if account.standby_client:
+            await account.standby_client.disconnect()
+        if account.client:
+            await account.client.disconnect()
+            logger.info(f"Pocket Option client for account '{account.name}' disconnected during shutdown.")
+    # After the monitors and sequence releases, which can swap sessions and spawn more of these
+    await session_tasks.shutdown(grace_seconds=1.0)
+    coordinator.close()
+
+async def connect_accounts_in_background() -> None:
+    await bounded_gather([connect_account_on_startup(account) for account in trading_accounts], FAN_OUT_CONCURRENCY)
+
+async def connect_account_on_startup(account: TradingAccount) -> bool:
+    """
+    Connects `account`, retrying with capped exponential backoff until it succeeds. Runs as a
+    background task, so a slow or failing connection never delays startup.
+    """
+    client = account.create_client()
+    if account.primary:
+        # Attached before connecting so the asset list the server pushes right after login is not missed
+        asset_index.attach(client)
+        clock_sync.attach(client)
+    retry_delay = 0.5
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if not await client.connect():
+                raise ConnectionError("Connection attempt was not successful.")
+            balance = await client.get_balance()
+            logger.info(f'Pocket Option client for account \'{account.name}\' connected successfully on startup. Balance: {balance.balance} {balance.currency} (Is Demo: {balance.is_demo})')
+            if account.primary:
+                await attach_client_listeners(client)
+            if ORDER_HEDGING:
+                startup_tasks.append(asyncio.create_task(connect_standby_client(account), name=f"standby-connect-{account.name}"))
+            return True
+        except Exception as e:
+            if attempt == 10:
+                logger.critical(f"Initial Pocket Option client connection still failing for account '{account.name}' after {attempt} attempts: {e}. Retrying in the background.", exc_info=True)
+            else:
+                logger.error(f"Failed to connect Pocket Option client for account '{account.name}': {e}")
+            logger.info(f"Retrying Pocket Option connection for account '{account.name}' in {retry_delay:.1f} seconds. Attempt: {attempt}.")
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 5.0)
+
+def readiness() -> dict[str, Any]:
+    """
+    Readiness of the components a trade depends on. Only the primary connection is required: without
+    a latency estimate the send lead falls back to 0, and without a loaded and fresh asset index admission
+    skips the open state and payout checks, so those are reported as soft checks.
+    """
+    global ready_since
+    primary = trading_accounts.primary
+    checks = {"pocket_option_connected": bool(primary and primary.is_connected)}
+    soft_checks = {
+        "latency_estimator_ready": latency_estimator.is_ready,
+        "asset_index_loaded": asset_index.is_loaded,
+        "asset_index_fresh": not asset_index.is_stale,
+    }
+    ready = all(checks.values())
+    if ready and ready_since is None:
+        ready_since = time.time()
+        logger.info(f"App ready {ready_since - started_at:.1f}s after startup: {soft_checks}")
+    return {"ready": ready, "checks": checks, "soft_checks": soft_checks, "ready_since": ready_since}
+
+async def wait_until_ready(timeout_seconds: float) -> bool:
+    """Waits until readiness() reports ready. Returns False if `timeout_seconds` passed first."""
+    deadline = time.monotonic() + timeout_seconds
+    while not readiness()["ready"]:
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.1)
+    return True
 
 app = FastAPI(lifespan=lifespan)
 
+def require_admin(request: Request) -> None:
+    """
+    Rejects the request unless it carries the configured ADMIN_TOKEN in the X-Admin-Token header.
+    Admin endpoints are disabled entirely when ADMIN_TOKEN is not set.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.")
+    if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing admin token.")
+
+@app.post('/admin/profile/start')
+async def start_profile(request: Request, mode: str = "cprofile", seconds: Optional[float] = None, signals: Optional[int] = None) -> JSONResponse:
+    global profile_capture
+    require_admin(request)
+    if profile_capture and profile_capture.is_active:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile capture is already running.")
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid profile mode. Must be one of {PROFILE_MODES}.")
+    if not seconds and not signals:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Specify 'seconds' and/or 'signals' to bound the capture.")
+
+    profile_capture = ProfileCapture(mode=mode, duration_seconds=seconds, max_signals=signals)
+    profile_capture.start()
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"status": "started", "profile": profile_capture.summary()})
+
+@app.post('/admin/profile/stop')
+async def stop_profile(request: Request) -> JSONResponse:
+    require_admin(request)
+    if not profile_capture:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile capture has been started.")
+    profile_capture.stop()
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"status": "stopped", "profile": profile_capture.summary()})
+
+@app.get('/admin/profile')
+async def profile_status(request: Request) -> JSONResponse:
+    require_admin(request)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"profile": profile_capture.summary() if profile_capture else None})
+
+@app.get('/admin/profile/download')
+async def download_profile(request: Request) -> Response:
+    require_admin(request)
+    if not profile_capture or profile_capture.result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No finished profile capture available. Stop the running capture first.")
+    return Response(content=profile_capture.result, media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="{profile_capture.filename}"'})
+
+@app.get('/admin/tasks/stacks')
+async def task_stacks(request: Request, limit: Optional[int] = None) -> JSONResponse:
+    require_admin(request)
+    return JSONResponse(status_code=status.HTTP_200_OK, content=dump_task_stacks(limit=limit))
+
+@app.post('/admin/credentials/reload')
+async def reload_credentials(request: Request) -> JSONResponse:
+    """Re-reads the credential files now instead of waiting for the watcher's next poll."""
+    require_admin(request)
+    results = await credential_watcher.check(force=True)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"results": results, **credential_watcher.snapshot()})
+
+@app.get('/admin/settings')
+async def get_settings(request: Request) -> JSONResponse:
+    require_admin(request)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={
+        **settings_store.snapshot(),
+        "accounts": {account.name: {"next_sequence": settings_store.current.for_account(account).to_dict(),
+                                    "running_sequence": account.sequence_settings.to_dict()
+                                    if account.is_processing_trade_sequence and account.sequence_settings else None}
+                     for account in trading_accounts},
+    })
+
+@app.post('/admin/settings/reload')
+async def reload_settings(request: Request) -> JSONResponse:
+    """Reloads the trading settings now instead of waiting for the file watch. Invalid settings are rejected as a whole."""
+    require_admin(request)
+    try:
+        changes = settings_store.reload()
+    except SettingsError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"problems": e.problems, "version": settings_store.version})
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"changes": changes, **settings_store.snapshot()})
+
+@app.post('/admin/telegram/inject')
+async def inject_telegram_signal(request: Request, chat_id: Optional[int] = None) -> JSONResponse:
+    """Feeds the request body through the Telegram ingestion path as a fake channel post."""
+    require_admin(request)
+    if not telegram_signal_source:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Telegram signal source is not initialized.")
+    raw_notification_text = (await request.body()).decode('utf-8')
+    job = await telegram_signal_source.inject_text(raw_notification_text, chat_id=chat_id)
+    if isinstance(job, SignalJob):
+        return JSONResponse(status_code=status.HTTP_200_OK, content=job.to_dict())
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"status": "ignored", "message": "Injected update was not processed as a signal."})
+
 @app.post('/trade_signal')
 async def trade_signal_webhook(request: Request) -> JSONResponse:
-    global trade_sequence_state, pocket_option_client, is_demo_session, is_processing_trade_sequence
-    stats = pocket_option_client.get_connection_stats() # type: ignore
-    logger.info(f"Pocket Option connection stats: {stats}")
-    # --- Ensure only one trade sequence is active at a time ---
-    if is_processing_trade_sequence:
-        logger.warning(f"Received new signal while a trade sequence is already active "
-                       f" (Asset: {trade_sequence_state['asset']}, Direction: {trade_sequence_state['direction'].value if trade_sequence_state['direction'] else 'N/A'}, "
-                       f" Level: {trade_sequence_state['current_level']}). "
-                       f" Ignoring new signal and waiting for current sequence to complete.")
+    retry_after = signal_rate_limiter.admit(signal_source_key("macrodroid", request))
+    if retry_after:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many signals from this source.",
+                            headers={"Retry-After": str(max(1, round(retry_after)))})
+    raw_notification_text = (await request.body()).decode('utf-8')
+    job, duplicate = await submit_signal(raw_notification_text, source="macrodroid", idempotency_key=request.headers.get('Idempotency-Key'))
+    if duplicate:
         return JSONResponse(status_code=status.HTTP_200_OK, content={
+            "status": "duplicate",
+            "message": "Signal already received. Returning the status of the original job.",
+            "job_id": job.job_id,
+            "job_status": job.status,
+            "result": job.result
+        })
+    if job.task:
+        # Shielded so a client disconnect (e.g. MacroDroid timing out) does not cancel the trade
+        await asyncio.shield(job.task)
+    if job.status != "done":
+        raise HTTPException(status_code=job.error_status_code or status.HTTP_500_INTERNAL_SERVER_ERROR, detail=job.error)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={**job.result, "job_id": job.job_id}) # type: ignore
+
+@app.post('/trade_signal/batch')
+async def trade_signal_batch(request: Request) -> Response:
+    """
+    Accepts many notifications in one request as NDJSON: one JSON object per line with a
+    "text" field (and optional "id", echoed back, and "idempotency_key"). Returns one NDJSON acknowledgement per line
+    with the job ID and parse result; trades are processed in the background.
+    """
+    acks = []
+    source_key = signal_source_key("ndjson", request)
+    body = (await request.body()).decode('utf-8')
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        acks.append(await acknowledge_stream_message(line, source="ndjson", sequence=line_number, source_key=source_key))
+    ndjson = "".join(json.dumps(ack) + "\n" for ack in acks)
+    return Response(content=ndjson, media_type="application/x-ndjson")
+
+@app.websocket('/trade_signal/ws')
+async def trade_signal_stream(websocket: WebSocket) -> None:
+    """
+    Long-lived ingestion stream. Each text frame is either a raw notification or a JSON object
+    with a "text" field (and optional "id", echoed back, and "idempotency_key"). Every frame is acknowledged with
+    its job ID and parse result; trades are processed in the background.
+    """
+    await websocket.accept()
+    client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "unknown"
+    source_key = signal_source_key("websocket", websocket)
+    logger.info(f"Signal stream connected from {client} (admission key {source_key}).")
+    sequence = 0
+    try:
+        while True:
+            message = await websocket.receive_text()
+            sequence += 1
+            await websocket.send_json(await acknowledge_stream_message(message, source="websocket", sequence=sequence, source_key=source_key))
+    except WebSocketDisconnect:
+        logger.info(f"Signal stream from {client} disconnected after {sequence} message(s).")
+
+@app.get('/coordination')
+async def get_coordination(limit: int = 50, account: Optional[str] = None) -> JSONResponse:
+    snapshot = await asyncio.to_thread(coordinator.snapshot)
+    journal = await asyncio.to_thread(coordinator.recent_journal, limit, account)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={**snapshot, "journal": journal})
+
+@app.get('/stats')
+async def get_stats() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"total": trade_ledger.summary(), "ledger": trade_ledger.path})
+
+@app.get('/stats/query')
+async def query_stats(group_by: str = "asset", since: Optional[float] = None, until: Optional[float] = None,
+                      asset: Optional[str] = None, account: Optional[str] = None, level: Optional[int] = None) -> JSONResponse:
+    if group_by not in DIMENSIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"group_by must be one of: {', '.join(DIMENSIONS)}")
+    groups = await asyncio.to_thread(trade_ledger.query, group_by, since, until, asset, account, level)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"group_by": group_by, "groups": groups})
+
+@app.get('/stats/{dimension}')
+async def get_stats_by(dimension: str) -> JSONResponse:
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown stats dimension '{dimension}'. Use one of: {', '.join(DIMENSIONS)}")
+    return JSONResponse(status_code=status.HTTP_200_OK, content={dimension: trade_ledger.by(dimension)})
+
+@app.get('/candles')
+async def get_candle_store() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content=candle_store.snapshot())
+
+@app.get('/candles/{asset}')
+async def get_candles(asset: str, timeframe: int = 60, start: Optional[float] = None, end: Optional[float] = None, limit: int = 500) -> JSONResponse:
+    """Stored candles of `asset` with start <= open time < end, the newest `limit` of them."""
+    if not os.path.exists(candle_store.path(asset, timeframe)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No stored {timeframe}s candles for '{asset}'.")
+    series = candle_store.series(asset, timeframe)
+    def read() -> list[list[float]]:
+        if np is not None:
+            return series.view(start, end)[-limit:].tolist() if limit > 0 else []
+        rows = list(series.records(start, end))
+        return [list(row) for row in rows[-limit:]] if limit > 0 else []
+    rows = await asyncio.to_thread(read)
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"asset": asset, "timeframe": timeframe,
+                                                                 "columns": ["ts", "open", "high", "low", "close", "volume"], "candles": rows})
+
+@app.get('/resilience')
+async def get_resilience() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content={
+        "admission": signal_rate_limiter.snapshot(),
+        "order_executor": order_executor.snapshot(),
+        "circuit_breakers": {account.name: account.breaker.snapshot() for account in trading_accounts},
+    })
+
+@app.get('/tasks')
+async def get_tasks() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"outcome_monitors": outcome_monitors.snapshot(),
+                                                                 "session_tasks": session_tasks.snapshot()})
+
+@app.get('/accounts')
+async def get_accounts() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"accounts": trading_accounts.snapshot()})
+
+@app.get('/healthz')
+async def healthz() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"status": "ok", "uptime_seconds": round(time.time() - started_at, 3)})
+
+@app.get('/readyz')
+async def readyz() -> JSONResponse:
+    state = readiness()
+    content = {
+        **state,
+        "accounts": {account.name: account.is_connected for account in trading_accounts},
+        "latency_estimator": latency_estimator.snapshot(),
+        "asset_index": {"loaded": asset_index.is_loaded, "stale": asset_index.is_stale, "last_update_at": asset_index.last_update_at},
+        "queued_signals": len([job for job in signal_jobs.pending() if job.status == "queued"]),
+    }
+    return JSONResponse(status_code=status.HTTP_200_OK if state["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
+
+@app.get('/clock')
+async def get_clock() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content={**clock_sync.snapshot(), "server_now": server_now().isoformat()})
+
+@app.get('/assets')
+async def get_assets() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_200_OK, content=asset_index.snapshot())
+
+@app.get('/trade_signal/jobs/{job_id}')
+async def get_signal_job(job_id: str) -> JSONResponse:
+    job = signal_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or expired job ID.")
+    return JSONResponse(status_code=status.HTTP_200_OK, content=job.to_dict())
+
+def signal_source_key(source: str, connection: Request | WebSocket) -> str:
+    """
+    Admission-control key of a signal sender: the ingestion path and the sender's X-Signal-Source header, or else
+    its address. Behind a proxy in SIGNAL_TRUSTED_PROXIES the address is the nearest untrusted X-Forwarded-For entry;
+    behind an unlisted proxy every sender shares the proxy's address, and so one bucket.
+    """
+    explicit = connection.headers.get('X-Signal-Source', '').strip()
+    if explicit:
+        return f"{source}:id:{explicit[:64]}"
+    address = connection.client.host if connection.client else "unknown"
+    if address in SIGNAL_TRUSTED_PROXIES:
+        forwarded = [hop.strip() for hop in connection.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+        address = next((hop for hop in reversed(forwarded) if hop not in SIGNAL_TRUSTED_PROXIES), address)
+    return f"{source}:{address}"
+
+async def acknowledge_stream_message(message: str, source: str, sequence: int, source_key: Optional[str] = None) -> dict:
+    """Submits one streamed message and builds its acknowledgement. Messages over the source's rate are not submitted."""
+    if source_key and signal_rate_limiter.admit(source_key):
+        return {"seq": sequence, "id": None, "job_id": None, "status": "rate_limited", "duplicate": False, "parsed": {}, "error": "Too many signals from this source."}
+    client_id = None
+    idempotency_key = None
+    raw_notification_text = message
+    if message.lstrip().startswith("{"):
+        try:
+            payload = json.loads(message)
+            raw_notification_text = str(payload.get("text", ""))
+            client_id = payload.get("id")
+            idempotency_key = payload.get("idempotency_key")
+        except (json.JSONDecodeError, AttributeError) as e:
+            return {"seq": sequence, "id": None, "job_id": None, "status": "rejected", "duplicate": False, "parsed": {}, "error": f"Invalid JSON message: {e}"}
+    job, duplicate = await submit_signal(raw_notification_text, source=source, idempotency_key=idempotency_key)
+    return {"seq": sequence, "id": client_id, "job_id": job.job_id, "status": job.status, "duplicate": duplicate, "parsed": job.parsed, "error": job.error}
+
+async def handle_telegram_signal(raw_notification_text: str, source: str) -> SignalJob:
+    """Signal handler for TelegramSignalSource. Waits for the job so failures show up in the log."""
+    job, duplicate = await submit_signal(raw_notification_text, source=source)
+    if duplicate:
+        logger.info(f"Telegram signal is a duplicate of job {job.job_id} ({job.status}).")
+        return job
+    if job.task:
+        await job.task
+    if job.status != "done":
+        logger.error(f"Telegram signal job {job.job_id} {job.status} ({job.error_status_code}): {job.error}")
+    return job
+
+async def submit_signal(raw_notification_text: str, source: str, idempotency_key: Optional[str] = None) -> tuple[SignalJob, bool]:
+    """
+    Parses a notification and, if it is a usable signal, schedules it on the processing core.
+    The returned job is "rejected" right away when the essential trade data cannot be parsed.
+
+    Returns:
+        (job, duplicate). For a duplicate of a recently received signal (same idempotency key, or
+        same asset, direction and entry time) the original job is returned and nothing is scheduled.
+    """
+    # Idempotency keys are checked before parsing, so retried requests never touch the parser
+    idempotency_dedup_key = SignalDedupCache.idempotency_key(idempotency_key)
+    original_job = _find_duplicate_job(idempotency_dedup_key)
+    if original_job:
+        logger.info(f"Duplicate signal from {source} (Idempotency-Key: {idempotency_key}). Original job: {original_job.job_id} ({original_job.status}).")
+        return original_job, True
+
+    logger.info(f"Received raw notification from {source}:\n{raw_notification_text}")
+    parsed_data = parse_macrodroid_trade_data(raw_notification_text)
+    content_dedup_key = SignalDedupCache.content_key(parsed_data)
+    original_job = _find_duplicate_job(content_dedup_key)
+    if original_job:
+        logger.info(f"Duplicate signal from {source} for {parsed_data}. Original job: {original_job.job_id} ({original_job.status}).")
+        signal_dedup.remember(idempotency_dedup_key, original_job.job_id)
+        return original_job, True
+
+    job = signal_jobs.create(source, raw_notification_text, parsed_data)
+    if content_dedup_key is None:
+        job.status = "rejected"
+        job.error = "Failed to parse essential trade data from notification."
+        job.error_status_code = status.HTTP_400_BAD_REQUEST
+        job.finished_at = time.time()
+        return job, False
+    asset_info, unavailable_reason = asset_index.check(parsed_data["asset_name_for_po"])
+    if unavailable_reason:
+        logger.warning(f"Rejecting signal from {source}: {unavailable_reason}")
+        job.status = "rejected"
+        job.error = unavailable_reason
+        job.error_status_code = status.HTTP_400_BAD_REQUEST
+        job.finished_at = time.time()
+        return job, False
+    parsed_data["asset_name_for_po"] = asset_info.symbol # type: ignore
+    parsed_data["payout"] = asset_info.payout # type: ignore
+    # With every account's breaker open the signal cannot be traded; answer now instead of holding the request
+    if trading_accounts.primary and all(account.breaker.is_open for account in trading_accounts):
+        retry_after = min(account.breaker.retry_after() for account in trading_accounts)
+        logger.warning(f"Rejecting signal from {source}: Pocket Option circuit breakers are open (retry in {retry_after:.1f}s).")
+        job.status = "failed"
+        job.error = f"Pocket Option is unavailable (circuit breaker open). Retry in {retry_after:.1f}s."
+        job.error_status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        job.finished_at = time.time()
+        return job, False
+    # Another worker may have received the same signal; the first claim wins
+    for dedup_key in (idempotency_dedup_key, content_dedup_key):
+        claimed_by = await coordinator.run(coordinator.claim_signal_key, dedup_key, job.job_id, signal_dedup.ttl_seconds)
+        if claimed_by:
+            logger.info(f"Duplicate signal from {source} for {parsed_data}. Already claimed by worker {claimed_by[1]} (job {claimed_by[0]}).")
+            await coordinator.run(coordinator.release_signal_keys, job.job_id)
+            job.status = "done"
+            job.result = {"status": "duplicate", "job_id": claimed_by[0], "worker": claimed_by[1]}
+            job.finished_at = time.time()
+            return job, True
+    signal_dedup.remember(idempotency_dedup_key, job.job_id)
+    signal_dedup.remember(content_dedup_key, job.job_id)
+    job.task = asyncio.create_task(_execute_signal_job(job), name=f"signal-job-{job.job_id}")
+    return job, False
+
+def _find_duplicate_job(dedup_key: Optional[str]) -> Optional[SignalJob]:
+    """Returns the job recorded for `dedup_key`, unless it failed (a failed signal may be retried)."""
+    job_id = signal_dedup.lookup(dedup_key)
+    if not job_id:
+        return None
+    job = signal_jobs.get(job_id)
+    if not job or job.status == "failed":
+        signal_dedup.forget(dedup_key)
+        return None
+    return job
+
+async def _execute_signal_job(job: SignalJob) -> None:
+    # Signals that arrive during startup stay queued until the primary account is first connected
+    if ready_since is None and not readiness()["ready"]:
+        logger.info(f"Signal job {job.job_id} is queued until the app is ready: {readiness()['checks']}")
+        if not await wait_until_ready(READINESS_WAIT_SECONDS):
+            logger.warning(f"App not ready after {READINESS_WAIT_SECONDS:.0f}s. Processing signal job {job.job_id} anyway: {readiness()['checks']}")
+    job.status = "running"
+    try:
+        job.result = await process_trade_signal(job.raw_text, source=job.source, parsed_data=job.parsed)
+        job.status = "done"
+    except HTTPException as e:
+        job.status = "failed"
+        job.error = str(e.detail)
+        job.error_status_code = e.status_code
+    except Exception as e:
+        logger.error(f"Unexpected error processing signal job {job.job_id}: {e}", exc_info=True)
+        job.status = "failed"
+        job.error = str(e)
+        job.error_status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    finally:
+        job.finished_at = time.time()
+        if job.status == "failed":
+            await coordinator.run(coordinator.release_signal_keys, job.job_id)
+
+async def process_trade_signal(raw_notification_text: str, source: str = "macrodroid", parsed_data: Optional[dict] = None) -> dict:
+    """
+    Shared processing core for every signal source (MacroDroid webhook, Telegram, streams).
+    Returns the response content for the signal or raises HTTPException on invalid signals and API failures.
+    """
+    try:
+        return await _run_trade_signal(raw_notification_text, source, parsed_data)
+    finally:
+        if profile_capture:
+            profile_capture.record_signal()
+
+async def _run_trade_signal(raw_notification_text: str, source: str, parsed_data: Optional[dict]) -> dict:
+    settings = settings_store.current # One snapshot for the whole signal, even if a reload lands meanwhile
+    for account in trading_accounts:
+        if account.client:
+            logger.info(f"Pocket Option connection stats ({account.name}): {account.client.get_connection_stats()}")
+    # --- Ensure only one trade sequence is active at a time per account ---
+    eligible_accounts = []
+    for account in trading_accounts:
+        owner = await coordinator.run(coordinator.sequence_owner, account.name)
+        if owner and owner != coordinator.worker_id:
+            logger.warning(f"[{account.name}] Received new signal while worker {owner} owns the account's trade sequence. Ignoring it on this worker.")
+        elif account.is_processing_trade_sequence:
+            trade_sequence_state = account.trade_sequence_state
+            logger.warning(f"[{account.name}] Received new signal while a trade sequence is already active "
+                           f" (Asset: {trade_sequence_state['asset']}, Direction: {trade_sequence_state['direction'].value if trade_sequence_state['direction'] else 'N/A'}, "
+                           f" Level: {trade_sequence_state['current_level']}). "
+                           f" Ignoring new signal and waiting for current sequence to complete.")
+        else:
+            eligible_accounts.append(account)
+    if not eligible_accounts:
+        return {
             "status": "ignored",
             "message": "Signal ignored. Another trade sequence is currently in progress."
-        })
+        }
     # ----- Ensure connection to pocket option -----
-    if not pocket_option_client or not pocket_option_client.is_connected:
-        logger.error("Pocket Option client is not connected. Attempting to re-establish connection.")
-        if await connect_pocket_option_client():
-            logger.info("Re-established Pocket Option connection for trade signal.")
-        else:
-            logger.critical("Failed to re-establish Pocket Option connection. Aborting trade signal processing.")
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Pocket Option API not connected and reconnection failed.")
+    connected = await bounded_gather([ensure_account_connected(account) for account in eligible_accounts], FAN_OUT_CONCURRENCY)
+    eligible_accounts = [account for account, ok in zip(eligible_accounts, connected) if ok is True]
+    if not eligible_accounts:
+        logger.critical("Failed to re-establish Pocket Option connection. Aborting trade signal processing.")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Pocket Option API not connected and reconnection failed.")
         
     # --- Parse incoming notification ---
-    raw_notification_text = (await request.body()).decode('utf-8')
-    logger.info(f"Received raw notification from Macrodroid:\n{raw_notification_text}")
-
-    parsed_data = parse_macrodroid_trade_data(raw_notification_text)
-    trade_duration = FIXED_TRADE_DURATION_SECONDS # Always use the fixed duration (5 minutes)
+    if parsed_data is None:
+        logger.info(f"Received raw notification from {source}:\n{raw_notification_text}")
+        parsed_data = parse_macrodroid_trade_data(raw_notification_text)
+    trade_duration = settings.trade_duration_seconds
 
     if not parsed_data.get("asset_name_for_po") or not parsed_data.get("direction") or not parsed_data.get("entryTime"):
         logger.error("Failed to parse essential trade data (asset, direction, or entry time) from notification. Aborting trade attempt.")
@@ -152,20 +720,10 @@ async def trade_signal_webhook(request: Request) -> JSONResponse:
         logger.error(f"Invalid or missing trade direction received: '{signal_direction_str}'. Must be 'CALL' or 'PUT'.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid trade direction.")
 
-    current_local_dt = datetime.now(LOCAL_TIMEZONE)
+    current_local_dt = server_now()
         
     try:
-        signal_time_obj = datetime.strptime(signal_entry_time_str, "%H:%M").time()
-        signal_dt_in_signal_tz = SIGNAL_TIMEZONE.localize(
-            datetime(current_local_dt.year, current_local_dt.month, current_local_dt.day,
-                 signal_time_obj.hour, signal_time_obj.minute, 0)
-        )
-        
-        # Check if local time is before 6 AM
-        if current_local_dt.hour <= 6:
-            signal_dt_in_signal_tz = signal_dt_in_signal_tz - timedelta(days=1)
-            
-        target_local_dt = signal_dt_in_signal_tz.astimezone(LOCAL_TIMEZONE)
+        target_local_dt = resolve_entry_time(signal_entry_time_str, current_local_dt, settings)
     except Exception as e:
         logger.error(f"Error parsing or converting signal entry time '{signal_entry_time_str}': {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid signal entry time format: {e}")
@@ -176,26 +734,41 @@ async def trade_signal_webhook(request: Request) -> JSONResponse:
         logger.warning(f"Signal for {signal_asset} {signal_direction.value} (Entry: {signal_entry_time_str}) arrived late. "
                        f"Current local time: {current_local_dt.strftime('%H:%M:%S')}, Target local time: {target_local_dt.strftime('%H:%M:%S')}. "
                        f"Skipping trade.")
-        return JSONResponse(status_code=status.HTTP_200_OK, content={"status": "skipped", "message": "Signal arrived too late, trade skipped."})
-    latency_mean = float(0)
-    latency_sum = float(0)
-    for _ in range(10):
-        print(f"== api-eu.po.market ==")
-        res = measure_one("demo-api-eu.po.market")
-        dns = res.get("dns_ms")
-        print(f"  DNS: {dns:.1f} ms")
-        latency_sum += float(dns) #type: ignore
-        if _ < 10:
-            latency_mean = latency_sum / (_ + 1)
-        await asyncio.sleep(1)
-    
-    time_to_wait_seconds = (target_local_dt - (datetime.now(LOCAL_TIMEZONE)- timedelta(milliseconds=latency_mean))).total_seconds()
+        return {"status": "skipped", "message": "Signal arrived too late, trade skipped."}
+    latency_mean = latency_estimator.mean_ms
+    logger.info(f"DNS latency estimate: {latency_estimator.snapshot()}")
+    logger.info(f"Clock sync: {clock_sync.snapshot()}")
 
-    logger.info(f"New signal received. Initiating a new trade sequence for {signal_asset} {signal_direction.value}. Initial Amount: ${INITIAL_TRADE_AMOUNT:.2f}")
+    logger.info(f"New signal received. Initiating a new trade sequence for {signal_asset} {signal_direction.value} on account(s): {[account.name for account in eligible_accounts]}")
     
-    # Set the global flag to indicate a sequence is active
-    is_processing_trade_sequence = True
+    # Set the per-account flags to indicate a sequence is active. The lease makes sure no other worker trades the account meanwhile.
+    claimed_accounts = []
+    for account in eligible_accounts:
+        sequence_settings = settings.for_account(account)
+        if account.is_processing_trade_sequence or not await coordinator.run(coordinator.acquire_sequence, account.name, sequence_lease_seconds(sequence_settings)):
+            logger.warning(f"[{account.name}] Trade sequence was taken by another signal or worker while this signal was prepared. Skipping account.")
+            continue
+        account.is_processing_trade_sequence = True
+        account.sequence_settings = sequence_settings
+        coordinator.journal("sequence_started", account.name, asset=signal_asset, direction=signal_direction.value, entry_time=target_local_dt.isoformat())
+        claimed_accounts.append(account)
+    eligible_accounts = claimed_accounts
+    if not eligible_accounts:
+        return {
+            "status": "ignored",
+            "message": "Signal ignored. Another trade sequence is currently in progress."
+        }
 
+    # Balances are read before the wait so every account can fire in the same instant
+    balances_before_trade = await bounded_gather([account.breaker.call(account.client.get_balance) for account in eligible_accounts], FAN_OUT_CONCURRENCY) # type: ignore
+    for account, balance_before_trade in zip(eligible_accounts, balances_before_trade):
+        if isinstance(balance_before_trade, Exception):
+            logger.warning(f"[{account.name}] Could not retrieve balance before initial trade: {balance_before_trade}")
+        else:
+            logger.info(f"[{account.name}] Balance BEFORE initial trade: {balance_before_trade.balance} {balance_before_trade.currency}")
+
+    # Wait is measured on the server clock; the DNS mean is only a send lead for network latency
+    time_to_wait_seconds = (target_local_dt - (server_now() - timedelta(milliseconds=latency_mean))).total_seconds()
     if time_to_wait_seconds > 0:
         logger.info(f"Waiting {time_to_wait_seconds:.2f} seconds until target entry time: {target_local_dt.strftime('%H:%M:%S')}")
         await asyncio.sleep(time_to_wait_seconds)
@@ -203,45 +776,90 @@ async def trade_signal_webhook(request: Request) -> JSONResponse:
     else:
         logger.info(f"Signal arrived exactly at or slightly past target entry time ({current_local_dt.strftime('%H:%M:%S')} vs {target_local_dt.strftime('%H:%M:%S')}). Placing trade immediately.")
 
-    try:
-        balance_before_trade = await pocket_option_client.get_balance() # type: ignore
-        logger.info(f"Balance BEFORE initial trade: {balance_before_trade.balance} {balance_before_trade.currency}")
-    except Exception as e:
-        logger.warning(f"Could not retrieve balance before initial trade: {e}")
+    results = await bounded_gather(
+        [place_initial_trade(account, signal_asset, signal_direction, trade_duration, target_local_dt) for account in eligible_accounts],
+        FAN_OUT_CONCURRENCY
+    )
+    account_results = {}
+    for account, result in zip(eligible_accounts, results):
+        if isinstance(result, Exception):
+            account_results[account.name] = {"status": "failed", "message": f"Failed to place initial trade: {result}"}
+        else:
+            account_results[account.name] = result
+    placed = [result for result in results if not isinstance(result, Exception)]
+    if not placed:
+        if all(isinstance(result, CircuitOpenError) for result in results):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Pocket Option is unavailable: {results[0]}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to place initial trade: {results[0]}")
+    # The top-level fields describe the primary account (or the first account that traded)
+    return {**placed[0], "accounts": account_results}
 
+def resolve_entry_time(signal_entry_time_str: str, current_local_dt: datetime, settings: Optional[TradingSettings] = None) -> datetime:
+    """
+    Converts a signal's "HH:MM" entry time (signal timezone) to the entry instant in the local timezone,
+    on the day of `current_local_dt`. Raises ValueError for a malformed time.
+    """
+    settings = settings or settings_store.current
+    signal_time_obj = datetime.strptime(signal_entry_time_str, "%H:%M").time()
+    signal_dt_in_signal_tz = settings.signal_tz.localize(
+        datetime(current_local_dt.year, current_local_dt.month, current_local_dt.day,
+             signal_time_obj.hour, signal_time_obj.minute, 0)
+    )
+    
+    # Check if local time is before 6 AM
+    if current_local_dt.hour <= 6:
+        signal_dt_in_signal_tz = signal_dt_in_signal_tz - timedelta(days=1)
+        
+    return signal_dt_in_signal_tz.astimezone(settings.local_tz)
+
+async def place_initial_trade(account: TradingAccount, signal_asset: str, signal_direction: OrderDirection, trade_duration: int, target_local_dt: datetime) -> dict:
+    """
+    Places the initial trade of a new sequence on one account and starts its outcome monitor.
+    On failure the account's sequence is reset, its lock released, and the exception re-raised.
+    """
+    trade_sequence_state = account.trade_sequence_state
+    pocket_option_client = account.client
     trade_sequence_state.update({
         "active": True, # This "active" in state is for internal Martingale logic within the sequence
         "asset": signal_asset,
         "direction": signal_direction,
         "current_level": 0,
-        "current_amount": INITIAL_TRADE_AMOUNT,
+        "current_amount": account.sequence_settings.initial_trade_amount,
+        "sequence_id": None,
         "last_trade_id": None,
         "last_trade_status": "pending",
+        "last_trade_open_price": None,
         "last_trade_open_time": None,
         "current_balance":None # type: ignore
     })
 
     try:
-        order = await pocket_option_client.place_order( # type: ignore
+        placement_started = time.perf_counter()
+        placement = await account.breaker.call(lambda: order_executor.place(
+            account,
             asset=trade_sequence_state["asset"],
             amount=trade_sequence_state["current_amount"],
             direction=trade_sequence_state["direction"],
-            duration=trade_duration
-        )
-        entry_time = datetime.now(LOCAL_TIMEZONE)
+            duration=trade_duration,
+            entry_time=target_local_dt
+        ), ignore=(OrderDeadlineExceeded,)) # A missed deadline is a scheduling miss, not a connection failure
+        order = placement.order
+        entry_time = server_now()
+        account.placement_latency.record((time.perf_counter() - placement_started) * 1000)
+        account.entry_slippage.record((entry_time - target_local_dt).total_seconds() * 1000)
         
-        latency =   measure_one(" demo-api-eu.po.market")
-        logger.info(f"latency: {latency}")
-        # entry_time = datetime.now(LOCAL_TIMEZONE) + timedelta(milliseconds=float(latency["dns_ms"] if latency and "dns_ms" in latency else 0))
-        logger.info(f"line 206: Initial trade placed successfully! Order ID: {order.order_id}, Status: {order.status}")
+        logger.info(f"[{account.name}] Initial trade placed successfully! Order ID: {order.order_id}, Status: {order.status}")
+        coordinator.journal("order_placed", account.name, order.order_id, level=0, asset=signal_asset, direction=signal_direction.value,
+                            amount=trade_sequence_state["current_amount"], entry_time=entry_time.isoformat(), path=placement.path)
         trade_sequence_state["last_trade_id"] = order.order_id
+        trade_sequence_state["sequence_id"] = order.order_id
         
         # Immediately try to get the open price/time for this trade
         # This is crucial for the candle-based Martingale decision
         initial_order_details: Optional[OrderResult] = None
         for i in range(3): # Try a few times to get initial order details
             try:
-                initial_order_details = await pocket_option_client.check_order_result(order.order_id) # type: ignore
+                initial_order_details = await placement.client.check_order_result(order.order_id) # type: ignore
                 logger.info(f"initial order details: {initial_order_details}")
                 if initial_order_details and initial_order_details.amount: # type: ignore
                     trade_sequence_state["last_trade_open_price"] = initial_order_details.amount # type: ignore
@@ -257,25 +875,28 @@ async def trade_signal_webhook(request: Request) -> JSONResponse:
             # Decide if you want to abort here or proceed with a potential risk.
             # For now, we'll proceed, but it's a critical warning.
 
-        logger.info(f"Trade placed. Now initiating outcome monitoring for trade ID: {trade_sequence_state['last_trade_id']}")
-        current_balance = await pocket_option_client.get_balance() # type: ignore
-        print(current_balance)
+        logger.info(f"[{account.name}] Trade placed. Now initiating outcome monitoring for trade ID: {trade_sequence_state['last_trade_id']}")
+        current_balance = await account.breaker.call(placement.client.get_balance) # type: ignore
         trade_sequence_state["current_balance"]= current_balance.balance
-        logger.info(f"Current balance after placing initial trade for trade sequence: {trade_sequence_state['current_balance']}")
-        asyncio.create_task(
+        logger.info(f"[{account.name}] Current balance after placing initial trade for trade sequence: {trade_sequence_state['current_balance']}")
+        spawn_outcome_monitor(
+            account,
             handle_trade_outcome_and_martingale(
+                account,
                 trade_sequence_state["last_trade_id"],
                 trade_duration,
                 trade_sequence_state["asset"],
                 trade_sequence_state["direction"],
                 trade_sequence_state["current_amount"],
                 trade_sequence_state["current_balance"],
-                entry_time
+                entry_time,
+                order_client=placement.client
             )
         )
-        return JSONResponse(status_code=status.HTTP_200_OK, content={
+        return {
             "status": "initial_trade_placed",
             "message": "Initial trade placed successfully. Outcome will be processed shortly.",
+            "account": account.name,
             "trade_id": trade_sequence_state["last_trade_id"],
             "asset": trade_sequence_state["asset"],
             "direction": trade_sequence_state["direction"].value,
@@ -283,51 +904,183 @@ async def trade_signal_webhook(request: Request) -> JSONResponse:
             "martingale_level": trade_sequence_state["current_level"], # 0 for initial
             "current_balance":trade_sequence_state["current_balance"],
             "last_trade_status":trade_sequence_state["last_trade_status"]
-        })
+        }
     except Exception as e:
-        logger.error(f"Failed to place initial trade: {e}", exc_info=True)
-        # Reset sequence and global flag on failure to place initial trade
+        logger.error(f"[{account.name}] Failed to place initial trade: {e}", exc_info=True)
+        coordinator.journal("order_skipped" if isinstance(e, OrderDeadlineExceeded) else "order_failed", account.name, level=0, error=str(e))
+        # Reset sequence and account flag on failure to place initial trade
         trade_sequence_state["active"] = False
         trade_sequence_state["current_level"] = 0
-        trade_sequence_state["current_amount"] = INITIAL_TRADE_AMOUNT
+        trade_sequence_state["current_amount"] = account.sequence_settings.initial_trade_amount
         trade_sequence_state["last_trade_open_price"] = None
         trade_sequence_state["last_trade_open_time"] = None
         trade_sequence_state["last_trade_status"] = None
-        is_processing_trade_sequence = False # Release the lock
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to place initial trade: {e}")
+        release_trade_sequence(account) # Release the lock
+        raise
 
 
-async def connect_pocket_option_client() -> bool:
-    global pocket_option_client, is_demo_session
+def spawn_outcome_monitor(account: TradingAccount, monitor: Coroutine[Any, Any, None]) -> None:
+    """Runs `monitor` (an outcome monitor for the account's last trade) under the outcome monitor supervisor."""
+    state = account.trade_sequence_state
+    outcome_monitors.spawn(monitor, name=f"martingale-monitor-{account.name}-{state['last_trade_id']}", account=account.name,
+                           sequence_id=state["sequence_id"], order_id=state["last_trade_id"], level=state["current_level"])
 
-    if pocket_option_client and pocket_option_client.is_connected:
-        logger.info("Pocket Option client is already connected.")
+def on_outcome_monitor_failed(monitor: SupervisedTask, error: BaseException) -> None:
+    """An exception escaped an outcome monitor: journal it and free the account unless a later monitor took over."""
+    account = trading_accounts.get(monitor.tags["account"])
+    coordinator.journal("monitor_failed", monitor.tags["account"], monitor.tags["order_id"], sequence_id=monitor.tags["sequence_id"],
+                        level=monitor.tags["level"], error=f"{type(error).__name__}: {error}")
+    if account and account.is_processing_trade_sequence and not outcome_monitors.pending(account=account.name):
+        account.trade_sequence_state["active"] = False
+        release_trade_sequence(account)
+
+def sequence_lease_seconds(settings: TradingSettings) -> float:
+    """Upper bound on how long a full Martingale sequence with `settings` can run, with a margin per trade."""
+    return (settings.max_martingale_levels + 1) * (settings.trade_duration_seconds + 60)
+
+def apply_settings(settings: TradingSettings) -> None:
+    """Makes reloaded settings the defaults of every account's next sequence. Running sequences keep their snapshot."""
+    for account in trading_accounts:
+        account.apply_settings(settings)
+
+def release_trade_sequence(account: TradingAccount) -> None:
+    account.is_processing_trade_sequence = False
+    if account.pending_client:
+        activate_client(account, account.pending_client, account.pending_ssid) # type: ignore
+    try:
+        coordinator.release_sequence(account.name)
+        coordinator.journal("sequence_finished", account.name, trade_id=account.trade_sequence_state["last_trade_id"],
+                            status=account.trade_sequence_state["last_trade_status"])
+    except Exception as e:
+        logger.error(f"[{account.name}] Failed to release the sequence lease: {e}. It will expire on its own.")
+
+def server_now() -> datetime:
+    """Current Pocket Option server time in the local timezone. Falls back to the host clock until clock sync has samples."""
+    return clock_sync.server_now(settings_store.current.local_tz)
+
+async def attach_client_listeners(client: AsyncPocketOptionClient) -> None:
+    """Hooks the asset index and clock sync to a (new) client and subscribes to the price ticks clock sync needs."""
+    asset_index.attach(client)
+    clock_sync.attach(client)
+    try:
+        await client.send_message(f'42["changeSymbol",{{"asset":"{CLOCK_SYNC_ASSET}","period":60}}]')
+    except Exception as e:
+        logger.warning(f"Could not subscribe to {CLOCK_SYNC_ASSET} ticks for clock sync: {e}. Using the host clock for entry timing.")
+
+async def apply_refreshed_credentials(account_name: str, ssid: str) -> bool:
+    """
+    Logs in with a refreshed SSID on a standby client and, once that works, makes it the account's
+    live client. While a trade sequence is running the swap waits until the sequence is released,
+    so every order of a Martingale sequence goes through the same session.
+    """
+    account = trading_accounts.get(account_name)
+    if account is None:
+        logger.warning(f"Refreshed SSID for unknown account '{account_name}' ignored. Restart to add new accounts.")
+        return False
+    if ssid in (account.ssid, account.pending_ssid):
         return True
 
-    ssid = os.getenv('SSID')
-    uid = os.getenv('UID') # UID checked, but not directly used for connection here
-    
-    if not ssid:
-        logger.critical("SSID not found in .env. Cannot connect.")
+    standby = AsyncPocketOptionClient(ssid, is_demo=account.is_demo, enable_logging=False)
+    try:
+        if not await standby.connect():
+            raise ConnectionError("Connection attempt was not successful.")
+        balance = await standby.get_balance()
+    except Exception as e:
+        logger.error(f"[{account.name}] Refreshed SSID failed validation on the standby connection: {e}. Keeping the current session.")
+        try:
+            await standby.disconnect()
+        except Exception:
+            pass
+        return False
+    logger.info(f"[{account.name}] Refreshed SSID validated on the standby connection. Balance: {balance.balance} {balance.currency}")
+
+    if account.is_processing_trade_sequence:
+        if account.pending_client:
+            session_tasks.spawn(account.pending_client.disconnect(), name=f"session-disconnect-{account.name}", account=account.name)
+        account.pending_client = standby
+        account.pending_ssid = ssid
+        logger.info(f"[{account.name}] Trade sequence in progress. The new session goes live when it finishes.")
+    else:
+        activate_client(account, standby, ssid)
+    return True
+
+def activate_client(account: TradingAccount, client: AsyncPocketOptionClient, ssid: str) -> None:
+    """Swaps `client` in as the account's live client. Nothing here awaits, so no signal can see a half-swapped account."""
+    previous = account.swap_client(client, ssid)
+    logger.info(f"[{account.name}] Switched to the refreshed Pocket Option session.")
+    if account.primary:
+        session_tasks.spawn(attach_client_listeners(client), name=f"session-listeners-{account.name}", account=account.name)
+    if previous and previous is not client:
+        session_tasks.spawn(previous.disconnect(), name=f"session-disconnect-{account.name}", account=account.name)
+    if ORDER_HEDGING:
+        # The standby session still uses the old SSID
+        session_tasks.spawn(connect_standby_client(account), name=f"standby-connect-{account.name}", account=account.name)
+
+async def connect_standby_client(account: TradingAccount) -> bool:
+    """Opens the account's standby session for hedged order retries. Best effort: without it orders are not hedged."""
+    previous, account.standby_client = account.standby_client, None
+    if previous:
+        try:
+            await previous.disconnect()
+        except Exception:
+            pass
+    standby = account.create_standby_client()
+    try:
+        if not await standby.connect():
+            raise ConnectionError("Connection attempt was not successful.")
+    except Exception as e:
+        logger.warning(f"[{account.name}] Standby connection for hedged orders failed: {e}. Orders are placed without hedging.")
         return False
-    if not uid:
-        logger.critical("UID not found in .env. Cannot connect.")
+    account.standby_client = standby
+    logger.info(f"[{account.name}] Standby connection for hedged orders is up.")
+    return True
+
+async def ensure_account_connected(account: TradingAccount) -> bool:
+    if account.breaker.is_open:
+        logger.warning(f"[{account.name}] Circuit breaker is open. Skipping the account; recovery is probed in the background.")
         return False
+    if account.is_connected:
+        return True
+    logger.error(f"Pocket Option client for account '{account.name}' is not connected. Attempting to re-establish connection.")
+    if await connect_pocket_option_client(account):
+        logger.info(f"Re-established Pocket Option connection for account '{account.name}'.")
+        account.breaker.record_success()
+        return True
+    account.breaker.record_failure("Reconnection failed.")
+    return False
 
-    if is_demo_session is None:
-        logger.critical("Account type (DEMO/REAL) not set during startup. Cannot connect.")
+async def probe_account(account: TradingAccount) -> bool:
+    """Recovery probe of an account's circuit breaker: reconnects if needed and reads the balance."""
+    if not account.is_connected and not await connect_pocket_option_client(account):
+        return False
+    await account.client.get_balance() # type: ignore
+    return True
+
+async def connect_pocket_option_client(account: TradingAccount) -> bool:
+    if account.is_connected:
+        logger.info(f"Pocket Option client for account '{account.name}' is already connected.")
+        return True
+
+    if not account.ssid:
+        logger.critical(f"SSID not set for account '{account.name}'. Cannot connect.")
         return False
 
     try:
-        if not pocket_option_client:
-            pocket_option_client = AsyncPocketOptionClient(ssid, is_demo=is_demo_session,enable_logging=False)
+        if not account.client:
+            account.create_client()
+            if account.primary:
+                asset_index.attach(account.client)
+                clock_sync.attach(account.client)
             
-        await pocket_option_client.connect()
-        logger.info("Pocket Option client re-connected successfully.")
+        if not await account.client.connect(): # type: ignore
+            raise ConnectionError("Connection attempt was not successful.")
+        logger.info(f"Pocket Option client for account '{account.name}' re-connected successfully.")
+        if account.primary:
+            await attach_client_listeners(account.client) # type: ignore
         return True
     except Exception as e:
-        logger.error(f"Failed to re-connect Pocket Option client: {e}", exc_info=True)
-        pocket_option_client = None
+        logger.error(f"Failed to re-connect Pocket Option client for account '{account.name}': {e}", exc_info=True)
+        account.client = None
         return False
 
 def save_to_env(key: str, value: str):
@@ -356,14 +1109,17 @@ def save_to_env(key: str, value: str):
         f.writelines(lines)
     logger.info(f"Successfully saved {key} to .env file.")
 
-async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int, asset: str, direction: OrderDirection, amount: float,after_entry_balance:float,entry_time:datetime) -> None:
+async def handle_trade_outcome_and_martingale(account: TradingAccount, trade_id: int|str, duration: int, asset: str, direction: OrderDirection, amount: float,after_entry_balance:float,entry_time:datetime,
+                                              order_client: Optional[AsyncPocketOptionClient] = None) -> None:
     
-    global trade_sequence_state, pocket_option_client, is_processing_trade_sequence
-    logger.info(f"Monitoring trade ID: {trade_id} (Asset: {asset}, Direction: {direction.value}, Amount: ${amount:.2f}). Preparing for candle-based Martingale decision...")
+    trade_sequence_state = account.trade_sequence_state
+    # The connection that acknowledged the trade (the standby one when a hedge won) gets its updates
+    pocket_option_client = order_client or account.client
+    logger.info(f"[{account.name}] Monitoring trade ID: {trade_id} (Asset: {asset}, Direction: {direction.value}, Amount: ${amount:.2f}). Preparing for candle-based Martingale decision...")
     
     # Calculate time to wait until 5 seconds before trade ends
-    # time_to_wait_seconds = (target_local_dt - datetime.now(LOCAL_TIMEZONE)).total_seconds()
-    trade_end_time = (((entry_time+timedelta(seconds=duration))-(datetime.now(LOCAL_TIMEZONE))) + timedelta(seconds=0.05)).total_seconds()
+    # time_to_wait_seconds = (target_local_dt - datetime.now(local timezone)).total_seconds()
+    trade_end_time = (((entry_time+timedelta(seconds=duration))-(server_now())) + timedelta(seconds=0.05)).total_seconds()
     logger.info(f"Trade ID {trade_id} will end in approximately {trade_end_time:.2f} seconds.")
     if trade_end_time > 0:
         logger.info(f"Waiting {trade_end_time:.2f} seconds before checking candle for Martingale decision for trade ID {trade_id}.")
@@ -371,10 +1127,11 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
     
     # --- Martingale Decision based on Candle ---
     martingale_reentry_needed = False
+    trade_outcome = "unknown"
     try:
         for i in range(3): # Try a few times to get candle data
             try:
-                current_balance = await pocket_option_client.get_balance() # type: ignore
+                current_balance = await account.breaker.call(pocket_option_client.get_balance) # type: ignore
                 if current_balance.balance is not None and current_balance.balance > 0:
                     if i == 3  or current_balance.balance != after_entry_balance:
                         break
@@ -384,12 +1141,18 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
         if current_balance.balance > after_entry_balance:
             logger.info(f"Balance check before Martingale decision: \nCurrent balance {current_balance.balance} {current_balance.currency} is more than balance after entry {after_entry_balance}. No Martingale needed.")
             martingale_reentry_needed = False
+            # A tie refunds the stake, so the balance is back to its value before the entry
+            trade_outcome = "tie" if abs(current_balance.balance - after_entry_balance - amount) < 0.005 else "win"
         else:
             logger.info(f"determine loss based on non-increased balance: Current balance {current_balance.balance} {current_balance.currency} is less or equal to the balance after entry {after_entry_balance}. Considering Martingale re-entry.")
             martingale_reentry_needed = True
+            trade_outcome = "loss"
     except Exception as e:
         logger.warning(f"Could not retrieve balance before Martingale decision: {e}. Aborting re-entry decision.")
         martingale_reentry_needed = False
+    # File write and fold into the aggregates; kept off the event loop like the other ledger and candle store I/O
+    await asyncio.to_thread(trade_ledger.record_trade, entry_time, asset, account.name, direction.value, trade_sequence_state["current_level"], trade_outcome, amount,
+                            current_balance.balance - after_entry_balance - amount if trade_outcome in ("win", "tie") else -amount if trade_outcome == "loss" else 0.0)
     # Wait for the remaining 5 seconds until trade officially ends
     # logger.info(f"Waiting for remaining 5 seconds before potential Martingale re-entry for trade ID {trade_id}.")
     # await asyncio.sleep(5) 
@@ -397,19 +1160,29 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
     # --- Martingale Re-entry Logic ---
     if martingale_reentry_needed:
         logger.info(f"Predicted LOSS for Trade ID {trade_id}. Checking Martingale level...")
-        if trade_sequence_state["current_level"] < MAX_MARTINGALE_LEVELS:
+        if trade_sequence_state["current_level"] < account.sequence_settings.max_martingale_levels:
             trade_sequence_state["current_level"] += 1
-            trade_sequence_state["current_amount"] *= MARTINGALE_MULTIPLIER
+            trade_sequence_state["current_amount"] *= account.sequence_settings.martingale_multiplier
             
             logger.info(f"Proceeding with Martingale Level {trade_sequence_state['current_level']} for {asset} {direction.value}. New Amount: ${trade_sequence_state['current_amount']:.2f}")
+            previous_expiry = entry_time + timedelta(seconds=duration)
             try:
-                next_order = await pocket_option_client.place_order( # type: ignore
+                placement = await account.breaker.call(lambda: order_executor.place(
+                    account,
                     asset=trade_sequence_state["asset"],
                     amount=trade_sequence_state["current_amount"],
                     direction=trade_sequence_state["direction"],
-                    duration=duration
-                )
-                entry_time = datetime.now(LOCAL_TIMEZONE)
+                    duration=duration,
+                    entry_time=previous_expiry
+                ), ignore=(OrderDeadlineExceeded,))
+                next_order = placement.order
+                entry_time = server_now()
+                account.reentry_gap.record((entry_time - previous_expiry).total_seconds() * 1000)
+                if not await coordinator.run(coordinator.renew_sequence, account.name, sequence_lease_seconds(account.sequence_settings)):
+                    logger.error(f"[{account.name}] Sequence lease was lost while the Martingale sequence was running. Another worker may trade this account.")
+                coordinator.journal("order_placed", account.name, next_order.order_id, level=trade_sequence_state["current_level"], asset=asset,
+                                    direction=direction.value, amount=trade_sequence_state["current_amount"], entry_time=entry_time.isoformat(),
+                                    path=placement.path)
                 logger.info(f"Martingale Level {trade_sequence_state['current_level']} trade placed successfully! Order ID: {next_order.order_id}, Status: {next_order.status}")
                 trade_sequence_state["last_trade_id"] = next_order.order_id
                 
@@ -417,7 +1190,7 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
                 martingale_order_details: Optional[OrderResult] = None
                 for i in range(3): # Try a few times to get new order details
                     try:
-                        martingale_order_details = await pocket_option_client.check_order_result(next_order.order_id) # type: ignore
+                        martingale_order_details = await placement.client.check_order_result(next_order.order_id) # type: ignore
                         if martingale_order_details and martingale_order_details.amount: # type: ignore
                             trade_sequence_state["last_trade_open_price"] = martingale_order_details.amount
                             trade_sequence_state["last_trade_open_time"] = martingale_order_details.placed_at # type: ignore
@@ -431,7 +1204,7 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
             
                 for i in range(3): # Try a few times to get candle data
                     try:
-                        current_balance = await pocket_option_client.get_balance() # type: ignore
+                        current_balance = await account.breaker.call(placement.client.get_balance) # type: ignore
                         if current_balance.balance is not None and current_balance.balance > 0:
                             logger.info(f"Retrieved current balance after placing Martingale trade: {current_balance.balance} {current_balance.currency}")
                             trade_sequence_state["current_balance"]= current_balance.balance
@@ -441,45 +1214,50 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
                         logger.warning(f"Could not retrieve balance after placing Martingale trade: {e} -->this affects next Martingale decision",exc_info=True)                    
 
                 # Continue monitoring this new Martingale trade
-                asyncio.create_task(
+                spawn_outcome_monitor(
+                    account,
                     handle_trade_outcome_and_martingale(
+                        account,
                         trade_sequence_state["last_trade_id"],
                         duration,
                         trade_sequence_state["asset"],
                         trade_sequence_state["direction"],
                         trade_sequence_state["current_amount"],
                         trade_sequence_state["current_balance"],
-                        entry_time
+                        entry_time,
+                        order_client=placement.client
                     )
                 )
             except Exception as e:
                 logger.error(f"Failed to place Martingale Level {trade_sequence_state['current_level']} trade: {e}", exc_info=True)
-                # FATAL: Reset sequence and global flag on failure to place Martingale trade
+                coordinator.journal("order_skipped" if isinstance(e, OrderDeadlineExceeded) else "order_failed", account.name,
+                                    level=trade_sequence_state["current_level"], error=str(e))
+                # FATAL: Reset sequence and account flag on failure to place Martingale trade
                 logger.error(f"FATAL: Failed to place Martingale trade. Resetting entire sequence and releasing lock.")
                 trade_sequence_state["active"] = False
                 trade_sequence_state["current_level"] = 0
-                trade_sequence_state["current_amount"] = INITIAL_TRADE_AMOUNT
+                trade_sequence_state["current_amount"] = account.sequence_settings.initial_trade_amount
                 trade_sequence_state["last_trade_open_price"] = None
-                is_processing_trade_sequence = False # Release the lock
+                release_trade_sequence(account) # Release the lock
         else:
-            logger.info(f"Trade LOSS for {asset} {direction.value} ${amount} at final Martingale level ({MAX_MARTINGALE_LEVELS}). Resetting sequence. Waiting for next signal.")
-            # Reset sequence and global flag if max levels reached
+            logger.info(f"Trade LOSS for {asset} {direction.value} ${amount} at final Martingale level ({account.sequence_settings.max_martingale_levels}). Resetting sequence. Waiting for next signal.")
+            # Reset sequence and account flag if max levels reached
             trade_sequence_state["active"] = False
             trade_sequence_state["current_level"] = 0
-            trade_sequence_state["current_amount"] = INITIAL_TRADE_AMOUNT
+            trade_sequence_state["current_amount"] = account.sequence_settings.initial_trade_amount
             trade_sequence_state["last_trade_open_price"] = None
             trade_sequence_state["last_trade_status"] = "Loss"
-            is_processing_trade_sequence = False # Release the lock
+            release_trade_sequence(account) # Release the lock
     else: # predicted WIN or TIE
         logger.info(f"Predicted WIN/TIE for Trade ID {trade_id}. Resetting Martingale sequence. No re-entry.")
-        # Always reset sequence and global flag on a predicted win/tie
+        # Always reset sequence and account flag on a predicted win/tie
         trade_sequence_state["active"] = False
         trade_sequence_state["current_level"] = 0
-        trade_sequence_state["current_amount"] = INITIAL_TRADE_AMOUNT
+        trade_sequence_state["current_amount"] = account.sequence_settings.initial_trade_amount
         trade_sequence_state["last_trade_open_price"] = None
 
         trade_sequence_state["last_trade_status"] = "win"
-        is_processing_trade_sequence = False # Release the lock
+        release_trade_sequence(account) # Release the lock
     
     # --- Final Official Outcome Check for Logging (optional, not for Martingale decision) ---
     # We still check the official outcome for logging purposes, but the Martingale decision is already made.
@@ -487,20 +1265,14 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
     # Give it a small buffer after the trade is supposed to end for the official result to settle
     await asyncio.sleep(0.05) 
     try:
-        save_to_env("TRADE_SEQUENCE_STATE", json.dumps(trade_sequence_state, indent=4) + "\n",)
-        bot_settings = {"FIXED_TRADE_DURATION_SECONDS": os.getenv("FIXED_TRADE_DURATION_SECONDS", 300),
-                        "INITIAL_TRADE_AMOUNT": os.getenv("INITIAL_TRADE_AMOUNT", 1.0),
-                        "MARTINGALE_MULTIPLIER": os.getenv("MARTINGALE_MULTIPLIER", 2.0),
-                        "MAX_MARTINGALE_LEVELS": os.getenv("MAX_MARTINGALE_LEVELS", 2),
-                        }
-        save_to_env(json.dumps("BOT_SETTINGS", indent=4), json.dumps(bot_settings, indent=4) + "\n",)
+        save_to_env(f"TRADE_SEQUENCE_STATE{account.env_suffix}", json.dumps(trade_sequence_state, indent=4) + "\n",)
         logger.info(f"\n\n Checking official final outcome for Trade placed at {trade_sequence_state["last_trade_open_time"]}\n amount: {trade_sequence_state['current_amount']}\n asset: {asset}\n direction: {direction.value}\n\n")
     except Exception as e:
         logger.warning(f"Error saving trade sequence state to .env: {e}")
     if pocket_option_client and pocket_option_client.is_connected:
         try:
             if trade_sequence_state["last_trade_status"] == "win":
-                profit = (await pocket_option_client.get_balance()).balance - after_entry_balance
+                profit = (await account.breaker.call(pocket_option_client.get_balance)).balance - after_entry_balance
                 logger.info(f"\n\nOFFICIAL FINAL OUTCOME for Trade ID {trade_id}: \n Status:{trade_sequence_state["last_trade_status"].upper()} \nProfit: {profit:2f}) USD.\n\n")
             else:
                 logger.info(f"OFFICIAL FINAL OUTCOME for Trade ID {trade_id}: {trade_sequence_state['last_trade_status'].upper()}.")
@@ -512,5 +1284,5 @@ async def handle_trade_outcome_and_martingale(trade_id: int|str, duration: int,
 
     trade_sequence_state["last_trade_status"] = None # Update state with actual outcome
 
-    logger.info(f"Martingale Sequence State AFTER processing Trade ID {trade_id}: Active={trade_sequence_state['active']}, Level={trade_sequence_state['current_level']}, Amount={trade_sequence_state['current_amount']:.2f}, Global Processing Lock: {is_processing_trade_sequence}")
+    logger.info(f"[{account.name}] Martingale Sequence State AFTER processing Trade ID {trade_id}: Active={trade_sequence_state['active']}, Level={trade_sequence_state['current_level']}, Amount={trade_sequence_state['current_amount']:.2f}, Processing Lock: {account.is_processing_trade_sequence}")
     
@@ -0,0 +1,238 @@
+"""
+order_executor.py
+
+Deadline-budgeted order placement. Every order gets a budget that ends
+`max_entry_delay_seconds` after its entry time (the signal's entry instant, or
+the previous trade's expiry for a Martingale re-entry): a binary option filled
+well after its entry is worse than no fill. Within that budget:
+
+- the order is sent on the account's live connection and the executor waits for
+  the server's acknowledgement with a timeout instead of indefinitely;
+- if it is not acknowledged within a latency-derived threshold (a multiple of
+  the account's recent placement p95), or the attempt fails, the same request
+  is sent once more on the account's standby connection (hedging), unless
+  either connection already tracks an order with that requestId. Both sends
+  carry the same requestId and the first acknowledgement wins. Whether
+  Pocket Option deduplicates requestId is NOT verified: if it does not, a
+  primary send that was received but not acknowledged plus the hedge open two
+  positions (double the stake). Hedging is therefore off by default and only
+  meant for accounts where deduplication has been confirmed;
+- when the budget runs out without an acknowledgement the order is given up
+  (OrderDeadlineExceeded), and an order whose budget is already spent before
+  sending is skipped without being sent.
+
+Which path won (primary or hedge), skips and timeouts are counted per account.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Any, Callable
+
+from pocketoptionapi_async import OrderDirection
+from pocketoptionapi_async.models import Order, OrderResult
+
+logger = logging.getLogger(__name__)
+
+# error_message of the placeholder result the client returns when the server never acknowledged an order
+ACK_TIMEOUT_MESSAGE = "Timeout waiting for server confirmation"
+
+
+class OrderDeadlineExceeded(Exception):
+    """The order was not acknowledged (or not sent) within its deadline budget."""
+
+
+@dataclass
+class Placement:
+    order: OrderResult
+    path: str # "primary" or "hedge"
+    client: Any # Connection that acknowledged the order; its open price and result arrive there
+    hedged: bool # Whether a hedge was sent at all
+    elapsed_ms: float
+    budget_ms: float
+
+
+async def send_order(client: Any, request: Order, timeout: float) -> OrderResult:
+    """
+    Sends `request` with its own requestId on `client` and waits up to `timeout` seconds for the
+    server's acknowledgement. Unlike place_order, the caller chooses the requestId, so the same
+    order can be sent on a second connection.
+    """
+    if not client or not client.is_connected:
+        raise ConnectionError("Not connected to PocketOption")
+    validate = getattr(client, "_validate_order_parameters", None)
+    if validate:
+        validate(request.asset, request.amount, request.direction, request.duration)
+    await client._send_order(request)
+    result = await client._wait_for_order_result(request.request_id, request, timeout=timeout)
+    if result.error_message == ACK_TIMEOUT_MESSAGE:
+        raise asyncio.TimeoutError(f"Order {request.request_id} was not acknowledged within {timeout:.2f}s.")
+    return result
+
+
+class OrderExecutor:
+    """
+    Args:
+        now: Current time on the clock the entry times are expressed in (the server clock).
+        max_entry_delay_seconds: Budget after the entry time within which an order must be acknowledged.
+        attempt_timeout_seconds: With hedging, upper bound on waiting for one attempt's acknowledgement (the
+            deadline still ends the wait earlier); a losing attempt is watched for up to this long after the
+            other path won. Not used without hedging.
+        hedging: Send the retry on the account's standby connection. Only enable it once Pocket Option has been
+            shown to deduplicate requestId (see the module docstring). Without it, the primary attempt simply
+            runs until the deadline.
+        hedge_latency_factor: The hedge is sent after this multiple of the account's placement p95.
+        hedge_min_seconds: Lower bound on the hedge threshold.
+        hedge_default_seconds: Hedge threshold until the account has placement latency samples.
+    """
+
+    def __init__(self, now: Callable[[], datetime], max_entry_delay_seconds: float = 5.0, attempt_timeout_seconds: float = 3.0,
+                 hedging: bool = False, hedge_latency_factor: float = 3.0, hedge_min_seconds: float = 0.25,
+                 hedge_default_seconds: float = 1.0):
+        self.now = now
+        self.max_entry_delay_seconds = max_entry_delay_seconds
+        self.attempt_timeout_seconds = attempt_timeout_seconds
+        self.hedging = hedging
+        self.hedge_latency_factor = hedge_latency_factor
+        self.hedge_min_seconds = hedge_min_seconds
+        self.hedge_default_seconds = hedge_default_seconds
+        self._stats: dict[str, dict[str, int]] = {}
+        self._reconcile_tasks: set[asyncio.Task] = set()
+
+    def _count(self, account_name: str, key: str) -> None:
+        stats = self._stats.setdefault(account_name, {"primary": 0, "hedge": 0, "hedges_sent": 0, "skipped": 0,
+                                                      "hedges_suppressed": 0, "deadline_exceeded": 0, "failed": 0,
+                                                      "both_acknowledged": 0})
+        stats[key] += 1
+
+    def hedge_threshold(self, account: Any) -> float:
+        p95_ms = account.placement_latency.percentile(95)
+        if p95_ms is None:
+            return self.hedge_default_seconds
+        return max(self.hedge_min_seconds, self.hedge_latency_factor * p95_ms / 1000)
+
+    def deadline(self, entry_time: datetime) -> datetime:
+        return entry_time + timedelta(seconds=self.max_entry_delay_seconds)
+
+    async def _already_tracked(self, request_id: str, *clients: Any) -> bool:
+        """Whether any of `clients` already knows an order with `request_id` (acknowledged or settled)."""
+        for client in clients:
+            check = getattr(client, "check_order_result", None)
+            if client is not None and check is not None:
+                try:
+                    known = await check(request_id)
+                    if known is not None and known.error_message != ACK_TIMEOUT_MESSAGE: # Not the client's own placeholder
+                        return True
+                except Exception as e:
+                    logger.debug(f"Could not look up order {request_id} before hedging: {e}")
+        return False
+
+    def _remaining(self, deadline: datetime) -> float:
+        return (deadline - self.now()).total_seconds()
+
+    def _attempt_timeout(self, remaining: float) -> float:
+        # Without a second path to fall back on, the one attempt may use the whole budget
+        return min(self.attempt_timeout_seconds, remaining) if self.hedging else remaining
+
+    async def place(self, account: Any, asset: str, amount: float, direction: OrderDirection, duration: int,
+                    entry_time: datetime) -> Placement:
+        """
+        Places one order on `account` within the budget of `entry_time`.
+
+        Raises:
+            OrderDeadlineExceeded: The budget was spent before sending, or ran out before any acknowledgement.
+            Exception: The error of the primary attempt, when every attempt failed before the deadline.
+        """
+        deadline = self.deadline(entry_time)
+        budget = self._remaining(deadline)
+        if budget <= 0:
+            self._count(account.name, "skipped")
+            raise OrderDeadlineExceeded(f"Entry budget for {asset} was spent {-budget:.2f}s ago. Order not sent.")
+
+        request = Order(asset=asset, amount=amount, direction=direction, duration=duration)
+        started = time.perf_counter()
+        hedge_at = self.hedge_threshold(account)
+        clients = {"primary": account.client}
+        attempts = {asyncio.create_task(send_order(account.client, request, self._attempt_timeout(budget)),
+                                        name=f"order-primary-{request.request_id}"): "primary"}
+        errors: dict[str, BaseException] = {}
+        hedged = False
+        hedge_suppressed = False
+        try:
+            while attempts:
+                remaining = self._remaining(deadline)
+                if remaining <= 0:
+                    break
+                standby = getattr(account, "standby_client", None)
+                can_hedge = self.hedging and not hedged and not hedge_suppressed and standby is not None and standby.is_connected
+                wait = remaining
+                if can_hedge:
+                    wait = max(0.0, min(remaining, hedge_at - (time.perf_counter() - started)))
+                done, _ = await asyncio.wait(attempts, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    path = attempts.pop(task)
+                    try:
+                        order = task.result()
+                    except Exception as e:
+                        errors[path] = e
+                        logger.warning(f"[{account.name}] {path.capitalize()} attempt for order {request.request_id} failed: {e}")
+                        continue
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    self._count(account.name, path)
+                    for pending in attempts:
+                        self._reconcile(account.name, request, path, pending)
+                    attempts.clear()
+                    logger.info(f"[{account.name}] Order {request.request_id} acknowledged via the {path} connection in {elapsed_ms:.1f}ms "
+                                f"(budget {budget * 1000:.0f}ms{', hedged' if hedged else ''}).")
+                    return Placement(order=order, path=path, client=clients[path], hedged=hedged, elapsed_ms=elapsed_ms, budget_ms=budget * 1000)
+                remaining = self._remaining(deadline)
+                if can_hedge and remaining > 0 and (not attempts or time.perf_counter() - started >= hedge_at):
+                    if await self._already_tracked(request.request_id, account.client, standby):
+                        # The server has the order; a second send could only open a second position
+                        hedge_suppressed = True
+                        self._count(account.name, "hedges_suppressed")
+                        logger.warning(f"[{account.name}] Order {request.request_id} is already known to the server. Not hedging it.")
+                        continue
+                    hedged = True
+                    clients["hedge"] = standby
+                    self._count(account.name, "hedges_sent")
+                    logger.warning(f"[{account.name}] Order {request.request_id} not acknowledged after {(time.perf_counter() - started) * 1000:.0f}ms. "
+                                   f"Sending it on the standby connection.")
+                    attempts[asyncio.create_task(send_order(standby, request, self._attempt_timeout(remaining)),
+                                                 name=f"order-hedge-{request.request_id}")] = "hedge"
+        finally:
+            for task in attempts:
+                task.cancel()
+
+        # An attempt that timed out together with the budget is a missed deadline, not a failure
+        if errors and len(errors) == (2 if hedged else 1) and self._remaining(deadline) > 0:
+            self._count(account.name, "failed")
+            raise errors.get("primary") or next(iter(errors.values()))
+        self._count(account.name, "deadline_exceeded")
+        logger.error(f"[{account.name}] Order {request.request_id} was not acknowledged within its {budget:.2f}s budget. Giving up on it; "
+                     f"if the server still opens it, it is not monitored.")
+        raise OrderDeadlineExceeded(f"Order for {asset} was not acknowledged within {budget:.2f}s of its entry budget.")
+
+    def _reconcile(self, account_name: str, request: Order, winner: str, pending: asyncio.Task) -> None:
+        """Lets the losing attempt run to its timeout in the background and reports it if it was acknowledged as well."""
+        async def watch() -> None:
+            try:
+                await pending
+            except Exception:
+                return
+            self._count(account_name, "both_acknowledged")
+            logger.warning(f"[{account_name}] Order {request.request_id} was also acknowledged on the other connection after the "
+                           f"{winner} path won. Check the account for a second position if the server does not deduplicate requestId.")
+        task = asyncio.create_task(watch(), name=f"order-reconcile-{request.request_id}")
+        self._reconcile_tasks.add(task)
+        task.add_done_callback(self._reconcile_tasks.discard)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "max_entry_delay_seconds": self.max_entry_delay_seconds,
+            "attempt_timeout_seconds": self.attempt_timeout_seconds,
+            "hedging": self.hedging,
+            "hedge_latency_factor": self.hedge_latency_factor,
+            "accounts": self._stats,
+        }
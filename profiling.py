@@ -0,0 +1,188 @@
+"""
+profiling.py
+
+On-demand profiling helpers for the running trading server. A capture can be
+started and stopped from the admin endpoints in main.py without restarting
+uvicorn, either as a deterministic cProfile run or as a low-overhead sampling
+run that produces collapsed stacks (flamegraph.pl / speedscope format).
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, Any
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling")
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.005 # 200 Hz
+
+
+class ProfileCapture:
+    """
+    A single profiling capture bound to the event loop thread.
+
+    The capture stops itself after `duration_seconds` or after `max_signals`
+    trade signals have been recorded, whichever comes first. It can also be
+    stopped explicitly with stop().
+    """
+
+    def __init__(self, mode: str = "cprofile", duration_seconds: Optional[float] = None,
+                 max_signals: Optional[int] = None,
+                 sample_interval_seconds: float = DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Invalid profile mode '{mode}'. Must be one of {PROFILE_MODES}.")
+        self.mode = mode
+        self.duration_seconds = duration_seconds
+        self.max_signals = max_signals
+        self.sample_interval_seconds = sample_interval_seconds
+
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.signals_seen = 0
+
+        self._profiler: Optional[cProfile.Profile] = None
+        self._samples: Counter = Counter()
+        self._sample_count = 0
+        self._sampler_thread: Optional[threading.Thread] = None
+        self._sampler_stop = threading.Event()
+        self._target_thread_id: Optional[int] = None
+        self._stop_handle: Optional[asyncio.TimerHandle] = None
+        self._result: Optional[bytes] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.started_at is not None and self.stopped_at is None
+
+    def start(self) -> None:
+        """Starts the capture. Must be called from the event loop thread."""
+        if self.started_at is not None:
+            raise RuntimeError("Profile capture has already been started.")
+        self.started_at = time.time()
+        self._target_thread_id = threading.get_ident()
+
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler_thread = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+            self._sampler_thread.start()
+
+        if self.duration_seconds:
+            self._stop_handle = asyncio.get_running_loop().call_later(self.duration_seconds, self.stop)
+        logger.info(f"Profile capture started (mode={self.mode}, duration={self.duration_seconds}s, max_signals={self.max_signals}).")
+
+    def stop(self) -> None:
+        """Stops the capture and renders the result. Safe to call more than once."""
+        if not self.is_active:
+            return
+        self.stopped_at = time.time()
+        if self._stop_handle:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+
+        if self.mode == "cprofile" and self._profiler:
+            self._profiler.disable()
+            self._profiler.create_stats()
+            # Same format as cProfile.Profile.dump_stats(), loadable with pstats.Stats(path)
+            self._result = marshal.dumps(self._profiler.stats) # type: ignore
+        else:
+            self._sampler_stop.set()
+            if self._sampler_thread:
+                self._sampler_thread.join(timeout=1.0)
+            self._result = self._render_collapsed().encode("utf-8")
+        logger.info(f"Profile capture stopped after {self.stopped_at - self.started_at:.2f}s and {self.signals_seen} signal(s).") # type: ignore
+
+    def record_signal(self) -> None:
+        """Counts one processed trade signal and stops the capture if the signal budget is used up."""
+        if not self.is_active:
+            return
+        self.signals_seen += 1
+        if self.max_signals and self.signals_seen >= self.max_signals:
+            self.stop()
+
+    def _sample_loop(self) -> None:
+        while not self._sampler_stop.wait(self.sample_interval_seconds):
+            frame = sys._current_frames().get(self._target_thread_id) # type: ignore
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self._samples[";".join(reversed(stack))] += 1
+            self._sample_count += 1
+
+    def _render_collapsed(self) -> str:
+        buffer = io.StringIO()
+        for stack, count in self._samples.most_common():
+            buffer.write(f"{stack} {count}\n")
+        return buffer.getvalue()
+
+    @property
+    def result(self) -> Optional[bytes]:
+        return self._result
+
+    @property
+    def filename(self) -> str:
+        started = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at or time.time()))
+        extension = "pstats" if self.mode == "cprofile" else "collapsed.txt"
+        return f"profile-{started}.{extension}"
+
+    def summary(self) -> dict:
+        end = self.stopped_at or time.time()
+        return {
+            "mode": self.mode,
+            "active": self.is_active,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "duration_seconds": self.duration_seconds,
+            "max_signals": self.max_signals,
+            "signals_seen": self.signals_seen,
+            "samples": self._sample_count if self.mode == "sampling" else None,
+            "result_bytes": len(self._result) if self._result else 0,
+        }
+
+
+def dump_task_stacks(highlight: str = "handle_trade_outcome_and_martingale", limit: Optional[int] = None,
+                     highlight_prefix: str = "martingale-monitor-") -> dict[str, Any]:
+    """
+    Collects the stack of every pending asyncio task on the running loop.
+
+    Args:
+        highlight: Coroutine name whose tasks are also listed separately (e.g. outcome monitors).
+        limit: Maximum number of frames to include per task.
+        highlight_prefix: Tasks whose name starts with this are highlighted too (outcome monitors run
+            wrapped by the task supervisor, so their coroutine has a different name).
+
+    Returns:
+        A dictionary with all tasks and the subset running the highlighted coroutine.
+    """
+    tasks = []
+    highlighted = []
+    current = asyncio.current_task()
+    for task in asyncio.all_tasks():
+        if task is current:
+            continue
+        coro = task.get_coro()
+        coro_name = getattr(coro, "__qualname__", repr(coro))
+        stack_buffer = io.StringIO()
+        task.print_stack(limit=limit, file=stack_buffer)
+        entry = {
+            "name": task.get_name(),
+            "coroutine": coro_name,
+            "done": task.done(),
+            "cancelled": task.cancelled(),
+            "stack": stack_buffer.getvalue(),
+        }
+        tasks.append(entry)
+        if coro_name == highlight or task.get_name().startswith(highlight_prefix):
+            highlighted.append(entry)
+    return {"task_count": len(tasks), "tasks": tasks, highlight: highlighted}
@@ -1,20 +1,30 @@
 # scraper.py - Automated Scraper for Pocket Option SSID and UID
 
 import os
+import asyncio
 import json
 import time
 import re
 import logging
+import threading
 import urllib.parse
-from typing import cast, List, Dict, Any, Optional
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import cast, List, Dict, Any, Optional, Callable
+
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import connect as cdp_connect
 
 from selenium import webdriver
 from selenium.webdriver.edge.service import Service
 from selenium.webdriver.edge.options import Options as EdgeOptions
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from dotenv import load_dotenv # Import dotenv
+from dotenv import load_dotenv, dotenv_values # Import dotenv
+
+from session_refresh import HttpSessionRefresher, build_auth_payload
 
 # Load environment variables from .env file
 load_dotenv()
@@ -32,6 +42,29 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 LOCAL_SHARED_DATA_DIR = "./shared_data"
+# Run Edge without a window (set SCRAPER_HEADLESS=0 to watch the browser, e.g. to solve a captcha)
+SCRAPER_HEADLESS = os.getenv('SCRAPER_HEADLESS', '1') != '0'
+# Try the browser-less refresh with the saved cookies before driving Edge (SCRAPER_HTTP_REFRESH=0 to disable)
+SCRAPER_HTTP_REFRESH = os.getenv('SCRAPER_HTTP_REFRESH', '1') != '0'
+# Serializes .env / accounts file writes from the DEMO and REAL refresh threads
+env_file_lock = threading.Lock()
+
+# Longest time to wait for the "auth" frame after opening the cabinet page
+AUTH_FRAME_TIMEOUT_SECONDS = float(os.getenv('AUTH_FRAME_TIMEOUT_SECONDS', 30))
+
+# Regex to capture the session string (SSID) and the uid from the "auth" message.
+# It handles escaped quotes within the session string and verifies isDemo.
+SSID_UID_PATTERN = re.compile(
+    r'42\["auth",\{"session":"((?:\\.|[^"\\])*)",'  # Group 1: Full session string with escapes
+    r'"isDemo":(\d),'                               # Group 2: isDemo (0 or 1)
+    r'"uid":(\d+),'                                 # Group 3: UID
+    r'"platform":\d+,'
+    r'"isFastHistory":(?:true|false),'
+    r'"isOptimized":(?:true|false)\}\]'
+)
+# Cheap substring checks run on the raw CDP message before any JSON decoding.
+# Inside a CDP message the frame payload is a JSON string, so its quotes are escaped.
+AUTH_FRAME_MARKERS = ('42[\\"auth\\"', '42["auth"')
 
 
 def save_to_env(key: str, value: str):
@@ -56,20 +89,110 @@ def save_to_env(key: str, value: str):
     if not found:
         lines.append(f"{key}='{value}'\n") # Use single quotes
 
-    with open(env_path, "w") as f:
+    # Written to a temp file and renamed, so a reader (the trader's credential watcher) never sees a partial file
+    temp_path = env_path + ".tmp"
+    with open(temp_path, "w") as f:
         f.writelines(lines)
+    os.replace(temp_path, env_path)
     logger.info(f"Successfully saved {key} to .env file.")
 
 
-def get_pocketoption_session_data(email: str, password: str, account_type: str) -> dict[str, Optional[str]]:
+def match_auth_frame(payload_data: str, expected_is_demo_value: int) -> Optional[tuple[str, str]]:
     """
-    Automates the process of logging into PocketOption using Microsoft Edge,
-    navigating to a specific cabinet page (real or demo), and then scraping
-    WebSocket traffic to extract the session ID (SSID) and User ID (UID).
-    Returns a dictionary containing 'ssid' and 'uid'.
+    Checks one sent WebSocket frame for the "auth" message of the expected account type.
+    Returns (full SSID payload for .env, UID) or None.
+    """
+    match = SSID_UID_PATTERN.search(payload_data)
+    if not match:
+        return None
+    extracted_session = match.group(1).replace('\\"', '"') # Unescape quotes
+    extracted_is_demo = int(match.group(2))
+    extracted_uid_str = match.group(3)
+    if extracted_is_demo != expected_is_demo_value:
+        logger.warning(f"Found SSID but 'isDemo' ({extracted_is_demo}) did not match expected ({expected_is_demo_value}). Skipping.")
+        return None
+    # Construct the full string including the 42 prefix and the JSON structure
+    return build_auth_payload(extracted_session, extracted_is_demo, extracted_uid_str), extracted_uid_str
+
+
+def _frame_sent_payload(raw_message: str) -> Optional[str]:
+    """
+    Returns the payload of a CDP Network.webSocketFrameSent event that may carry the "auth"
+    message, or None. Everything else is discarded by substring checks without decoding JSON.
+    """
+    if "Network.webSocketFrameSent" not in raw_message or not any(marker in raw_message for marker in AUTH_FRAME_MARKERS):
+        return None
+    try:
+        message = json.loads(raw_message)
+        message = message.get("message", message) # Performance log entries wrap the CDP event
+        return message["params"]["response"]["payloadData"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logger.debug(f"Skipping undecodable WebSocket frame event: {e}")
+        return None
+
+
+def _debugger_address(driver: webdriver.Edge) -> str:
+    options = driver.capabilities.get("ms:edgeOptions") or driver.capabilities.get("goog:chromeOptions") or {}
+    return options.get("debuggerAddress") or "127.0.0.1:9222"
+
+
+def capture_auth_frame_cdp(driver: webdriver.Edge, expected_is_demo_value: int, navigate: Callable[[], None],
+                           timeout_seconds: float) -> Optional[tuple[str, str]]:
+    """
+    Streams Network.webSocketFrameSent events from the page over the browser's DevTools
+    websocket, runs `navigate`, and returns as soon as the "auth" frame has been sent.
+    Raises OSError when the DevTools endpoint cannot be reached.
+    """
+    debugger_address = _debugger_address(driver)
+    with urllib.request.urlopen(f"http://{debugger_address}/json", timeout=5) as response:
+        targets = json.loads(response.read())
+    page = next(target for target in targets if target.get("type") == "page" and target.get("webSocketDebuggerUrl"))
+    with cdp_connect(page["webSocketDebuggerUrl"], max_size=None, open_timeout=5) as cdp:
+        cdp.send(json.dumps({"id": 1, "method": "Network.enable", "params": {}}))
+        navigate()
+        deadline = time.monotonic() + timeout_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                raw_message = cdp.recv(timeout=remaining)
+            except TimeoutError:
+                break
+            payload_data = _frame_sent_payload(raw_message if isinstance(raw_message, str) else raw_message.decode("utf-8", "replace"))
+            if payload_data:
+                found = match_auth_frame(payload_data, expected_is_demo_value)
+                if found:
+                    return found
+    return None
+
+
+def capture_auth_frame_log(driver: webdriver.Edge, expected_is_demo_value: int, timeout_seconds: float,
+                           poll_interval_seconds: float = 0.25) -> Optional[tuple[str, str]]:
+    """
+    Fallback when the DevTools websocket is unavailable: drains the performance log in small
+    batches (so the buffer never rolls over) and returns at the first matching "auth" frame.
     """
-    logger.info(f"Starting Microsoft Edge browser instance for automated login to {account_type} account...")
-    
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        entries = cast(List[Dict[str, Any]], driver.get_log("performance"))
+        for entry in entries:
+            payload_data = _frame_sent_payload(entry.get("message", ""))
+            if payload_data:
+                found = match_auth_frame(payload_data, expected_is_demo_value)
+                if found:
+                    return found
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll_interval_seconds)
+
+
+LOGIN_URL = "https://pocketoption.com/en/login/"
+# Cabinet page opened for each account type and the isDemo value expected in its "auth" frame
+CABINET_TARGETS = {
+    "DEMO": ("https://pocketoption.com/en/cabinet/demo-quick-high-low/", 1),
+    "REAL": ("https://pocketoption.com/en/cabinet/", 0),
+}
+
+
+def build_edge_options(profile_dir: str, headless: bool) -> EdgeOptions:
     edge_options = EdgeOptions()
     edge_options.add_argument("--no-sandbox")
     edge_options.add_argument("--disable-dev-shm-usage")
@@ -77,51 +200,75 @@ def get_pocketoption_session_data(email: str, password: str, account_type: str)
     edge_options.add_argument("--window-size=1920,1080")
     edge_options.add_argument("--start-maximized")
     edge_options.add_argument("--log-level=0") # Set Edge's internal logging to verbose
-    edge_options.add_argument("--remote-debugging-port=9222")
+    # No fixed --remote-debugging-port: msedgedriver picks a free port and reports it as
+    # debuggerAddress, so DEMO and REAL browsers can run side by side.
     edge_options.add_argument("--disable-features=RendererCodeIntegrity")
     edge_options.add_argument("--disable-extensions")
     edge_options.add_argument("--disable-background-networking")
+    # Persisted profile: cookies survive browser restarts, so a relaunch rarely needs a full login
+    edge_options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+    if headless:
+        edge_options.add_argument("--headless=new")
 
     # Enable performance logging for Edge (CRITICAL for capturing WebSocket traffic)
     edge_options.set_capability("ms:loggingPrefs", {"performance": "ALL"})
+    return edge_options
 
-    driver = None
-    session_data = {"ssid": str(None), "uid": None}
 
-    try:
-        service = Service(MANUAL_EDGEDRIVER_PATH)
-        driver = webdriver.Edge(service=service, options=edge_options)
-        logger.info("Microsoft Edge WebDriver initialized successfully.")
+class BrowserSession:
+    """
+    One long-lived Edge instance logged in to one account type. Each refresh reloads only the
+    cabinet page to capture a fresh "auth" frame; the login form is used only when the
+    persisted profile's session has expired. A crashed or unresponsive browser is relaunched.
+
+    Args:
+        account_type: "DEMO" or "REAL".
+        email: Pocket Option login e-mail.
+        password: Pocket Option password.
+        profile_dir: Browser profile directory (one per account type, browsers cannot share one).
+        headless: Run Edge without a window.
+    """
 
-        login_url = "https://pocketoption.com/en/login/"
-        
-        # Determine target cabinet URL based on selected account type
-        if account_type.upper() == "DEMO":
-            target_cabinet_url = "https://pocketoption.com/en/cabinet/demo-quick-high-low/"
-            expected_is_demo_value = 1 # Expected isDemo value in SSID for demo account
-        elif account_type.upper() == "REAL":
-            target_cabinet_url = "https://pocketoption.com/en/cabinet/" # General cabinet for real
-            expected_is_demo_value = 0 # Expected isDemo value in SSID for real account
-        else:
+    def __init__(self, account_type: str, email: str, password: str, profile_dir: Optional[str] = None,
+                 headless: bool = True):
+        account_type = account_type.upper()
+        if account_type not in CABINET_TARGETS:
             raise ValueError("Invalid account_type. Must be 'DEMO' or 'REAL'.")
+        self.account_type = account_type
+        self.email = email
+        self.password = password
+        self.profile_dir = profile_dir or os.path.join(LOCAL_SHARED_DATA_DIR, f"browser_profile_{account_type.lower()}")
+        self.cookie_jar_path = os.path.join(LOCAL_SHARED_DATA_DIR, f"cookies_{account_type.lower()}.json")
+        self.headless = headless
+        self.driver: Optional[webdriver.Edge] = None
+        self.launches = 0
+        self.logins = 0
+        self._lock = threading.Lock() # One refresh at a time per browser
+
+    @property
+    def is_alive(self) -> bool:
+        """False when the browser was never started, has crashed or no longer answers WebDriver calls."""
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_url # Cheap round trip to the browser
+            return True
+        except WebDriverException:
+            return False
+
+    def _launch(self) -> webdriver.Edge:
+        self.close()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        logger.info(f"Starting Microsoft Edge browser instance for the {self.account_type} account (profile: {self.profile_dir})...")
+        service = Service(MANUAL_EDGEDRIVER_PATH)
+        self.driver = webdriver.Edge(service=service, options=build_edge_options(self.profile_dir, self.headless))
+        self.launches += 1
+        logger.info("Microsoft Edge WebDriver initialized successfully.")
+        return self.driver
 
-        # Regex to capture the session string (SSID) and the uid from the "auth" message.
-        # It handles escaped quotes within the session string and verifies isDemo.
-        # Group 1: Full "auth" payload (for SSID env var)
-        # Group 2: Session string (raw value for AsyncPocketOptionClient)
-        # Group 3: isDemo value (int)
-        # Group 4: UID value (int)
-        ssid_uid_pattern = re.compile(
-            r'42\["auth",\{"session":"((?:\\.|[^"\\])*)",'  # Group 1: Full session string with escapes
-            r'"isDemo":(\d),'                               # Group 2: isDemo (0 or 1)
-            r'"uid":(\d+),'                                 # Group 3: UID
-            r'"platform":\d+,'
-            r'"isFastHistory":(?:true|false),'
-            r'"isOptimized":(?:true|false)\}\]'
-        )
-        
-        logger.info(f"Navigating to login page: {login_url}")
-        driver.get(login_url)
+    def _login(self, driver: webdriver.Edge) -> None:
+        logger.info(f"Navigating to login page: {LOGIN_URL}")
+        driver.get(LOGIN_URL)
 
         WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.NAME, "email")))
         WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.NAME, "password")))
@@ -131,8 +278,8 @@ def get_pocketoption_session_data(email: str, password: str, account_type: str)
         password_field = driver.find_element(By.NAME, "password")
         login_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
 
-        email_field.send_keys(email)
-        password_field.send_keys(password)
+        email_field.send_keys(self.email)
+        password_field.send_keys(self.password)
         login_button.click()
         logger.info("Login credentials entered and login button clicked.")
 
@@ -141,90 +288,157 @@ def get_pocketoption_session_data(email: str, password: str, account_type: str)
             EC.url_contains("cabinet") or EC.url_contains("dashboard") or 
             EC.presence_of_element_located((By.CSS_SELECTOR, ".header-user__name"))
         )
+        self.logins += 1
         logger.info("Successfully logged in to Pocket Option website.")
 
-        # Now navigate to the specific target URL within the cabinet to ensure all WebSocket connections are made.
+    def _open_cabinet(self, driver: webdriver.Edge, target_cabinet_url: str) -> None:
+        """Opens the cabinet page, logging in first if the persisted session has expired."""
         logger.info(f"Navigating to target cabinet page: {target_cabinet_url}")
         driver.get(target_cabinet_url)
-
+        if "login" in driver.current_url:
+            logger.info("Saved browser session has expired. Logging in again.")
+            self._login(driver)
+            driver.get(target_cabinet_url)
         WebDriverWait(driver, 60).until(EC.url_contains(target_cabinet_url))
         logger.info("Successfully navigated to the target cabinet page.")
 
-        # Give the page some time to load all WebSocket connections and messages.
-        time.sleep(20) # Increased sleep to ensure more logs are captured
-
-        performance_logs = cast(List[Dict[str, Any]], driver.get_log("performance"))
-        logger.info(f"Collected {len(performance_logs)} performance log entries. Analyzing for SSID and UID...")
-
-        found_full_ssid_string = None
-        found_uid = None
-        
-        # Iterate through the performance logs to find WebSocket frames.
-        for i, entry in enumerate(performance_logs):
+    def _extract(self, driver: webdriver.Edge) -> Optional[tuple[str, str]]:
+        target_cabinet_url, expected_is_demo_value = CABINET_TARGETS[self.account_type]
+        # Stream the page's sent WebSocket frames and stop at the first "auth" frame,
+        # instead of sleeping and then decoding the whole performance log.
+        capture_started = time.monotonic()
+        found = None
+        navigated = False
+
+        def navigate() -> None:
+            nonlocal navigated
+            self._open_cabinet(driver, target_cabinet_url)
+            navigated = True
+
+        try:
+            found = capture_auth_frame_cdp(driver, expected_is_demo_value, navigate, AUTH_FRAME_TIMEOUT_SECONDS)
+        except (OSError, StopIteration, ValueError, WebSocketException) as e:
+            logger.warning(f"DevTools websocket unavailable ({e}). Reading the performance log instead.")
+            if not navigated:
+                navigate()
+            found = capture_auth_frame_log(driver, expected_is_demo_value, AUTH_FRAME_TIMEOUT_SECONDS)
+        if not found:
+            # Frames sent before the stream was attached are still in the performance log
+            found = capture_auth_frame_log(driver, expected_is_demo_value, 0)
+
+        if found:
+            logger.info(
+                f"FOUND SSID and UID IN WEBSOCKET FRAMES FOR {self.account_type} ACCOUNT after {time.monotonic() - capture_started:.2f}s. "
+                f"SSID: {found[0][:50]}... UID: {found[1]}"
+            )
+        return found
+
+    def save_cookies(self) -> None:
+        """Writes the browser's pocketoption.com cookies to the cookie jar file."""
+        if not self.driver:
+            return
+        cookies = [cookie for cookie in self.driver.get_cookies() if "pocketoption" in cookie.get("domain", "")]
+        os.makedirs(os.path.dirname(self.cookie_jar_path), exist_ok=True)
+        temp_path = self.cookie_jar_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(cookies, f, indent=2)
+        os.replace(temp_path, self.cookie_jar_path)
+
+    def refresh(self) -> dict[str, Optional[str]]:
+        """
+        Captures a fresh SSID and UID. Relaunches the browser once if it has crashed.
+        Returns a dictionary containing 'ssid' and 'uid' (None when not found).
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    driver = self.driver if self.is_alive else self._launch()
+                    found = self._extract(driver) # type: ignore
+                    if found:
+                        self.save_cookies()
+                        return {"ssid": found[0], "uid": found[1]}
+                    logger.warning(
+                        f"Full SSID string and/or UID pattern for {self.account_type} account not found in WebSocket frames after login."
+                    )
+                    return {"ssid": None, "uid": None}
+                except WebDriverException as e:
+                    if attempt == 0 and not self.is_alive:
+                        logger.warning(f"Browser for the {self.account_type} account crashed ({e.msg}). Relaunching.")
+                        continue
+                    logger.error(f"An error occurred during Edge automation: {e}", exc_info=True)
+                except Exception as e:
+                    logger.error(f"An error occurred during Edge automation: {e}", exc_info=True)
+                break
+            return {"ssid": None, "uid": None}
+
+    def close(self) -> None:
+        if self.driver:
             try:
-                message = json.loads(entry["message"])
-                log_method = message["message"]["method"]
-                
-                # Log all WebSocket frame messages in detail (DEBUG level)
-                if log_method == "Network.webSocketFrameReceived" or log_method == "Network.webSocketFrameSent":
-                    payload_data = message["message"]["params"]["response"]["payloadData"]
-                    logger.debug(f"--- WebSocket Frame ({log_method}) Entry {i} ---")
-                    logger.debug(f"Timestamp: {entry['timestamp']}")
-                    logger.debug(f"Frame Type: {'Received' if log_method == 'Network.webSocketFrameReceived' else 'Sent'}")
-                    logger.debug(f"Payload Data: {payload_data}")
-                    logger.debug("-----------------------------------")
-
-                    # Attempt to find the full SSID and UID string using the defined regex pattern.
-                    match = ssid_uid_pattern.search(payload_data)
-                    if match:
-                        extracted_session = match.group(1).replace('\\"', '"') # Unescape quotes
-                        extracted_is_demo = int(match.group(2))
-                        extracted_uid_str = match.group(3)
-                        
-                        if extracted_is_demo == expected_is_demo_value:
-                            # Construct the full string including the 42 prefix and the JSON structure
-                            full_payload_for_env = f'42["auth",{{"session":"{extracted_session.replace("\"", "\\\"")}","isDemo":{extracted_is_demo},"uid":{extracted_uid_str},"platform":2,"isFastHistory":true,"isOptimized":true}}]'
-                            
-                            found_full_ssid_string = full_payload_for_env
-                            found_uid = extracted_uid_str
-                            
-                            logger.info(
-                                f"FOUND SSID and UID IN LOGS FOR {account_type} ACCOUNT."
-                                f"SSID: {found_full_ssid_string[:50]}... UID: {found_uid}"
-                            )
-                            # Do NOT break here. Continue logging other messages to see the full loop.
-                            # We will save the *last* found valid SSID and UID.
-                        else:
-                            logger.warning(f"Found SSID but 'isDemo' ({extracted_is_demo}) did not match expected ({expected_is_demo_value}). Skipping.")
-
-
-            except json.JSONDecodeError:
-                logger.debug(f"Skipping non-JSON log entry {i}.")
-            except KeyError as ke:
-                logger.debug(f"Skipping log entry {i} due to missing key: {ke}. Entry: {entry}")
+                self.driver.quit()
+                logger.info("WebDriver closed.")
             except Exception as e:
-                logger.error(f"Error processing log entry {i}: {e}", exc_info=True)
+                logger.debug(f"Error closing WebDriver: {e}")
+            self.driver = None
 
 
-        if found_full_ssid_string and found_uid:
-            session_data["ssid"] = found_full_ssid_string
-            session_data["uid"] = found_uid
-            save_to_env("SSID", found_full_ssid_string)
-            save_to_env("UID", found_uid)
-            save_to_env("ACCOUNT_TYPE", account_type.upper())
-            logger.info(f"Full SSID and UID for {account_type} account successfully extracted and saved to .env.")
-        else:
-            logger.warning(
-                f"Full SSID string and/or UID pattern for {account_type} account not found in WebSocket logs after login."
-            )
+def save_session_data(account_type: str, ssid: str, uid: str, primary_account_type: Optional[str] = None) -> None:
+    """
+    Stores freshly extracted credentials. SSID_<TYPE> / UID_<TYPE> are always written so DEMO and
+    REAL can be refreshed side by side; SSID / UID / ACCOUNT_TYPE (read by main.py) are written for
+    the primary account type. In the accounts file only the entries of this login are updated: those
+    whose "uid" matches, or whose "name" is SCRAPER_ACCOUNT_NAME_<TYPE>. Entries of the same account
+    type without a uid belong to other logins as far as the scraper can tell and are left alone.
+    """
+    account_type = account_type.upper()
+    with env_file_lock:
+        save_to_env(f"SSID_{account_type}", ssid)
+        save_to_env(f"UID_{account_type}", uid)
+        if account_type == (primary_account_type or account_type):
+            save_to_env("SSID", ssid)
+            save_to_env("UID", uid)
+            save_to_env("ACCOUNT_TYPE", account_type)
+
+        accounts_file = os.getenv('ACCOUNTS_FILE', 'accounts.json')
+        if os.path.exists(accounts_file):
+            with open(accounts_file, "r") as f:
+                entries = json.load(f)
+            target_name = os.getenv(f'SCRAPER_ACCOUNT_NAME_{account_type}')
+            updated = 0
+            skipped = []
+            for i, entry in enumerate(entries):
+                if str(entry.get("account_type", "DEMO")).upper() != account_type:
+                    continue
+                name = str(entry.get("name") or f"account{i + 1}")
+                if ("uid" in entry and str(entry["uid"]) == str(uid)) or (target_name and name == target_name):
+                    entry["ssid"] = ssid
+                    updated += 1
+                elif "uid" not in entry:
+                    skipped.append(name)
+            if skipped:
+                logger.warning(f"Not updating {account_type} account(s) {skipped} in {accounts_file}: they have no uid to match "
+                               f"against {uid} (add it, or set SCRAPER_ACCOUNT_NAME_{account_type}).")
+            if updated:
+                temp_path = accounts_file + ".tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(entries, f, indent=4)
+                os.replace(temp_path, accounts_file)
+                logger.info(f"Updated SSID of {updated} {account_type} account(s) in {accounts_file}.")
+    logger.info(f"Full SSID and UID for {account_type} account successfully extracted and saved to .env.")
+
 
-    except Exception as e:
-        logger.error(f"An error occurred during Edge automation: {e}", exc_info=True)
+def get_pocketoption_session_data(email: str, password: str, account_type: str) -> dict[str, Optional[str]]:
+    """
+    One-shot extraction: launches a browser, logs in to the given account type (real or demo),
+    scrapes the session ID (SSID) and User ID (UID), saves them and closes the browser.
+    Returns a dictionary containing 'ssid' and 'uid'.
+    """
+    session = BrowserSession(account_type, email, password, headless=SCRAPER_HEADLESS)
+    try:
+        session_data = session.refresh()
     finally:
-        if driver:
-            driver.quit()
-            logger.info("WebDriver closed.")
-    
+        session.close()
+    if session_data["ssid"] and session_data["uid"]:
+        save_session_data(account_type, session_data["ssid"], session_data["uid"])
     return session_data
 
 
@@ -243,21 +457,46 @@ if __name__ == "__main__":
     os.makedirs(LOCAL_SHARED_DATA_DIR, exist_ok=True)
 
     # --- User Prompt for Account Type ---
-    while True:
-        user_choice = input("Enter account type to scrape (DEMO/REAL): ").strip().upper()
-        if user_choice in ["DEMO", "REAL"]:
-            break
-        else:
-            print("Invalid input. Please enter 'DEMO' or 'REAL'.")
+    user_choice = os.getenv('SCRAPER_ACCOUNT_TYPE', '').strip().upper()
+    while user_choice not in ["DEMO", "REAL", "BOTH"]:
+        user_choice = input("Enter account type to scrape (DEMO/REAL/BOTH): ").strip().upper()
+        if user_choice not in ["DEMO", "REAL", "BOTH"]:
+            print("Invalid input. Please enter 'DEMO', 'REAL' or 'BOTH'.")
     # --- End User Prompt ---
 
-    while True:
-        logger.info(f"Attempting to refresh SSID and UID for {user_choice} account. Next refresh in {refresh_interval_minutes} minutes.")
-        session_info = get_pocketoption_session_data(email, password, user_choice) # Pass account_type to the function
+    account_types = ["DEMO", "REAL"] if user_choice == "BOTH" else [user_choice]
+    # With BOTH, the plain SSID / UID keys keep following the account type main.py already trades
+    primary_account_type = os.getenv('ACCOUNT_TYPE', 'DEMO').upper() if user_choice == "BOTH" else user_choice
+    sessions = {account_type: BrowserSession(account_type, email, password, headless=SCRAPER_HEADLESS) for account_type in account_types}
+
+    def refresh_account(account_type: str) -> None:
+        session_info = None
+        if SCRAPER_HTTP_REFRESH:
+            # Fast path: no browser while the saved cookies are still logged in
+            refresher = HttpSessionRefresher(account_type, sessions[account_type].cookie_jar_path,
+                                             previous_ssid=dotenv_values(".env").get(f"SSID_{account_type}") if os.path.exists(".env") else None)
+            session_info = asyncio.run(refresher.refresh())
+            if session_info is None:
+                logger.info(f"Falling back to the browser to refresh the {account_type} SSID.")
+        if session_info is None:
+            session_info = sessions[account_type].refresh()
         if session_info["ssid"] and session_info["uid"]:
-            logger.info(f"SSID and UID extraction completed for {user_choice} account.")
+            save_session_data(account_type, session_info["ssid"], session_info["uid"], primary_account_type)
+            logger.info(f"SSID and UID extraction completed for {account_type} account.")
         else:
-            logger.error(f"Failed to extract SSID and/or UID for {user_choice} account.")
-        
-        logger.info(f"Waiting {refresh_interval_minutes} minutes before next SSID refresh attempt.")
-        time.sleep(refresh_interval_seconds)
\ No newline at end of file
+            logger.error(f"Failed to extract SSID and/or UID for {account_type} account.")
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+            while True:
+                logger.info(f"Attempting to refresh SSID and UID for {user_choice} account. Next refresh in {refresh_interval_minutes} minutes.")
+                # Each account type has its own browser, so they refresh concurrently
+                list(executor.map(refresh_account, account_types))
+
+                logger.info(f"Waiting {refresh_interval_minutes} minutes before next SSID refresh attempt.")
+                time.sleep(refresh_interval_seconds)
+    except KeyboardInterrupt:
+        logger.info("Scraper stopped.")
+    finally:
+        for session in sessions.values():
+            session.close()
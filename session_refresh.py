@@ -0,0 +1,166 @@
+"""
+session_refresh.py
+
+Browser-less SSID refresh. Reuses the pocketoption.com cookies saved by the
+scraper's browser session (shared_data/cookies_<type>.json) to fetch the
+cabinet page over plain HTTP, builds the websocket "auth" message from it and
+checks it with a real Engine.IO auth handshake. A refresh takes one HTTP
+request and one websocket round trip instead of a browser login.
+
+When the cookies have expired (the cabinet redirects to the login page), the
+page carries no session, or its session does not authenticate, `refresh()`
+returns None and the caller falls back to the Selenium path in scraper.py.
+Only a session scraped from the page counts as a refresh: the previous SSID
+still authenticating says nothing about getting a new one.
+
+The base and websocket URLs are parameters, so the whole flow can be run
+against a local stub server (see fake_po_client.StubPocketOptionServer).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Optional, Any
+
+import aiohttp
+import websockets
+from pocketoptionapi_async.constants import REGIONS, DEFAULT_HEADERS
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://pocketoption.com"
+CABINET_PATHS = {
+    "DEMO": "/en/cabinet/demo-quick-high-low/",
+    "REAL": "/en/cabinet/",
+}
+WS_URLS = {
+    "DEMO": REGIONS.get_region("DEMO"),
+    "REAL": REGIONS.get_region("EUROPA"),
+}
+
+# Where the cabinet page exposes the socket session and the user ID
+SESSION_PATTERNS = (
+    re.compile(r'"session"\s*:\s*"((?:\\.|[^"\\])+)"'),
+    re.compile(r"""\bsession\s*[:=]\s*'([^']+)'"""),
+)
+UID_PATTERNS = (
+    re.compile(r'"uid"\s*:\s*"?(\d+)'),
+    re.compile(r"""\buid\s*[:=]\s*['"]?(\d+)"""),
+)
+# Extracts the session and uid from an existing auth message (e.g. the previous SSID in .env)
+AUTH_MESSAGE_PATTERN = re.compile(r'"session":"((?:\\.|[^"\\])*)".*?"uid":(\d+)')
+
+
+def build_auth_payload(session: str, is_demo: int, uid: str) -> str:
+    """Full `42["auth",...]` message as saved to SSID, from an unescaped session string."""
+    return f'42["auth",{{"session":"{session.replace("\"", "\\\"")}","isDemo":{is_demo},"uid":{uid},"platform":2,"isFastHistory":true,"isOptimized":true}}]'
+
+
+class SessionExpired(Exception):
+    """The saved cookies no longer log in; a browser login is needed."""
+
+
+class HttpSessionRefresher:
+    """
+    Args:
+        account_type: "DEMO" or "REAL".
+        cookie_jar_path: JSON list of cookies as saved by scraper.BrowserSession.save_cookies.
+        base_url: Website origin, override for a stub server.
+        ws_url: Engine.IO websocket URL, override for a stub server.
+        previous_ssid: Last known SSID; only its uid is used, when the page has a session but no uid.
+        timeout_seconds: Budget for the HTTP request and the handshake each.
+    """
+
+    def __init__(self, account_type: str, cookie_jar_path: str, base_url: str = BASE_URL, ws_url: Optional[str] = None,
+                 previous_ssid: Optional[str] = None, timeout_seconds: float = 10.0):
+        account_type = account_type.upper()
+        if account_type not in CABINET_PATHS:
+            raise ValueError("Invalid account_type. Must be 'DEMO' or 'REAL'.")
+        self.account_type = account_type
+        self.is_demo = 1 if account_type == "DEMO" else 0
+        self.cookie_jar_path = cookie_jar_path
+        self.base_url = base_url.rstrip("/")
+        self.ws_url = ws_url or WS_URLS[account_type]
+        self.previous_ssid = previous_ssid
+        self.timeout_seconds = timeout_seconds
+
+    def load_cookies(self) -> dict[str, str]:
+        if not os.path.exists(self.cookie_jar_path):
+            raise SessionExpired(f"No saved cookies at {self.cookie_jar_path}.")
+        with open(self.cookie_jar_path, "r") as f:
+            return {cookie["name"]: cookie["value"] for cookie in json.load(f) if "name" in cookie and "value" in cookie}
+
+    async def fetch_cabinet(self, cookies: dict[str, str]) -> str:
+        """Returns the cabinet page HTML. Raises SessionExpired when the cookies are no longer logged in."""
+        url = self.base_url + CABINET_PATHS[self.account_type]
+        timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
+        async with aiohttp.ClientSession(cookies=cookies, timeout=timeout, headers={"User-Agent": DEFAULT_HEADERS.get("User-Agent", "Mozilla/5.0")}) as http:
+            async with http.get(url, allow_redirects=True) as response:
+                if "login" in str(response.url) or response.status in (401, 403):
+                    raise SessionExpired(f"Cabinet request was redirected to {response.url} (HTTP {response.status}).")
+                response.raise_for_status()
+                return await response.text()
+
+    def candidate_payloads(self, html: str) -> list[tuple[str, str]]:
+        """(auth payload, uid) pairs to try, built from the session on the page. Empty when the page has none."""
+        uid = next((match.group(1) for pattern in UID_PATTERNS if (match := pattern.search(html))), None)
+        previous = AUTH_MESSAGE_PATTERN.search(self.previous_ssid) if self.previous_ssid else None
+        if uid is None and previous:
+            uid = previous.group(2)
+        if not uid:
+            return []
+        for pattern in SESSION_PATTERNS:
+            match = pattern.search(html)
+            if match:
+                return [(build_auth_payload(match.group(1).replace('\\"', '"'), self.is_demo, uid), uid)]
+        return []
+
+    async def authenticate(self, auth_payload: str) -> bool:
+        """Runs the Engine.IO open / connect / auth exchange and reports whether the server accepted the session."""
+        async with websockets.connect(self.ws_url, origin=DEFAULT_HEADERS.get("Origin", BASE_URL), # type: ignore
+                                      open_timeout=self.timeout_seconds, max_size=None) as ws:
+            deadline = time.monotonic() + self.timeout_seconds
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                if isinstance(message, bytes):
+                    continue # Binary attachments (balance, assets) follow a successful auth
+                if message.startswith("0") and "sid" in message:
+                    await ws.send("40")
+                elif message.startswith("40"):
+                    await ws.send(auth_payload)
+                elif message == "2":
+                    await ws.send("3")
+                elif "successauth" in message:
+                    return True
+                elif "NotAuthorized" in message:
+                    return False
+        return False
+
+    async def refresh(self) -> Optional[dict[str, str]]:
+        """
+        Returns {"ssid": ..., "uid": ...} for a session the server accepted, or None when the
+        browser path is needed (cookies expired, no session on the page, it did not authenticate, or an error).
+        """
+        started = time.monotonic()
+        try:
+            html = await self.fetch_cabinet(self.load_cookies())
+            candidates = self.candidate_payloads(html)
+            if not candidates:
+                logger.warning(f"The {self.account_type} cabinet page carries no session. Not refreshed over HTTP.")
+                return None
+            for auth_payload, uid in candidates:
+                if await self.authenticate(auth_payload):
+                    logger.info(f"Refreshed the {self.account_type} SSID over HTTP in {time.monotonic() - started:.3f}s.")
+                    return {"ssid": auth_payload, "uid": uid}
+            logger.warning(f"No session from the {self.account_type} cabinet page was accepted by the server.")
+        except SessionExpired as e:
+            logger.info(f"Saved {self.account_type} browser cookies have expired: {e}")
+        except (aiohttp.ClientError, websockets.WebSocketException, OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"HTTP SSID refresh for the {self.account_type} account failed: {e}")
+        return None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"account_type": self.account_type, "base_url": self.base_url, "ws_url": self.ws_url,
+                "cookie_jar": self.cookie_jar_path, "cookies_saved": os.path.exists(self.cookie_jar_path)}
@@ -0,0 +1,234 @@
+"""
+settings.py
+
+Trading parameters (trade duration, stake, Martingale multiplier and levels,
+signal and local timezones) as one validated, immutable TradingSettings object.
+
+Values come from the environment (FIXED_TRADE_DURATION_SECONDS, ...) and are
+overridden by the optional JSON settings file. They are parsed and validated
+once per (re)load, never per request. A reload swaps the whole object at once,
+and one that does not validate keeps the previous settings. Each trade sequence
+works on the snapshot it started with, so a change applies from the next
+signal on and never in the middle of a Martingale sequence.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, fields, replace, asdict
+from functools import cached_property
+from typing import Optional, Any, Callable, Mapping
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# Environment variable of each setting. The settings file uses the field names.
+ENV_NAMES = {
+    "trade_duration_seconds": "FIXED_TRADE_DURATION_SECONDS",
+    "initial_trade_amount": "INITIAL_TRADE_AMOUNT",
+    "martingale_multiplier": "MARTINGALE_MULTIPLIER",
+    "max_martingale_levels": "MAX_MARTINGALE_LEVELS",
+    "signal_timezone": "SIGNAL_TIMEZONE",
+    "local_timezone": "LOCAL_TIMEZONE",
+}
+
+
+class SettingsError(ValueError):
+    """The settings did not validate. Lists every problem found."""
+
+    def __init__(self, problems: list[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+@dataclass(frozen=True)
+class TradingSettings:
+    trade_duration_seconds: int = 300 # 5 minutes
+    initial_trade_amount: float = 1.0
+    martingale_multiplier: float = 2.0
+    max_martingale_levels: int = 2 # Max Martingale levels after the initial trade, so 3 trades max by default
+    signal_timezone: str = "America/New_York"
+    local_timezone: str = "Africa/Windhoek"
+
+    def __post_init__(self):
+        problems = []
+        if not 5 <= self.trade_duration_seconds <= 4 * 3600:
+            problems.append(f"trade_duration_seconds must be between 5 and 14400, got {self.trade_duration_seconds}")
+        if not self.initial_trade_amount > 0:
+            problems.append(f"initial_trade_amount must be positive, got {self.initial_trade_amount}")
+        if not self.martingale_multiplier >= 1:
+            problems.append(f"martingale_multiplier must be at least 1, got {self.martingale_multiplier}")
+        if not 0 <= self.max_martingale_levels <= 10:
+            problems.append(f"max_martingale_levels must be between 0 and 10, got {self.max_martingale_levels}")
+        for name in ("signal_timezone", "local_timezone"):
+            try:
+                pytz.timezone(getattr(self, name))
+            except pytz.UnknownTimeZoneError:
+                problems.append(f"{name} is not a known timezone: {getattr(self, name)!r}")
+        if problems:
+            raise SettingsError(problems)
+
+    @cached_property
+    def signal_tz(self) -> Any:
+        return pytz.timezone(self.signal_timezone)
+
+    @cached_property
+    def local_tz(self) -> Any:
+        return pytz.timezone(self.local_timezone)
+
+    @classmethod
+    def from_sources(cls, env: Mapping[str, str], overrides: Optional[Mapping[str, Any]] = None) -> "TradingSettings":
+        """
+        Builds validated settings from `env` (ENV_NAMES) with `overrides` (field names) on top.
+
+        Raises:
+            SettingsError: A value has the wrong type or fails validation, or an override is unknown. Lists all of them.
+
+        An override of None (null in the settings file) or "" means "not overridden": the environment value applies.
+        """
+        values: dict[str, Any] = {}
+        problems = []
+        types = {f.name: f.type for f in fields(cls)}
+        unknown = sorted(set(overrides or {}) - set(types))
+        if unknown:
+            problems.append(f"unknown settings: {', '.join(unknown)}")
+        for name, env_name in ENV_NAMES.items():
+            raw = (overrides or {}).get(name)
+            if raw is None or raw == "":
+                raw = env.get(env_name)
+            if raw is None or raw == "":
+                continue
+            try:
+                if types[name] is int:
+                    number = float(raw)
+                    if not number.is_integer():
+                        raise ValueError(f"{raw!r} is not a whole number")
+                    values[name] = int(number)
+                else:
+                    values[name] = types[name](raw)
+            except (TypeError, ValueError) as e:
+                problems.append(f"{name}: {e}")
+        try:
+            settings = cls(**values)
+        except SettingsError as e:
+            problems.extend(e.problems)
+        if problems:
+            raise SettingsError(problems)
+        return settings
+
+    def for_account(self, account: Any) -> "TradingSettings":
+        """These settings with the account's own stake and Martingale parameters."""
+        return replace(self, initial_trade_amount=account.initial_amount, martingale_multiplier=account.martingale_multiplier,
+                       max_martingale_levels=account.max_martingale_levels)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class SettingsStore:
+    """
+    Holds the current TradingSettings and reloads them from the environment and `path`.
+
+    Args:
+        path: JSON object of setting overrides by field name. Missing is fine (environment and defaults apply).
+        env: Environment mapping, read again on every reload.
+        interval_seconds: Poll interval of the file watch.
+        on_reload: Called with the new settings on every reload, before they replace the current ones. If it
+            raises, it is called again with the current settings to undo a partial apply and the reload is rejected.
+    """
+
+    def __init__(self, path: str = "settings.json", env: Mapping[str, str] = os.environ, interval_seconds: float = 5.0,
+                 on_reload: Optional[Callable[[TradingSettings], None]] = None):
+        self.path = path
+        self.env = env
+        self.interval_seconds = interval_seconds
+        self.on_reload = on_reload
+        self.last_error: Optional[str] = None
+        self._mtime = self._read_mtime()
+        self.current = self._load() # Fails startup on invalid settings
+        self.version = 1
+        self.loaded_at: Optional[float] = time.time()
+
+    def _read_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _load(self) -> TradingSettings:
+        overrides: dict[str, Any] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                try:
+                    overrides = json.load(f)
+                except json.JSONDecodeError as e:
+                    raise SettingsError([f"{self.path} is not valid JSON: {e}"])
+            if not isinstance(overrides, dict):
+                raise SettingsError([f"{self.path} must contain a JSON object"])
+        return TradingSettings.from_sources(self.env, overrides)
+
+    def reload(self) -> dict[str, dict[str, Any]]:
+        """
+        Loads and validates the settings, applies them (on_reload), then replaces the current ones in one assignment.
+
+        Returns:
+            {field: {"old": ..., "new": ...}} for every changed setting.
+
+        Raises:
+            SettingsError: The new settings did not validate or could not be applied. The current settings stay in effect.
+        """
+        self._mtime = self._read_mtime()
+        previous = self.current
+        try:
+            try:
+                settings = self._load()
+            except OSError as e:
+                raise SettingsError([f"could not read {self.path}: {e}"])
+            if self.on_reload:
+                try:
+                    self.on_reload(settings)
+                except Exception as e:
+                    self._undo(previous)
+                    raise SettingsError([f"could not apply the settings: {e}"])
+        except SettingsError as e:
+            self.last_error = str(e)
+            logger.error(f"Settings reload rejected, keeping version {self.version}: {e}")
+            raise
+        self.current = settings
+        self.version += 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        changes = {name: {"old": value, "new": getattr(settings, name)}
+                   for name, value in previous.to_dict().items() if getattr(settings, name) != value}
+        if changes:
+            described = ", ".join(f"{name} {change['old']} -> {change['new']}" for name, change in changes.items())
+            logger.info(f"Settings version {self.version} applied: {described}")
+        return changes
+
+    def _undo(self, previous: TradingSettings) -> None:
+        try:
+            self.on_reload(previous) # type: ignore
+        except Exception as e:
+            logger.error(f"Could not restore settings version {self.version} after a failed reload: {e}", exc_info=True)
+
+    async def run(self) -> None:
+        """Background task: reloads when the settings file's modification time moves."""
+        while True:
+            if self._read_mtime() != self._mtime:
+                await asyncio.sleep(0.5) # Let the writer finish
+                try:
+                    self.reload()
+                except SettingsError:
+                    pass # Logged by reload; fixed by the next edit of the file
+            await asyncio.sleep(self.interval_seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "path": self.path,
+            "last_error": self.last_error,
+            "settings": self.current.to_dict(),
+        }
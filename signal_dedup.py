@@ -0,0 +1,84 @@
+"""
+signal_dedup.py
+
+Deduplication of repeated trade signals. MacroDroid may fire the same Telegram
+notification several times (notification updates, retries after a webhook
+timeout); each copy maps to the same key here and is answered with the job
+created for the first copy instead of being processed again.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Callable
+
+
+class SignalDedupCache:
+    """
+    Bounded LRU of signal keys -> job IDs with TTL eviction.
+
+    Args:
+        max_entries: Maximum number of keys kept; the least recently used key is evicted first.
+        ttl_seconds: How long a key is considered a duplicate after it was first seen.
+        clock: Monotonic time source, injectable for testing.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_key(parsed_data: dict) -> Optional[str]:
+        """
+        Normalized hash of asset, direction and entry time, or None if any of them is missing.
+        """
+        asset = parsed_data.get("asset_name_for_po")
+        direction = parsed_data.get("direction")
+        entry_time = parsed_data.get("entryTime")
+        if not asset or not direction or not entry_time:
+            return None
+        normalized = f"{asset.strip().upper()}|{direction.strip().upper()}|{entry_time.strip()}"
+        return "content:" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def idempotency_key(value: Optional[str]) -> Optional[str]:
+        if not value or not value.strip():
+            return None
+        return "idempotency:" + value.strip()
+
+    def lookup(self, key: Optional[str]) -> Optional[str]:
+        """Returns the job ID recorded for `key`, or None if the key is unknown or expired."""
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        job_id, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return job_id
+
+    def remember(self, key: Optional[str], job_id: str) -> None:
+        if key is None:
+            return
+        self._entries[key] = (job_id, self._clock() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def forget(self, key: Optional[str]) -> None:
+        if key is not None:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
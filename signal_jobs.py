@@ -0,0 +1,82 @@
+"""
+signal_jobs.py
+
+Job bookkeeping for trade signals. Every notification accepted by one of the
+ingestion endpoints becomes a SignalJob with an ID that the caller can use to
+look up the outcome later (GET /trade_signal/jobs/{job_id}).
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Any
+
+# Job lifecycle: queued -> running -> done | failed. Signals that cannot be parsed are "rejected" right away.
+JOB_FINAL_STATUSES = ("done", "failed", "rejected")
+
+
+@dataclass
+class SignalJob:
+    job_id: str
+    source: str
+    raw_text: str
+    parsed: dict
+    status: str = "queued"
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    error_status_code: Optional[int] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in JOB_FINAL_STATUSES
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "source": self.source,
+            "status": self.status,
+            "parsed": self.parsed,
+            "result": self.result,
+            "error": self.error,
+            "error_status_code": self.error_status_code,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class SignalJobRegistry:
+    """
+    Keeps the most recent `max_jobs` jobs, evicting the oldest finished ones first.
+    Unfinished jobs are never evicted.
+    """
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, SignalJob] = OrderedDict()
+
+    def create(self, source: str, raw_text: str, parsed: dict) -> SignalJob:
+        job = SignalJob(job_id=uuid.uuid4().hex, source=source, raw_text=raw_text, parsed=parsed)
+        self._jobs[job.job_id] = job
+        self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[SignalJob]:
+        return self._jobs.get(job_id)
+
+    def pending(self) -> list[SignalJob]:
+        return [job for job in self._jobs.values() if not job.is_finished]
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def _evict(self) -> None:
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.is_finished]:
+            del self._jobs[job_id]
+            if len(self._jobs) <= self.max_jobs:
+                break
@@ -0,0 +1,155 @@
+"""
+task_supervisor.py
+
+Supervised background tasks (the trade outcome monitors). A bare
+asyncio.create_task keeps no reference to the task, so it can be garbage
+collected mid-flight, its exception is only reported when that happens, and
+nothing bounds or cancels it. The supervisor:
+
+- keeps a strong reference to every task until it finishes;
+- bounds how many run at once with a semaphore (the rest wait for a slot);
+- tags each task (account, sequence and order IDs) for the /tasks view;
+- counts failures by exception type and hands them to an error callback;
+- drains on shutdown: waits a grace period, then cancels what is left and
+  returns it so the caller can checkpoint it.
+"""
+import asyncio
+import logging
+import time
+from collections import deque, Counter
+from dataclasses import dataclass, field
+from typing import Optional, Any, Callable, Coroutine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SupervisedTask:
+    name: str
+    tags: dict[str, Any]
+    created_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None # Set once the task holds a slot
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def state(self) -> str:
+        return "running" if self.started_at is not None else "waiting"
+
+    def to_dict(self, now: float) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "tags": self.tags,
+            "waited_seconds": round((self.started_at if self.started_at is not None else now) - self.created_at, 3),
+            "running_seconds": round(now - self.started_at, 3) if self.started_at is not None else None,
+        }
+
+
+class TaskSupervisor:
+    """
+    Args:
+        max_concurrent: Tasks allowed to run at once; further tasks wait for a slot.
+        on_error: Called with the task and its exception when a task fails (not when it is cancelled).
+        max_errors: Recent failures kept for the snapshot.
+    """
+
+    def __init__(self, max_concurrent: int = 64, on_error: Optional[Callable[[SupervisedTask, BaseException], None]] = None,
+                 max_errors: int = 20):
+        self.max_concurrent = max_concurrent
+        self.on_error = on_error
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks: dict[asyncio.Task, SupervisedTask] = {}
+        self.spawned = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.failures_by_type: Counter[str] = Counter()
+        self.recent_errors: deque[dict[str, Any]] = deque(maxlen=max_errors)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine[Any, Any, Any], name: str, **tags: Any) -> asyncio.Task:
+        """Schedules `coro` as a supervised task named `name`. It starts once a slot is free."""
+        supervised = SupervisedTask(name=name, tags=tags)
+        task = asyncio.create_task(self._run(supervised, coro), name=name)
+        supervised.task = task
+        self._tasks[task] = supervised
+        self.spawned += 1
+        task.add_done_callback(self._finished)
+        return task
+
+    async def _run(self, supervised: SupervisedTask, coro: Coroutine[Any, Any, Any]) -> Any:
+        try:
+            async with self._semaphore:
+                supervised.started_at = time.monotonic()
+                waited = supervised.started_at - supervised.created_at
+                if waited > 1.0:
+                    logger.warning(f"Task '{supervised.name}' waited {waited:.1f}s for a slot ({self.max_concurrent} running).")
+                return await coro
+        finally:
+            if supervised.started_at is None:
+                coro.close() # Cancelled while waiting for a slot: the coroutine never ran
+
+    def _finished(self, task: asyncio.Task) -> None:
+        supervised = self._tasks.pop(task, None)
+        if supervised is None:
+            return
+        if task.cancelled():
+            self.cancelled += 1
+            return
+        error = task.exception()
+        if error is None:
+            self.completed += 1
+            return
+        self.failed += 1
+        self.failures_by_type[type(error).__name__] += 1
+        self.recent_errors.append({"name": supervised.name, "tags": supervised.tags, "error": f"{type(error).__name__}: {error}",
+                                   "at": time.time()})
+        logger.error(f"Supervised task '{supervised.name}' failed: {error}", exc_info=error)
+        if self.on_error:
+            try:
+                self.on_error(supervised, error)
+            except Exception as e:
+                logger.error(f"Error handler for task '{supervised.name}' failed: {e}", exc_info=True)
+
+    def pending(self, **tags: Any) -> list[SupervisedTask]:
+        """Unfinished tasks, optionally only those whose tags match all of `tags`."""
+        return [supervised for supervised in self._tasks.values()
+                if all(supervised.tags.get(key) == value for key, value in tags.items())]
+
+    async def shutdown(self, grace_seconds: float = 5.0) -> list[SupervisedTask]:
+        """
+        Waits up to `grace_seconds` for the pending tasks (including ones they spawn meanwhile),
+        then cancels the rest.
+
+        Returns:
+            The tasks that were cancelled, for the caller to checkpoint.
+        """
+        deadline = time.monotonic() + grace_seconds
+        while self._tasks and (remaining := deadline - time.monotonic()) > 0:
+            await asyncio.wait(list(self._tasks), timeout=remaining)
+        interrupted = list(self._tasks.values())
+        for supervised in interrupted:
+            supervised.task.cancel() # type: ignore
+        if interrupted:
+            await asyncio.wait([supervised.task for supervised in interrupted]) # type: ignore
+            logger.warning(f"Cancelled {len(interrupted)} supervised task(s) still pending after {grace_seconds:.1f}s: "
+                           f"{', '.join(supervised.name for supervised in interrupted)}")
+        return interrupted
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.monotonic()
+        pending = sorted(self._tasks.values(), key=lambda supervised: supervised.created_at)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": sum(1 for supervised in pending if supervised.started_at is not None),
+            "waiting": sum(1 for supervised in pending if supervised.started_at is None),
+            "spawned": self.spawned,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "failures_by_type": dict(self.failures_by_type),
+            "recent_errors": list(self.recent_errors),
+            "tasks": [supervised.to_dict(now) for supervised in pending],
+        }
@@ -0,0 +1,140 @@
+"""
+telegram_source.py
+
+In-process Telegram ingestion for trade signals. Channel posts (and group
+messages) received by the bot are handed to the same processing core as the
+MacroDroid `/trade_signal` webhook, on the same event loop as the trader, which
+removes the Android notification -> MacroDroid -> ngrok hop.
+
+The bot only receives posts from chats it is a member of: add it as an admin
+of the signal channel, or forward the signals into a group the bot is in.
+"""
+import logging
+import time
+from typing import Optional, Callable, Awaitable, Any, Iterable
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, MessageHandler, filters
+
+logger = logging.getLogger(__name__)
+
+# Signature of the processing core: (raw_notification_text, source) -> result
+SignalHandler = Callable[[str, str], Awaitable[Any]]
+
+
+class TelegramSignalSource:
+    """
+    Receives Telegram messages and forwards their text to `signal_handler`.
+
+    Args:
+        token: Telegram bot token. May be None when the source is only used with inject_text().
+        signal_handler: Coroutine function called with (text, "telegram") for every accepted message.
+        allowed_chat_ids: Chat IDs to accept signals from. All chats are accepted when empty.
+    """
+
+    def __init__(self, token: Optional[str], signal_handler: SignalHandler,
+                 allowed_chat_ids: Optional[Iterable[int]] = None):
+        self.token = token
+        self.signal_handler = signal_handler
+        self.allowed_chat_ids = set(allowed_chat_ids or [])
+        self.application: Optional[Application] = None
+        self.messages_received = 0
+        self.messages_ignored = 0
+
+    async def start(self) -> None:
+        """Starts long polling on the running event loop. Returns once polling is running."""
+        if not self.token:
+            raise ValueError("A Telegram bot token is required to start polling.")
+        self.application = Application.builder().token(self.token).build()
+        # block=False lets several signals be processed concurrently, since the
+        # processing core waits until the signal's entry time before returning.
+        self.application.add_handler(MessageHandler(
+            (filters.UpdateType.CHANNEL_POSTS | filters.UpdateType.MESSAGES) & (filters.TEXT | filters.CAPTION),
+            self._on_update,
+            block=False,
+        ))
+        await self.application.initialize()
+        await self.application.start()
+        await self.application.updater.start_polling( # type: ignore
+            allowed_updates=["message", "channel_post"],
+            drop_pending_updates=True, # Stale signals are useless; never replay a backlog
+        )
+        logger.info(f"Telegram signal source started. Listening to chats: {sorted(self.allowed_chat_ids) or 'ALL'}")
+
+    async def stop(self) -> None:
+        if not self.application:
+            return
+        try:
+            if self.application.updater and self.application.updater.running:
+                await self.application.updater.stop()
+            if self.application.running:
+                await self.application.stop()
+            await self.application.shutdown()
+            logger.info("Telegram signal source stopped.")
+        except Exception as e:
+            logger.warning(f"Error while stopping Telegram signal source: {e}")
+        finally:
+            self.application = None
+
+    async def _on_update(self, update: Update, context: Optional[ContextTypes.DEFAULT_TYPE]) -> Any:
+        message = update.effective_message
+        chat = update.effective_chat
+        if not message or not chat:
+            return None
+        text = message.text or message.caption
+        if not text:
+            return None
+        if self.allowed_chat_ids and chat.id not in self.allowed_chat_ids:
+            self.messages_ignored += 1
+            logger.debug(f"Ignoring Telegram message from non-signal chat {chat.id}.")
+            return None
+
+        self.messages_received += 1
+        logger.info(f"Received Telegram signal from chat {chat.id} ({chat.title or chat.username}).")
+        try:
+            return await self.signal_handler(text, "telegram")
+        except Exception as e:
+            logger.error(f"Error processing Telegram signal from chat {chat.id}: {e}", exc_info=True)
+            return None
+
+    async def inject_text(self, text: str, chat_id: Optional[int] = None, chat_type: str = "channel") -> Any:
+        """
+        Feeds a fake Telegram update through the same handler used for live updates,
+        without any network access. Useful for offline testing of the ingestion path.
+
+        Args:
+            text: Message text, in the same format as the channel posts.
+            chat_id: Chat the fake message comes from. Defaults to the first allowed chat.
+            chat_type: "channel" produces a channel_post, anything else a regular message.
+
+        Returns:
+            Whatever the signal handler returned, or None if the message was ignored.
+        """
+        if chat_id is None:
+            chat_id = next(iter(self.allowed_chat_ids), -1000000000000)
+        message = {
+            "message_id": self.messages_received + self.messages_ignored + 1,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": chat_type, "title": "injected"},
+            "text": text,
+        }
+        update_key = "channel_post" if chat_type == "channel" else "message"
+        update = Update.de_json({"update_id": message["message_id"], update_key: message},
+                                self.application.bot if self.application else None)
+        return await self._on_update(update, None)
+
+
+def parse_chat_ids(value: Optional[str]) -> list[int]:
+    """Parses a comma-separated list of chat IDs (e.g. "-1001234567890,-1009876543210")."""
+    if not value:
+        return []
+    chat_ids = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            chat_ids.append(int(part))
+        except ValueError:
+            logger.warning(f"Ignoring invalid Telegram chat ID '{part}'.")
+    return chat_ids
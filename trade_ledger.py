@@ -0,0 +1,234 @@
+"""
+trade_ledger.py
+
+Append-only ledger of settled trades in fixed-width 64-byte records, plus
+aggregates per asset, hour, Martingale level and account that are updated as
+records are appended, so the /stats endpoints answer without scanning history.
+
+The file has no header: record N starts at byte N * RECORD_SIZE, which makes it
+loadable with numpy.memmap(path, dtype=RECORD_DTYPE) for vectorized ad-hoc
+rollups. numpy is optional; without it the same queries run over struct.iter_unpack.
+
+Several workers may append to the same file (each write is one O_APPEND record);
+every reader folds in records appended by others before answering.
+"""
+import logging
+import os
+import struct
+import threading
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Optional, Any, Iterator
+
+try:
+    import numpy as np
+except ImportError: # Optional: only speeds up ad-hoc queries
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# ts (entry time, epoch seconds), amount, profit, asset, account, direction, level, outcome, hour, padding
+RECORD_FORMAT = "<ddd16s16sBBBB4x"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"), ("amount", "<f8"), ("profit", "<f8"), ("asset", "S16"), ("account", "S16"),
+    ("direction", "u1"), ("level", "u1"), ("outcome", "u1"), ("hour", "u1"), ("pad", "V4"),
+]) if np is not None else None
+
+DIRECTIONS = ("call", "put")
+OUTCOMES = ("loss", "win", "tie", "unknown")
+DIMENSIONS = ("asset", "hour", "level", "account", "direction")
+
+
+@dataclass
+class TradeRecord:
+    ts: float
+    asset: str
+    account: str
+    direction: str # "call" | "put"
+    level: int # 0 for the initial trade, 1 for the first Martingale, ...
+    outcome: str # "win" | "loss" | "tie" | "unknown"
+    amount: float
+    profit: float
+    hour: int # Local hour of the entry
+
+    def pack(self) -> bytes:
+        return struct.pack(RECORD_FORMAT, self.ts, self.amount, self.profit,
+                           self.asset.encode("utf-8")[:16], self.account.encode("utf-8")[:16],
+                           DIRECTIONS.index(self.direction), self.level, OUTCOMES.index(self.outcome), self.hour)
+
+    @classmethod
+    def unpack(cls, values: tuple) -> "TradeRecord":
+        ts, amount, profit, asset, account, direction, level, outcome, hour = values
+        return cls(ts=ts, asset=asset.rstrip(b"\0").decode("utf-8", "replace"), account=account.rstrip(b"\0").decode("utf-8", "replace"),
+                   direction=DIRECTIONS[direction], level=level, outcome=OUTCOMES[outcome], amount=amount, profit=profit, hour=hour)
+
+
+@dataclass
+class Aggregate:
+    trades: int = 0
+    wins: int = 0
+    losses: int = 0
+    ties: int = 0
+    amount: float = 0.0
+    profit: float = 0.0
+
+    def add(self, record: TradeRecord) -> None:
+        self.trades += 1
+        self.wins += record.outcome == "win"
+        self.losses += record.outcome == "loss"
+        self.ties += record.outcome == "tie"
+        self.amount += record.amount
+        self.profit += record.profit
+
+    def to_dict(self) -> dict[str, Any]:
+        decided = self.wins + self.losses
+        return {**asdict(self), "amount": round(self.amount, 2), "profit": round(self.profit, 2),
+                "win_rate": round(self.wins / decided, 4) if decided else None}
+
+
+class TradeLedger:
+    """
+    Args:
+        path: Ledger file. Created on first append.
+    """
+
+    def __init__(self, path: str = "trades.ledger"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offset = 0 # Bytes of the file already folded into the aggregates
+        self.total = Aggregate()
+        self._by: dict[str, dict[Any, Aggregate]] = {dimension: {} for dimension in DIMENSIONS}
+        self._catch_up()
+
+    def __len__(self) -> int:
+        self._catch_up()
+        return self.total.trades
+
+    def _fold(self, record: TradeRecord) -> None:
+        self.total.add(record)
+        for dimension in DIMENSIONS:
+            key = getattr(record, dimension)
+            aggregate = self._by[dimension].get(key)
+            if aggregate is None:
+                aggregate = self._by[dimension][key] = Aggregate()
+            aggregate.add(record)
+
+    def _catch_up(self) -> None:
+        """Folds in whole records appended since the last call, by this or any other process."""
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return
+            size -= size % RECORD_SIZE # A record still being written is picked up next time
+            if size <= self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(size - self._offset)
+            for values in struct.iter_unpack(RECORD_FORMAT, data):
+                self._fold(TradeRecord.unpack(values))
+            self._offset = size
+
+    def append(self, record: TradeRecord) -> None:
+        with open(self.path, "ab") as f:
+            f.write(record.pack())
+        self._catch_up()
+
+    def record_trade(self, entry_time: datetime, asset: str, account: str, direction: str, level: int, outcome: str,
+                     amount: float, profit: float) -> None:
+        """Appends one settled trade. Errors are logged, never raised, so analytics cannot break trading."""
+        try:
+            self.append(TradeRecord(ts=entry_time.timestamp(), asset=asset, account=account, direction=direction.lower(),
+                                    level=level, outcome=outcome, amount=amount, profit=profit, hour=entry_time.hour))
+        except Exception as e:
+            logger.warning(f"Failed to record trade in the ledger: {e}")
+
+    # --- O(1) lookups on the maintained aggregates ---
+    # Appends run in worker threads (record_trade is called via asyncio.to_thread), so reads hold the lock too
+
+    def summary(self) -> dict[str, Any]:
+        self._catch_up()
+        with self._lock:
+            return self.total.to_dict()
+
+    def by(self, dimension: str) -> dict[str, dict[str, Any]]:
+        if dimension not in DIMENSIONS:
+            raise KeyError(dimension)
+        self._catch_up()
+        with self._lock:
+            return {str(key): aggregate.to_dict() for key, aggregate in sorted(self._by[dimension].items())}
+
+    def get(self, dimension: str, key: Any) -> Optional[dict[str, Any]]:
+        if dimension not in DIMENSIONS:
+            raise KeyError(dimension)
+        self._catch_up()
+        with self._lock:
+            aggregate = self._by[dimension].get(key)
+            return aggregate.to_dict() if aggregate else None
+
+    # --- Ad-hoc rollups over the full history ---
+
+    def records(self) -> Iterator[TradeRecord]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for values in struct.iter_unpack(RECORD_FORMAT, data[:len(data) - len(data) % RECORD_SIZE]):
+            yield TradeRecord.unpack(values)
+
+    def query(self, group_by: str = "asset", since: Optional[float] = None, until: Optional[float] = None,
+              asset: Optional[str] = None, account: Optional[str] = None, level: Optional[int] = None) -> dict[str, dict[str, Any]]:
+        """
+        Groups the trades matching the filters by `group_by`. Vectorized over a memory map when
+        numpy is installed.
+        """
+        if group_by not in DIMENSIONS:
+            raise KeyError(group_by)
+        if np is not None:
+            return self._query_numpy(group_by, since, until, asset, account, level)
+        groups: dict[Any, Aggregate] = {}
+        for record in self.records():
+            if (since is not None and record.ts < since) or (until is not None and record.ts >= until) \
+                    or (asset is not None and record.asset != asset) or (account is not None and record.account != account) \
+                    or (level is not None and record.level != level):
+                continue
+            groups.setdefault(getattr(record, group_by), Aggregate()).add(record)
+        return {str(key): aggregate.to_dict() for key, aggregate in sorted(groups.items())}
+
+    def _query_numpy(self, group_by: str, since: Optional[float], until: Optional[float], asset: Optional[str],
+                     account: Optional[str], level: Optional[int]) -> dict[str, dict[str, Any]]:
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        count = size // RECORD_SIZE
+        if count == 0:
+            return {}
+        rows = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+        mask = np.ones(count, dtype=bool)
+        if since is not None:
+            mask &= rows["ts"] >= since
+        if until is not None:
+            mask &= rows["ts"] < until
+        if asset is not None:
+            mask &= rows["asset"] == asset.encode("utf-8")[:16]
+        if account is not None:
+            mask &= rows["account"] == account.encode("utf-8")[:16]
+        if level is not None:
+            mask &= rows["level"] == level
+        selected = rows[mask]
+        keys, inverse = np.unique(selected[group_by], return_inverse=True)
+        trades = np.bincount(inverse, minlength=len(keys))
+        wins = np.bincount(inverse, weights=selected["outcome"] == OUTCOMES.index("win"), minlength=len(keys))
+        losses = np.bincount(inverse, weights=selected["outcome"] == OUTCOMES.index("loss"), minlength=len(keys))
+        ties = np.bincount(inverse, weights=selected["outcome"] == OUTCOMES.index("tie"), minlength=len(keys))
+        amount = np.bincount(inverse, weights=selected["amount"], minlength=len(keys))
+        profit = np.bincount(inverse, weights=selected["profit"], minlength=len(keys))
+        result = {}
+        for i, key in enumerate(keys):
+            if group_by in ("asset", "account"):
+                key = key.rstrip(b"\0").decode("utf-8", "replace")
+            elif group_by == "direction":
+                key = DIRECTIONS[key]
+            result[str(key)] = Aggregate(int(trades[i]), int(wins[i]), int(losses[i]), int(ties[i]),
+                                         float(amount[i]), float(profit[i])).to_dict()
+        return dict(sorted(result.items()))